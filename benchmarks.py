@@ -0,0 +1,878 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # not on Windows; peak memory is then left out of the suite results
+    resource = None
+
+from metrics import RamataMetrics
+from operations import (RamataBook, RamataMember, RamataMiniLibraryManagementSystem, RamataSearchCache,
+                        print_ramata_event, run_ramata_batch)
+from persistence import RamataPersistentStore
+from readonly_catalog import RamataReadOnlyCatalog, write_ramata_catalog
+from sharding import RamataShardedLibrary
+
+
+SYLLABLES = ("ba", "ra", "ma", "ta", "ko", "se", "ye", "fa", "di", "lu", "mu", "ka", "ne", "so",
+             "wi", "zo", "hu", "pe", "gi", "ro")
+
+
+def _make_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize())
+    return sorted(words)
+
+
+@contextlib.contextmanager
+def _silenced():
+    """Send the library's console output to the null device while timing."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def generate_books(count, seed=42):
+    """Yield (isbn, title, author, genre, copies) rows for a synthetic catalog."""
+    rng = random.Random(seed)
+    title_words = _make_vocabulary(rng, 20_000)
+    author_names = _make_vocabulary(rng, 2_000)
+    genres = RamataMiniLibraryManagementSystem().ramata_valid_genres
+    for number in range(count):
+        title = " ".join(rng.choice(title_words) for _ in range(3))
+        author = f"{rng.choice(author_names)} {rng.choice(author_names)}"
+        yield f"BENCH-{number:08d}", title, author, rng.choice(genres), rng.randint(1, 5)
+
+
+def build_library(book_count, event_sink=None):
+    library = RamataMiniLibraryManagementSystem(event_sink=event_sink)
+    for row in generate_books(book_count):
+        library.add_book(*row)
+    return library
+
+
+def _linear_search(library, search_type, term):
+    term = term.lower()
+    return [(isbn, book) for isbn, book in library.ramata_books.items() if term in book[search_type].lower()]
+
+
+def bench_search_scaling(sizes=(1_000, 10_000, 100_000), queries=200):
+    """Time indexed search_books against a full substring scan as the catalog grows."""
+    print(f"{'books':>10} {'indexed us/query':>18} {'scan us/query':>15}")
+    for size in sizes:
+        library = build_library(size)
+        # Selective hits taken from the first books, plus a guaranteed miss
+        books = list(library.ramata_books.values())[:3]
+        queries_by_type = [("title", books[0]['title']), ("author", books[1]['author']),
+                           ("title", books[2]['title'][:12]), ("title", "no such book")]
+
+        start = time.perf_counter()
+        for i in range(queries):
+            library.search_books(*queries_by_type[i % len(queries_by_type)])
+        indexed = (time.perf_counter() - start) / queries
+
+        start = time.perf_counter()
+        for i in range(queries):
+            _linear_search(library, *queries_by_type[i % len(queries_by_type)])
+        scan = (time.perf_counter() - start) / queries
+
+        print(f"{size:>10} {indexed * 1e6:>18.1f} {scan * 1e6:>15.1f}")
+
+
+def _linear_faceted_search(library, search_type, term, genre, limit):
+    results = []
+    for isbn, book in library.ramata_books.items():
+        if term in book[search_type].lower() and book.genre == genre and book.available_copies > 0:
+            results.append((isbn, book))
+            if len(results) == limit:
+                break
+    return results
+
+
+def bench_faceted_search(sizes=(1_000, 10_000, 100_000), queries=200, limit=20):
+    """Time an indexed title + genre + available-now page against a filtered scan."""
+    print(f"{'books':>10} {'indexed us/query':>18} {'scan us/query':>15}")
+    for size in sizes:
+        library = build_library(size)
+        # A selective term from one book, so the scan has to walk the catalog
+        isbn, book = next(reversed(library.ramata_books.items()))
+        term, genre = book['title'].split()[0].lower(), book['genre']
+
+        start = time.perf_counter()
+        for _ in range(queries):
+            library.search_books("title", term, genre=genre, available_only=True, limit=limit)
+        indexed = (time.perf_counter() - start) / queries
+
+        start = time.perf_counter()
+        for _ in range(queries):
+            _linear_faceted_search(library, "title", term, genre, limit)
+        scan = (time.perf_counter() - start) / queries
+
+        print(f"{size:>10} {indexed * 1e6:>18.1f} {scan * 1e6:>15.1f}")
+
+
+def bench_search_cache(book_count=100_000, queries=5_000, popular_terms=20):
+    """Time a popular-query workload with the search cache disabled and enabled."""
+    library = build_library(book_count)
+    rng = random.Random(7)
+    books = list(library.ramata_books.values())
+    terms = [("author", book.author.split()[0]) if n % 2 else ("title", book.title.split()[0])
+             for n, book in enumerate(rng.sample(books, popular_terms))]
+    # A few queries dominate, as with the front-display searches
+    workload = rng.choices(terms, weights=[1 / (rank + 1) for rank in range(popular_terms)], k=queries)
+
+    print(f"{'cache':>10} {'us/query':>10} {'hit rate':>9}")
+    for mode, capacity in (("off", 0), ("on", 1024)):
+        library.ramata_search_cache = RamataSearchCache(capacity)
+        start = time.perf_counter()
+        for search_type, term in workload:
+            library.search_books(search_type, term)
+        elapsed = time.perf_counter() - start
+        hit_rate = library.get_search_cache_stats()['hit_rate']
+        print(f"{mode:>10} {elapsed / queries * 1e6:>10.1f} {hit_rate:>9.0%}")
+
+
+def bench_suggest(book_count=100_000, lookups=20_000):
+    """Time autocomplete lookups for one- to eight-character prefixes."""
+    library = build_library(book_count)
+    rng = random.Random(11)
+    words = [book.title.split()[-1].lower() for book in rng.sample(list(library.ramata_books.values()), 200)]
+
+    print(f"{'prefix len':>10} {'us/lookup':>10}")
+    for length in (1, 2, 4, 8):
+        prefixes = [words[n % len(words)][:length] for n in range(lookups)]
+        start = time.perf_counter()
+        for prefix in prefixes:
+            library.suggest(prefix)
+        elapsed = time.perf_counter() - start
+        print(f"{length:>10} {elapsed / lookups * 1e6:>10.1f}")
+
+
+def bench_sharded_scaling(book_count=2_000_000, shard_counts=(1, 2, 4, 8), queries=200):
+    """Ingest and search throughput of a sharded catalog as shards (one process each) are added."""
+    fields = ("isbn", "title", "author", "genre", "total_copies")
+    rng = random.Random(5)
+    words = [title.split()[0].lower() for _, title, _, _, _ in generate_books(1_000)]
+    terms = [rng.choice(words)[:4] for _ in range(queries)]
+
+    print(f"{os.cpu_count()} core(s), {book_count:,} books")
+    print(f"{'shards':>6} {'ingest books/s':>15} {'search q/s':>11} {'speedup':>8}")
+    baseline = None
+    for shard_count in shard_counts:
+        with RamataShardedLibrary(shard_count) as library:
+            start = time.perf_counter()
+            library.add_books_bulk(dict(zip(fields, row)) for row in generate_books(book_count))
+            ingest_rate = book_count / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for term in terms:
+                library.search_books("title", term, limit=20)
+            search_rate = queries / (time.perf_counter() - start)
+
+        baseline = baseline or (ingest_rate, search_rate)
+        speedup = f"{ingest_rate / baseline[0]:.1f}x/{search_rate / baseline[1]:.1f}x"
+        print(f"{shard_count:>6} {ingest_rate:>15,.0f} {search_rate:>11,.0f} {speedup:>8}")
+
+
+def bench_batch_mode(book_count=20_000, member_count=1_000, commands=100_000):
+    """Commands per minute through batch mode, for a JSON and a CSV command stream."""
+    rng = random.Random(9)
+    workload = []
+    for number in range(commands):
+        member_id = f"RAM{rng.randint(1, member_count):03d}"
+        isbn = f"BENCH-{rng.randrange(book_count):08d}"
+        operation = rng.choice(("borrow_book", "return_book", "get_book_details"))
+        workload.append((number, operation, [member_id, isbn] if operation != "get_book_details" else [isbn]))
+    streams = {
+        'json': [json.dumps({'id': number, 'op': operation, 'args': args}) + "\n"
+                 for number, operation, args in workload],
+        'csv': [",".join([operation] + args) + "\n" for _, operation, args in workload],
+    }
+
+    print(f"{'format':>8} {'commands/min':>14}")
+    for name, lines in streams.items():
+        library = build_library(book_count)
+        library.add_members_bulk({'name': f"Member {number}", 'email': f"member{number}@email.com"}
+                                 for number in range(member_count))
+        with open(os.devnull, "w") as devnull:
+            start = time.perf_counter()
+            run_ramata_batch(library, lines, devnull)
+            elapsed = time.perf_counter() - start
+        print(f"{name:>8} {commands / elapsed * 60:>14,.0f}")
+
+
+def _borrow_return_cycle(library, member_ids, isbns, rounds):
+    for i in range(rounds):
+        member_id = member_ids[i % len(member_ids)]
+        isbn = isbns[i % len(isbns)]
+        library.borrow_book(member_id, isbn)
+        library.return_book(member_id, isbn)
+
+
+def bench_console_output(book_count=1_000, member_count=100, rounds=20_000):
+    """Compare borrow/return ops/sec with console output against a silent library."""
+    print(f"{'mode':>10} {'ops/sec':>12}")
+    for mode, event_sink in (("console", print_ramata_event), ("quiet", None)):
+        library = build_library(book_count)
+        for number in range(member_count):
+            library.add_member(f"Member {number}", f"member{number}@email.com")
+        library.ramata_event_sink = event_sink
+        member_ids = list(library.ramata_members)
+        isbns = list(library.ramata_books)
+
+        with _silenced():
+            start = time.perf_counter()
+            _borrow_return_cycle(library, member_ids, isbns, rounds)
+            elapsed = time.perf_counter() - start
+
+        print(f"{mode:>10} {2 * rounds / elapsed:>12,.0f}")
+
+
+def _display_books_per_line(library):
+    """The listing as it was: five print calls per book."""
+    for isbn, book in library.get_all_books().items():
+        status = "✅ Available" if book.available_copies > 0 else "❌ Out of Stock"
+        print(f"📖 {book.title} by {book.author}")
+        print(f"   ISBN: {isbn}")
+        print(f"   Genre: {book.genre}")
+        print(f"   Status: {book.available_copies}/{book.total_copies} copies - {status}")
+        print("   " + "🌸" * 30)
+
+
+def bench_catalog_listing(book_count=100_000):
+    """Time listing every book to a line-buffered stream, as a terminal would be."""
+    library = build_library(book_count)
+    print(f"{'method':>14} {'books/sec':>12}")
+    for method, display in (("print per line", _display_books_per_line),
+                            ("chunked writes", lambda library: library._display_all_books())):
+        with open(os.devnull, "w", buffering=1, encoding="utf-8") as terminal, contextlib.redirect_stdout(terminal):
+            start = time.perf_counter()
+            display(library)
+            elapsed = time.perf_counter() - start
+        print(f"{method:>14} {book_count / elapsed:>12,.0f}")
+
+
+def bench_bulk_ingest(count=100_000):
+    """Compare add_books_bulk against one printing add_book call per row."""
+    fields = ("isbn", "title", "author", "genre", "total_copies")
+    rows = list(generate_books(count))
+    print(f"{'method':>14} {'rows/sec':>12}")
+
+    library = RamataMiniLibraryManagementSystem()
+    with _silenced():
+        start = time.perf_counter()
+        for row in rows:
+            library.add_book(*row)
+        elapsed = time.perf_counter() - start
+    print(f"{'add_book':>14} {count / elapsed:>12,.0f}")
+
+    library = RamataMiniLibraryManagementSystem(event_sink=None)
+    start = time.perf_counter()
+    library.add_books_bulk(dict(zip(fields, row)) for row in rows)
+    elapsed = time.perf_counter() - start
+    print(f"{'add_books_bulk':>14} {count / elapsed:>12,.0f}")
+
+
+def bench_persistence(book_count=100_000, member_count=10_000, fsync_every=1_000):
+    """Measure logged write throughput and recovery time from snapshot plus log tail."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = RamataPersistentStore(directory, fsync_every=fsync_every, snapshot_every=10 ** 12)
+        library = store.open()
+        start = time.perf_counter()
+        for row in generate_books(book_count):
+            library.add_book(*row)
+        for number in range(member_count):
+            library.add_member(f"Member {number}", f"member{number}@email.com")
+        elapsed = time.perf_counter() - start
+        print(f"logged writes: {(book_count + member_count) / elapsed:,.0f} ops/sec (fsync every {fsync_every})")
+
+        start = time.perf_counter()
+        store.snapshot()
+        print(f"snapshot:      {time.perf_counter() - start:.2f} s")
+
+        # Leave a tail of circulation entries after the snapshot
+        isbns = list(library.ramata_books)
+        for number in range(member_count):
+            library.borrow_book(f"RAM{number + 1:03d}", isbns[number % len(isbns)])
+        store.close()
+
+        start = time.perf_counter()
+        store = RamataPersistentStore(directory)
+        store.open()
+        print(f"recovery:      {time.perf_counter() - start:.2f} s "
+              f"({book_count:,} books, {member_count:,} members, {member_count:,} log entries)")
+        store.close()
+
+
+def bench_binary_snapshot(book_count=1_000_000, member_count=10_000):
+    """Measure export_snapshot/load_snapshot for a whole library and compare with load_state."""
+    books = [(isbn, title, author, genre, copies, copies)
+             for isbn, title, author, genre, copies in generate_books(book_count)]
+    members = [(f"RAM{number + 1:03d}", f"Member {number}", f"member{number}@email.com",
+                [books[number % book_count][0]]) for number in range(member_count)]
+    books[:member_count] = [book[:5] + (book[5] - 1,) for book in books[:member_count]]
+    state = {'books': books, 'members': members, 'next_member_id': member_count + 1}
+    library = RamataMiniLibraryManagementSystem(event_sink=None)
+    library.ramata_background_indexing = False
+    library.load_state(state)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "library.snapshot")
+        start = time.perf_counter()
+        library.export_snapshot(path)
+        print(f"export:     {time.perf_counter() - start:.2f} s ({os.path.getsize(path) / 2 ** 20:,.1f} MiB)")
+        # Released so the restored library fits in memory beside the exporting one
+        library = None
+
+        restored = RamataMiniLibraryManagementSystem(event_sink=None)
+        start = time.perf_counter()
+        restored.load_snapshot(path)
+        print(f"load:       {time.perf_counter() - start:.2f} s "
+              f"({book_count:,} books, {member_count:,} members and loans)")
+
+        # The text and facet indexes come out of the snapshot ready to use,
+        # so writes and the first search do not wait on an indexing pass
+        start = time.perf_counter()
+        slowest_write = 0.0
+        for number in range(20):
+            write_start = time.perf_counter()
+            restored.add_book(f"WARM-{number:04d}", "Warm Book", "Warm Author", "Mystery", 1)
+            slowest_write = max(slowest_write, time.perf_counter() - write_start)
+        restored.search_books("title", "book 12")
+        print(f"first search: {time.perf_counter() - start:.2f} s after loading; "
+              f"slowest add_book meanwhile {slowest_write * 1e3:.1f} ms")
+        restored = None
+
+    library = RamataMiniLibraryManagementSystem(event_sink=None)
+    library.ramata_background_indexing = False
+    start = time.perf_counter()
+    library.load_state(state)
+    print(f"load_state: {time.perf_counter() - start:.2f} s (rows already in memory)")
+
+
+def bench_readonly_catalog(book_count=1_000_000, lookups=20_000, queries=200):
+    """Compare startup, lookups and page-sized searches of a mapped catalog with the in-memory library."""
+    books = [(isbn, title, author, genre, copies, copies)
+             for isbn, title, author, genre, copies in generate_books(book_count)]
+    library = RamataMiniLibraryManagementSystem(event_sink=None)
+    # The in-memory search below times building the text index itself
+    library.ramata_background_indexing = False
+    library.load_state({'books': books, 'members': [], 'next_member_id': 1})
+    rng = random.Random(11)
+    isbns = [rng.choice(books)[0] for _ in range(lookups)]
+    terms = [rng.choice(books)[1].split()[0][:4].lower() for _ in range(queries)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.rmc")
+        snapshot_path = os.path.join(directory, "library.snapshot")
+        write_ramata_catalog(library, path)
+        library.export_snapshot(snapshot_path)
+
+        start = time.perf_counter()
+        catalog = RamataReadOnlyCatalog(path, event_sink=None)
+        print(f"startup:  mapped {(time.perf_counter() - start) * 1e3:8.2f} ms", end="")
+        restored = RamataMiniLibraryManagementSystem(event_sink=None)
+        restored.ramata_background_indexing = False
+        start = time.perf_counter()
+        restored.load_snapshot(snapshot_path)
+        print(f"   in-memory (snapshot) {(time.perf_counter() - start) * 1e3:,.0f} ms")
+
+        for name, target in (("mapped", catalog), ("in-memory", library)):
+            start = time.perf_counter()
+            for isbn in isbns:
+                target.get_book_details(isbn)
+            lookup_us = (time.perf_counter() - start) / lookups * 1e6
+            target.search_books("title", terms[0], limit=20)  # builds the in-memory text index
+            start = time.perf_counter()
+            for term in terms:
+                target.search_books("title", term, limit=20)
+            search_ms = (time.perf_counter() - start) / queries * 1e3
+            print(f"{name:>9}: get_book_details {lookup_us:6.1f} us   search (20 per page) {search_ms:6.2f} ms")
+        catalog.close()
+
+
+def _overdue_by_scan(library, as_of):
+    return sorted((loan.due_at, member.member_id, isbn) for member in library.ramata_members.values()
+                  for isbn in member.borrowed_books
+                  for loan in (member.borrowed_books.loan(isbn),) if loan.due_at <= as_of)
+
+
+def bench_loan_due_index(member_count=100_000, loans_per_member=3, queries=200):
+    """Time overdue/next-due queries, renewals and returns against a scan of every loan."""
+    rng = random.Random(5)
+    book_count = member_count * loans_per_member
+    books = [(f"BENCH-{number:08d}", f"Book {number}", "Author", "Mystery", 1, 0) for number in range(book_count)]
+    members = [(f"RAM{number + 1:03d}", f"Member {number}", f"member{number}@email.com",
+                [books[number * loans_per_member + offset][0] for offset in range(loans_per_member)])
+               for number in range(member_count)]
+    horizon = 10 ** 9
+    loan_dates = [(0.0, rng.uniform(0, horizon)) for _ in range(book_count)]
+    library = RamataMiniLibraryManagementSystem(event_sink=None)
+    library.ramata_background_indexing = False
+    library.load_state({'books': books, 'members': members, 'loan_dates': loan_dates,
+                        'next_member_id': member_count + 1})
+    # Cutoffs that catch about 100 overdue loans each
+    cutoffs = [horizon * 100 / book_count * rng.uniform(0.5, 1.5) for _ in range(queries)]
+
+    start = time.perf_counter()
+    for as_of in cutoffs:
+        library.get_overdue_loans(as_of)
+    indexed_ms = (time.perf_counter() - start) / queries * 1e3
+    start = time.perf_counter()
+    for as_of in cutoffs[:5]:
+        _overdue_by_scan(library, as_of)
+    scan_ms = (time.perf_counter() - start) / 5 * 1e3
+    print(f"overdue (~100 of {book_count:,} loans): index {indexed_ms:7.3f} ms   scan {scan_ms:8.1f} ms")
+
+    start = time.perf_counter()
+    for _ in range(queries):
+        library.get_next_due_loans(20)
+    print(f"next 20 due:            {(time.perf_counter() - start) / queries * 1e3:7.3f} ms")
+
+    renewals = [members[rng.randrange(member_count)] for _ in range(queries * 10)]
+    start = time.perf_counter()
+    for member_id, _, _, isbns in renewals:
+        library.renew_loan(member_id, isbns[0])
+    print(f"renew_loan:             {(time.perf_counter() - start) / len(renewals) * 1e6:7.1f} us")
+
+    start = time.perf_counter()
+    for member_id, _, _, isbns in members[:queries * 10]:
+        library.return_book(member_id, isbns[-1])
+    print(f"return_book:            {(time.perf_counter() - start) / (queries * 10) * 1e6:7.1f} us")
+
+
+def bench_reservation_waitlist(queue_sizes=(2_000, 20_000, 200_000), handoffs=1_000, lookups=200):
+    """Time handing one copy down waitlists of growing length, and position lookups at the back."""
+    for queue_size in queue_sizes:
+        member_ids = [f"RAM{number + 1:03d}" for number in range(queue_size + 1)]
+        library = RamataMiniLibraryManagementSystem(event_sink=None)
+        library.load_state({
+            'books': [("BENCH-POPULAR", "Popular Book", "Author", "Romance", 1, 0)],
+            'members': [(member_id, f"Member {member_id}", f"{member_id.lower()}@email.com",
+                         ["BENCH-POPULAR"] if number == 0 else [])
+                        for number, member_id in enumerate(member_ids)],
+            'next_member_id': len(member_ids) + 1,
+            'waitlists': [("BENCH-POPULAR", member_id) for member_id in member_ids[1:]],
+        })
+
+        # Each handoff returns the copy, holds it for the head of the queue and lets them collect it
+        start = time.perf_counter()
+        for holder, head in zip(member_ids, member_ids[1:handoffs + 1]):
+            library.return_book(holder, "BENCH-POPULAR")
+            library.borrow_book(head, "BENCH-POPULAR")
+        handoff_us = (time.perf_counter() - start) / handoffs * 1e6
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            library.get_reservation_position(member_ids[-1], "BENCH-POPULAR")
+        position_us = (time.perf_counter() - start) / lookups * 1e6
+        print(f"queue {queue_size:>7,}: return + collect hold {handoff_us:6.1f} us   "
+              f"last member's position {position_us:9.1f} us")
+
+
+def _bytes_per_record(make_record, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [make_record(number) for number in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the records is not part of the record cost
+    return (after - before - records.__sizeof__()) / count
+
+
+def bench_record_memory(count=100_000):
+    """Report bytes per book/member record for the old dict layout and the slotted records."""
+    title, author, genre, name, email = "Big Magic", "Elizabeth Gilbert", "Self-Help", "Fatmata", "f@email.com"
+    layouts = [
+        ("book dict", lambda n: {'title': title, 'author': author, 'genre': genre,
+                                 'total_copies': n, 'available_copies': n}),
+        ("RamataBook", lambda n: RamataBook(title, author, genre, n, n)),
+        ("member dict", lambda n: {'member_id': name, 'name': name, 'email': email, 'borrowed_books': []}),
+        ("RamataMember", lambda n: RamataMember(name, name, email, [])),
+    ]
+    print(f"{'layout':>14} {'bytes/record':>14}")
+    for label, make_record in layouts:
+        print(f"{label:>14} {_bytes_per_record(make_record, count):>14.1f}")
+
+
+def _inventory_report_by_loop(library):
+    copies_out_by_genre = dict.fromkeys(library.ramata_valid_genres, 0)
+    fully_checked_out = []
+    total_copies = available_copies = 0
+    for isbn, book in library.ramata_books.items():
+        copies_out_by_genre[book['genre']] += book['total_copies'] - book['available_copies']
+        if book['total_copies'] and not book['available_copies']:
+            fully_checked_out.append(isbn)
+        total_copies += book['total_copies']
+        available_copies += book['available_copies']
+    return copies_out_by_genre, fully_checked_out, (total_copies - available_copies) / total_copies
+
+
+def bench_inventory_report(book_count=100_000, repeats=10):
+    """Compare the columnar inventory report with a per-book Python loop."""
+    library = build_library(book_count)
+    for number in range(0, book_count, 3):
+        isbn = f"BENCH-{number:08d}"
+        library.ramata_books[isbn].available_copies -= 1
+        library.ramata_inventory.adjust_available(isbn, -1)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        library.get_inventory_report()
+    columnar = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        _inventory_report_by_loop(library)
+    loop = (time.perf_counter() - start) / repeats
+    print(f"{book_count:,} books: columnar {columnar * 1e3:.1f} ms, python loop {loop * 1e3:.1f} ms")
+
+
+def bench_live_stats(book_counts=(10_000, 100_000), borrows=5_000, repeats=100):
+    """Compare get_stats() with the full recount check_stats() runs, as the catalog grows."""
+    for book_count in book_counts:
+        library = build_library(book_count)
+        for number in range(borrows // 3):
+            library.add_member(f"Member {number}", f"member{number}@email.com")
+        isbns = list(library.ramata_books)
+        rng = random.Random(book_count)
+        for member_id in library.ramata_members:
+            for isbn in rng.sample(isbns[:1_000], 3):
+                library.borrow_book(member_id, isbn)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            library.get_stats()
+        live_us = (time.perf_counter() - start) / repeats * 1e6
+
+        start = time.perf_counter()
+        library.check_stats()
+        recount_ms = (time.perf_counter() - start) * 1e3
+        print(f"{book_count:>9,} books: get_stats {live_us:6.1f} us   full recount {recount_ms:8.1f} ms")
+
+
+def bench_concurrent_circulation(thread_counts=(1, 2, 4, 8), ops_per_thread=20_000):
+    """Run borrow/return cycles from several threads and report total throughput."""
+    print(f"{'threads':>8} {'ops/sec':>12}")
+    for thread_count in thread_counts:
+        library = build_library(1_000)
+        for number in range(thread_count * 10):
+            library.add_member(f"Member {number}", f"member{number}@email.com")
+        member_ids = list(library.ramata_members)
+        isbns = list(library.ramata_books)
+
+        def circulate(worker):
+            # Each desk serves its own members, so threads only share book stripes
+            _borrow_return_cycle(library, member_ids[worker::thread_count], isbns[worker::thread_count],
+                                 ops_per_thread // 2)
+
+        threads = [threading.Thread(target=circulate, args=(worker,)) for worker in range(thread_count)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"{thread_count:>8} {thread_count * ops_per_thread / elapsed:>12,.0f}")
+
+
+def bench_cart_checkout(carts=20_000, cart_size=3):
+    """Compare per-book borrow/return calls with one borrow_books/return_books per cart."""
+    library = build_library(1_000)
+    library.add_member("Desk Member", "desk@email.com")
+    member_id = next(iter(library.ramata_members))
+    isbns = list(library.ramata_books)
+    carts_list = [isbns[i * cart_size % len(isbns):][:cart_size] for i in range(carts)]
+
+    start = time.perf_counter()
+    for cart in carts_list:
+        for isbn in cart:
+            library.borrow_book(member_id, isbn)
+        for isbn in cart:
+            library.return_book(member_id, isbn)
+    per_book = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for cart in carts_list:
+        library.borrow_books(member_id, cart)
+        library.return_books(member_id, cart)
+    per_cart = time.perf_counter() - start
+
+    print(f"{'mode':>10} {'µs/cart':>10}")
+    print(f"{'per book':>10} {per_book / carts * 1e6:>10.1f}")
+    print(f"{'per cart':>10} {per_cart / carts * 1e6:>10.1f}")
+
+
+# Catalog sizes (books, and as many members) for the core operation suite
+RAMATA_SUITE_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+RAMATA_SUITE_OPERATIONS = ("add_book", "add_member", "search_books_hit", "search_books_miss", "borrow_book",
+                           "return_book", "update_book", "update_member", "delete_book", "delete_member")
+
+
+def _latency_summary(latencies_ns):
+    latencies_ns = sorted(latencies_ns)
+
+    def percentile(fraction):
+        return latencies_ns[min(len(latencies_ns) - 1, int(len(latencies_ns) * fraction))] / 1e3
+
+    return {
+        'ops_per_sec': len(latencies_ns) / (sum(latencies_ns) / 1e9),
+        'p50_us': percentile(0.50),
+        'p95_us': percentile(0.95),
+        'p99_us': percentile(0.99),
+        'max_us': latencies_ns[-1] / 1e3,
+    }
+
+
+def _timed_calls(method, calls):
+    latencies = []
+    clock = time.perf_counter_ns
+    for args in calls:
+        start = clock()
+        method(*args)
+        latencies.append(clock() - start)
+    return latencies
+
+
+def _measure_core_operations(size, samples):
+    """Build a catalog of size books and members, then time samples calls of every core operation."""
+    start = time.perf_counter()
+    library = build_library(size)
+    library.add_members_bulk({'name': f"Member {n}", 'email': f"member{n}@email.com"} for n in range(size))
+    build_seconds = time.perf_counter() - start
+
+    rng = random.Random(size)
+    books = list(library.ramata_books.items())
+    member_ids = rng.sample(list(library.ramata_members), min(samples, size))
+    picked_books = [books[rng.randrange(size)] for _ in range(samples)]
+    loans = [(member_id, books[number * size // len(member_ids)][0]) for number, member_id in enumerate(member_ids)]
+    new_isbns = [f"SUITE-{number:08d}" for number in range(samples)]
+
+    first_new_member = library.ramata_next_member_id
+    new_member_ids = [f"RAM{number:03d}" for number in range(first_new_member, first_new_member + samples)]
+    calls = {
+        'add_book': (library.add_book, [(isbn, f"Suite Book {n}", "Suite Author", "Mystery", 2)
+                                        for n, isbn in enumerate(new_isbns)]),
+        'add_member': (library.add_member, [(f"Suite Member {n}", f"suite{n}@email.com") for n in range(samples)]),
+        'search_books_hit': (library.search_books, [("title", book.title.split()[0]) for _, book in picked_books]),
+        'search_books_miss': (library.search_books, [("title", "no such book")] * samples),
+        'borrow_book': (library.borrow_book, loans),
+        'return_book': (library.return_book, loans),
+        'update_book': (library.update_book, [(isbn, "title", f"Renamed {isbn}") for isbn, _ in picked_books]),
+        'update_member': (library.update_member, [(member_id, "name", f"Renamed {member_id}")
+                                                  for member_id in member_ids]),
+        'delete_book': (library.delete_book, [(isbn,) for isbn in new_isbns]),
+        'delete_member': (library.delete_member, [(member_id,) for member_id in new_member_ids]),
+    }
+    operations = {name: _latency_summary(_timed_calls(*calls[name])) for name in RAMATA_SUITE_OPERATIONS}
+
+    peak_rss_mb = None
+    if resource is not None:
+        scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    return {'build_seconds': build_seconds, 'peak_rss_mb': peak_rss_mb, 'operations': operations}
+
+
+def bench_core_operations(sizes=RAMATA_SUITE_SIZES, samples=2_000):
+    """Time every core operation at each catalog size; return the machine-readable results.
+
+    Each size runs in a fresh worker process so its peak memory is its own.
+    """
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'samples': samples,
+        'sizes': {},
+    }
+    for size in sizes:
+        with ProcessPoolExecutor(max_workers=1) as worker:
+            measured = worker.submit(_measure_core_operations, size, samples).result()
+        results['sizes'][str(size)] = measured
+
+        memory = f", peak {measured['peak_rss_mb']:,.0f} MB" if measured['peak_rss_mb'] is not None else ""
+        print(f"{size:,} books and members (built in {measured['build_seconds']:.1f} s{memory})")
+        print(f"{'operation':>18} {'ops/sec':>12} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9}")
+        for name, stats in measured['operations'].items():
+            print(f"{name:>18} {stats['ops_per_sec']:>12,.0f} {stats['p50_us']:>9.1f} {stats['p95_us']:>9.1f} "
+                  f"{stats['p99_us']:>9.1f}")
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance=0.25):
+    """Print ops/sec changes against a saved run; return the (size, operation) pairs that regressed.
+
+    An operation regresses when its throughput drops by more than tolerance
+    (a fraction) at a size present in both runs.
+    """
+    regressions = []
+    print(f"{'size':>10} {'operation':>18} {'baseline':>12} {'current':>12} {'change':>8}")
+    for size, measured in results['sizes'].items():
+        saved = baseline.get('sizes', {}).get(size)
+        if saved is None:
+            continue
+        for name, stats in measured['operations'].items():
+            if name not in saved['operations']:
+                continue
+            before, after = saved['operations'][name]['ops_per_sec'], stats['ops_per_sec']
+            change = after / before - 1
+            flag = " ⚠️" if change < -tolerance else ""
+            print(f"{size:>10} {name:>18} {before:>12,.0f} {after:>12,.0f} {change:>+8.0%}{flag}")
+            if change < -tolerance:
+                regressions.append((size, name))
+    return regressions
+
+
+def bench_metrics_overhead(rounds=50_000, repeats=3):
+    """Compare borrow/return throughput with metrics off and on (best of repeats)."""
+    library = build_library(1_000)
+    for number in range(100):
+        library.add_member(f"Member {number}", f"member{number}@email.com")
+    member_ids = list(library.ramata_members)
+    isbns = list(library.ramata_books)
+
+    print(f"{'metrics':>10} {'ops/sec':>12} {'ns/op':>8}")
+    for mode, metrics in (("off", None), ("on", RamataMetrics())):
+        library.ramata_metrics = metrics
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            _borrow_return_cycle(library, member_ids, isbns, rounds)
+            best = min(best, time.perf_counter() - start)
+        print(f"{mode:>10} {2 * rounds / best:>12,.0f} {best / (2 * rounds) * 1e9:>8,.0f}")
+
+
+def run_benchmarks():
+    terminal_width = 60
+    print("=" * terminal_width)
+    print("⏱️  RAMATA LIBRARY BENCHMARKS")
+    print("=" * terminal_width)
+
+    print("\n🔍 search_books scaling")
+    print("-" * terminal_width)
+    bench_search_scaling()
+
+    print("\n🧭 Faceted search (title + genre + available, one page)")
+    print("-" * terminal_width)
+    bench_faceted_search()
+
+    print("\n🗃️  Search result cache (popular queries)")
+    print("-" * terminal_width)
+    bench_search_cache()
+
+    print("\n⌨️  Autocomplete suggestions")
+    print("-" * terminal_width)
+    bench_suggest()
+
+    print("\n🖨️  Console output overhead (stdout sent to the null device)")
+    print("-" * terminal_width)
+    bench_console_output()
+
+    print("\n📜 Catalog listing (line-buffered output)")
+    print("-" * terminal_width)
+    bench_catalog_listing()
+
+    print("\n📝 Batch command mode")
+    print("-" * terminal_width)
+    bench_batch_mode()
+
+    print("\n📥 Bulk ingest")
+    print("-" * terminal_width)
+    bench_bulk_ingest()
+
+    print("\n💾 Write-ahead log and snapshots")
+    print("-" * terminal_width)
+    bench_persistence()
+
+    print("\n📦 Binary snapshot export and load")
+    print("-" * terminal_width)
+    bench_binary_snapshot()
+
+    print("\n🗺️  Memory-mapped read-only catalog")
+    print("-" * terminal_width)
+    bench_readonly_catalog()
+
+    print("\n🧠 Record memory (tracemalloc)")
+    print("-" * terminal_width)
+    bench_record_memory()
+
+    print("\n📊 Inventory report")
+    print("-" * terminal_width)
+    bench_inventory_report()
+
+    print("\n📋 Live circulation stats")
+    print("-" * terminal_width)
+    bench_live_stats()
+
+    print("\n🧵 Concurrent circulation desks")
+    print("-" * terminal_width)
+    bench_concurrent_circulation()
+
+    print("\n⏰ Loan due dates")
+    print("-" * terminal_width)
+    bench_loan_due_index()
+
+    print("\n🎟️  Reservation waitlists")
+    print("-" * terminal_width)
+    bench_reservation_waitlist()
+
+    print("\n🛒 Multi-item checkout")
+    print("-" * terminal_width)
+    bench_cart_checkout()
+
+    print("\n📈 Metrics overhead")
+    print("-" * terminal_width)
+    bench_metrics_overhead()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ramata Library benchmarks")
+    parser.add_argument("--suite", action="store_true",
+                        help="time every core operation at several catalog sizes instead of the showcase benchmarks")
+    parser.add_argument("--sharding", action="store_true",
+                        help="measure ingest and search scaling across shard processes instead")
+    parser.add_argument("--books", type=int, default=2_000_000, help="catalog size for --sharding")
+    parser.add_argument("--sizes", type=int, nargs="+", default=RAMATA_SUITE_SIZES)
+    parser.add_argument("--samples", type=int, default=2_000, help="timed calls per operation and size")
+    parser.add_argument("--json", help="write the suite results to this file")
+    parser.add_argument("--baseline", help="compare against results saved earlier with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed ops/sec drop before a regression is reported (fraction)")
+    args = parser.parse_args(argv)
+
+    if args.sharding:
+        bench_sharded_scaling(args.books)
+        return 0
+
+    if not args.suite:
+        run_benchmarks()
+        return 0
+
+    results = bench_core_operations(args.sizes, args.samples)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        print()
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"⚠️  {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+        print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from operations import RamataMiniLibraryManagementSystem
+from operations import RamataMiniLibraryManagementSystem, print_ramata_event
 
 
 def run_demo():
@@ -7,7 +7,8 @@ def run_demo():
     print("🏛️  RAMATA MINI LIBRARY MANAGEMENT SYSTEM - DEMO 🏛️")
     print("=" * terminal_width)
 
-    ramata_library = RamataMiniLibraryManagementSystem()
+    # Render every library message on the console
+    ramata_library = RamataMiniLibraryManagementSystem(event_sink=print_ramata_event)
 
     # Demo 1: Add Books
     print("\n1. ADDING WOMEN-FOCUSED BOOKS")
@@ -0,0 +1,100 @@
+import argparse
+import csv
+import json
+import sys
+
+from operations import RamataCode, RamataMiniLibraryManagementSystem
+from persistence import RamataPersistentStore
+
+
+def read_rows(path, file_format=None, on_reject=None):
+    """Yield one dict per CSV/JSONL record without loading the whole file.
+
+    A JSONL line that is not valid JSON or not a JSON object is skipped and
+    passed to on_reject(line_number, line, code, message) instead.
+    """
+    if file_format is None:
+        file_format = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+    with open(path, newline="", encoding="utf-8") as handle:
+        if file_format == "csv":
+            yield from csv.DictReader(handle)
+            return
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as error:
+                _reject_line(on_reject, line_number, line, f"Line {line_number} is not valid JSON: {error.msg}")
+                continue
+            if not isinstance(row, dict):
+                _reject_line(on_reject, line_number, line, f"Line {line_number} is not a JSON object!")
+                continue
+            yield row
+
+
+def _reject_line(on_reject, line_number, line, message):
+    if on_reject is not None:
+        on_reject(line_number, line, RamataCode.BAD_REQUEST, message)
+
+
+def strip_fields(rows):
+    """Trim surrounding whitespace from every string field."""
+    for row in rows:
+        yield {key: value.strip() if isinstance(value, str) else value for key, value in row.items()}
+
+
+def ingest(library, kind, path, file_format=None, on_reject=None):
+    """Stream a books/members file into the library; return added/rejected counts.
+
+    Unreadable JSONL lines are reported by line number and counted as
+    rejected; rows the library rejects are numbered by record.
+    """
+    unreadable = 0
+
+    def reject_line(line_number, line, code, message):
+        nonlocal unreadable
+        unreadable += 1
+        if on_reject is not None:
+            on_reject(line_number, line, code, message)
+
+    rows = strip_fields(read_rows(path, file_format, reject_line))
+    if kind == "books":
+        summary = library.add_books_bulk(rows, on_reject)
+    else:
+        summary = library.add_members_bulk(rows, on_reject)
+    return {'added': summary['added'], 'rejected': summary['rejected'] + unreadable}
+
+
+def _report_reject(row_number, row, code, message):
+    print(f"row {row_number}: {code}: {message}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load books or members into the Ramata Library")
+    parser.add_argument("kind", choices=("books", "members"))
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="defaults to the file extension")
+    parser.add_argument("--data-dir", help="persist the loaded rows in this library data directory")
+    parser.add_argument("--fsync-every", type=int, default=10_000, help="log entries per fsync")
+    args = parser.parse_args(argv)
+
+    store = None
+    if args.data_dir:
+        store = RamataPersistentStore(args.data_dir, fsync_every=args.fsync_every)
+        library = store.open()
+    else:
+        library = RamataMiniLibraryManagementSystem(event_sink=None)
+    try:
+        summary = ingest(library, args.kind, args.path, args.format, on_reject=_report_reject)
+    finally:
+        if store is not None:
+            store.close()
+    print(f"✅ {summary['added']} {args.kind} added, {summary['rejected']} row(s) rejected")
+    return 0 if summary['rejected'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in microseconds; slower calls land in +Inf
+RAMATA_LATENCY_BUCKETS_US = (5, 10, 25, 50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 100_000)
+
+
+class _RamataOperationStats:
+    __slots__ = ("failures", "counts")
+
+    def __init__(self, bucket_count):
+        self.failures = {}
+        # Latency bucket counts (the last one is +Inf) followed by the total in ns
+        self.counts = [0] * (bucket_count + 2)
+
+
+class RamataMetrics:
+    """Per-operation call and failure counters plus latency histograms.
+
+    Attach an instance as library.ramata_metrics; every core operation then
+    reports its result code and duration through observe(). Recording costs
+    one bisect and one uncontended lock per call.
+    """
+
+    def __init__(self, buckets_us=RAMATA_LATENCY_BUCKETS_US):
+        self.buckets_us = tuple(buckets_us)
+        self._bounds_ns = [bound * 1_000 for bound in self.buckets_us]
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def observe(self, operation, ok, code, elapsed_ns):
+        bucket = bisect_left(self._bounds_ns, elapsed_ns)
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = _RamataOperationStats(len(self._bounds_ns))
+            counts = stats.counts
+            counts[bucket] += 1
+            counts[-1] += elapsed_ns
+            if not ok:
+                stats.failures[code] = stats.failures.get(code, 0) + 1
+
+    def snapshot(self):
+        """Return a consistent copy of every counter as plain dicts and lists.
+
+        Latency buckets are cumulative (upper bound in seconds, calls at or
+        under it), ending with float('inf'), as Prometheus expects.
+        """
+        bounds = [bound / 1e6 for bound in self.buckets_us] + [float("inf")]
+        with self._lock:
+            snapshot = {}
+            for operation, stats in sorted(self._operations.items()):
+                cumulative, calls = [], 0
+                for bound, count in zip(bounds, stats.counts):
+                    calls += count
+                    cumulative.append((bound, calls))
+                snapshot[operation] = {
+                    'calls': calls,
+                    'failures': dict(sorted(stats.failures.items())),
+                    'latency_sum_seconds': stats.counts[-1] / 1e9,
+                    'latency_buckets': cumulative,
+                }
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+
+def _prometheus_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def render_prometheus(snapshot):
+    """Render a RamataMetrics snapshot in the Prometheus text exposition format."""
+    lines = [
+        "# HELP ramata_operation_calls_total Core library operation calls.",
+        "# TYPE ramata_operation_calls_total counter",
+    ]
+    for operation, stats in snapshot.items():
+        lines.append(f'ramata_operation_calls_total{{operation="{operation}"}} {stats["calls"]}')
+
+    lines += [
+        "# HELP ramata_operation_failures_total Failed core library operation calls by result code.",
+        "# TYPE ramata_operation_failures_total counter",
+    ]
+    for operation, stats in snapshot.items():
+        for code, count in stats['failures'].items():
+            lines.append(f'ramata_operation_failures_total{{operation="{operation}",code="{code}"}} {count}')
+
+    lines += [
+        "# HELP ramata_operation_latency_seconds Core library operation latency.",
+        "# TYPE ramata_operation_latency_seconds histogram",
+    ]
+    for operation, stats in snapshot.items():
+        for bound, count in stats['latency_buckets']:
+            lines.append(f'ramata_operation_latency_seconds_bucket{{operation="{operation}",'
+                         f'le="{_prometheus_bound(bound)}"}} {count}')
+        lines.append(f'ramata_operation_latency_seconds_sum{{operation="{operation}"}} '
+                     f'{stats["latency_sum_seconds"]!r}')
+        lines.append(f'ramata_operation_latency_seconds_count{{operation="{operation}"}} {stats["calls"]}')
+    return "\n".join(lines) + "\n"
+
+
+def start_prometheus_exporter(library, host="127.0.0.1", port=9464):
+    """Serve library.get_metrics() at /metrics from a daemon thread; return the HTTP server."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(library.get_metrics()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
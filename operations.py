@@ -1,17 +1,1393 @@
+import argparse
+import contextlib
+import csv
+import functools
+import gc
+import heapq
+import json
+import operator
+import os
 import shutil
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque, namedtuple
+from itertools import accumulate, compress, repeat
+
+try:
+    import numpy
+except ImportError:  # inventory reports fall back to builtin passes over the columns
+    numpy = None
+
+# Length of the n-grams stored in the title/author search indexes; shorter
+# search terms are checked against every candidate book instead
+RAMATA_NGRAM_SIZE = 3
+
+# Lock stripes for members and for ISBNs; unrelated checkouts rarely share one
+RAMATA_LOCK_STRIPES = 64
+
+# Member rows validated per ID-range allocation during bulk ingest
+RAMATA_BULK_CHUNK_SIZE = 1000
+
+# Bulk-loaded books added to the text indexes per hold of the catalog lock
+RAMATA_INDEX_CHUNK_SIZE = 250
+
+# Search result pages kept by the LRU search cache
+RAMATA_SEARCH_CACHE_SIZE = 1024
+
+# Completions kept per autocomplete trie node, and the most keys a trie
+# leaf holds before it splits into a child per next character
+RAMATA_SUGGEST_TOP = 10
+RAMATA_SUGGEST_BUCKET_SIZE = 64
+
+# Seconds a loan runs, from borrowing or renewal, before it is due back
+RAMATA_LOAN_PERIOD = 14 * 24 * 60 * 60
+
+# Seconds a copy stays held for the member at the head of its waitlist
+RAMATA_HOLD_PERIOD = 3 * 24 * 60 * 60
+
+# Titles listed as most borrowed by get_stats()
+RAMATA_TOP_BORROWED = 10
+
+# Records rendered per write when listing all books or members
+RAMATA_DISPLAY_CHUNK_SIZE = 200
+
+# Binary snapshot header: magic, format version, flags, book, member and
+# loan counts, next member ID and the CRC-32 of the header fields before it
+# and everything after the header. With the indexed flag the last sections
+# hold the genre postings (2), title and author trigram postings (3 each)
+# and the suggestion trie (14); without it they are empty and the text is
+# indexed after loading
+RAMATA_SNAPSHOT_MAGIC = b"RMLS"
+RAMATA_SNAPSHOT_VERSION = 2
+RAMATA_SNAPSHOT_INDEXED = 1
+_RAMATA_SNAPSHOT_INDEX_SECTIONS = 22
+_RAMATA_SNAPSHOT_SECTIONS = 21 + _RAMATA_SNAPSHOT_INDEX_SECTIONS
+_RAMATA_SNAPSHOT_HEADER = struct.Struct("<4sHHQQQQI")
+_RAMATA_SNAPSHOT_SECTION = struct.Struct("<Q")
+
+# Fields iter_books/iter_members can sort by
+RAMATA_BOOK_SORT_FIELDS = ("isbn", "title", "author", "genre", "total_copies", "available_copies")
+RAMATA_MEMBER_SORT_FIELDS = ("member_id", "name", "email")
+
+# Console prefix for each event kind
+RAMATA_EVENT_ICONS = {
+    "success": "✅",
+    "error": "❌",
+    "info": "ℹ️ ",
+    "warning": "⚠️ ",
+    "book": "📚",
+    "member": "👤",
+    "search": "🔍",
+    "update": "✏️ ",
+    "delete": "🗑️ ",
+    "borrow": "📖",
+    "return": "📚",
+}
+
+# A message produced by a library operation; headings open an operation
+RamataEvent = namedtuple("RamataEvent", ["kind", "message", "heading"])
+
+
+def print_ramata_event(event):
+    """Event sink that renders events on the console, emoji and all."""
+    if event.heading:
+        print()
+        print(f"{RAMATA_EVENT_ICONS[event.kind]} {event.message}")
+        print()
+    else:
+        print(f"{RAMATA_EVENT_ICONS[event.kind]} {event.message}")
+
+
+class RamataCode:
+    """Result codes returned by the core library operations."""
+    OK = "ok"
+    MISSING_FIELDS = "missing_fields"
+    DUPLICATE_ISBN = "duplicate_isbn"
+    DUPLICATE_EMAIL = "duplicate_email"
+    INVALID_GENRE = "invalid_genre"
+    INVALID_COPIES = "invalid_copies"
+    INVALID_FIELD = "invalid_field"
+    INVALID_SEARCH_TYPE = "invalid_search_type"
+    BOOK_NOT_FOUND = "book_not_found"
+    MEMBER_NOT_FOUND = "member_not_found"
+    BOOK_BORROWED = "book_borrowed"
+    MEMBER_HAS_LOANS = "member_has_loans"
+    BORROW_LIMIT = "borrow_limit"
+    NO_COPIES = "no_copies"
+    ALREADY_BORROWED = "already_borrowed"
+    NOT_BORROWED = "not_borrowed"
+    ALREADY_RESERVED = "already_reserved"
+    NOT_RESERVED = "not_reserved"
+    BOOK_AVAILABLE = "book_available"
+    READ_ONLY = "read_only"
+    UNKNOWN_OPERATION = "unknown_operation"
+    BAD_REQUEST = "bad_request"
+    UNEXPECTED_ERROR = "unexpected_error"
+
+
+class RamataJournalError(Exception):
+    """Raised by a journal that could not log a mutation; code is the RamataCode to fail it with."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class RamataResult:
+    """Outcome of a core operation; truthy when the operation succeeded."""
+    __slots__ = ("ok", "code", "message", "data")
+
+    def __init__(self, ok, code=RamataCode.OK, message="", data=None):
+        self.ok = ok
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f"RamataResult(ok={self.ok!r}, code={self.code!r}, message={self.message!r}, data={self.data!r})"
+
+    def to_dict(self):
+        return {'ok': self.ok, 'code': self.code, 'message': self.message, 'data': self.data}
+
+
+class _RamataRecord:
+    """Slotted record that also answers dict-style reads (record['title'])."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __eq__(self, other):
+        if isinstance(other, _RamataRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+        return self.__slots__
+
+    def values(self):
+        return [getattr(self, key) for key in self.__slots__]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.__slots__]
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class RamataBook(_RamataRecord):
+    """A catalog entry, keyed by ISBN in ramata_books."""
+    __slots__ = ("title", "author", "genre", "total_copies", "available_copies")
+
+    def __init__(self, title, author, genre, total_copies, available_copies):
+        self.title = title
+        self.author = author
+        self.genre = genre
+        self.total_copies = total_copies
+        self.available_copies = available_copies
+
+
+class RamataLoan(_RamataRecord):
+    """When a loan was taken out and when it is due back, in clock seconds."""
+    __slots__ = ("borrowed_at", "due_at")
+
+    def __init__(self, borrowed_at, due_at):
+        self.borrowed_at = borrowed_at
+        self.due_at = due_at
+
+
+class RamataLoanSet:
+    """The ISBNs a member holds: O(1) membership, add and discard, kept in borrowing order.
+
+    Each ISBN maps to its RamataLoan, or None for loans of stand-in members
+    built without dates.
+    """
+    __slots__ = ("_isbns",)
+
+    def __init__(self, isbns=()):
+        self._isbns = dict.fromkeys(isbns)
+
+    def __contains__(self, isbn):
+        return isbn in self._isbns
+
+    def __iter__(self):
+        return iter(self._isbns)
+
+    def __len__(self):
+        return len(self._isbns)
+
+    def __eq__(self, other):
+        if isinstance(other, RamataLoanSet):
+            return list(self._isbns) == list(other._isbns)
+        if isinstance(other, (list, tuple)):
+            return list(self._isbns) == list(other)
+        if isinstance(other, (set, frozenset)):
+            return self._isbns.keys() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self._isbns))
+
+    def add(self, isbn, loan=None):
+        self._isbns[isbn] = loan
+
+    def discard(self, isbn):
+        self._isbns.pop(isbn, None)
+
+    def loan(self, isbn):
+        """The RamataLoan for isbn, or None."""
+        return self._isbns.get(isbn)
+
+
+class RamataMember(_RamataRecord):
+    """A registered member and the ISBNs they currently hold."""
+    __slots__ = ("member_id", "name", "email", "borrowed_books")
+
+    def __init__(self, member_id, name, email, borrowed_books):
+        self.member_id = member_id
+        self.name = name
+        self.email = email
+        self.borrowed_books = RamataLoanSet(borrowed_books)
+
+
+class RamataSearchCache:
+    """Bounded LRU of search result pages, each valid only at the catalog version it was computed at.
+
+    Every change to titles, authors or genres bumps the library's catalog
+    version, so a page computed before the change can never be served after
+    it; stale entries are dropped when next looked up or evicted.
+    """
+
+    def __init__(self, capacity=RAMATA_SEARCH_CACHE_SIZE):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, version, results):
+        if self.capacity <= 0:
+            return
+        self._entries[key] = (version, results)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'capacity': self.capacity,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class _RamataTrieNode:
+    __slots__ = ("label", "children", "top", "entries")
+
+    def __init__(self, label=""):
+        # Characters on the edge from the parent; a run no key branches in
+        # is one edge
+        self.label = label
+        # None while the node is a leaf; first label character -> child once
+        # it splits
+        self.children = None
+        # Best (-score, completion) pairs at or below this node, best first
+        self.top = []
+        # (key, completion) -> score stored here: a leaf holds every key
+        # under its prefix, a split node only the keys ending at it
+        self.entries = {}
+
+
+class _RamataStoredTrieNode(_RamataTrieNode):
+    """A trie node loaded from a snapshot, decoded the first time it is visited."""
+    __slots__ = ("_stored", "_record")
+
+    def __init__(self, stored, record):
+        # The node's own slots stay unset until first read
+        self._stored = stored
+        self._record = record
+
+    def __getattr__(self, name):
+        # Only reached for a slot that is still unset
+        if name == "entries":
+            self.entries = self._stored.entries(self._record)
+        elif name in ("label", "children", "top"):
+            self.label, self.children, self.top = self._stored.node(self._record)
+        else:
+            raise AttributeError(name)
+        return getattr(self, name)
+
+
+class _RamataStoredTrie:
+    """The suggestion trie as RamataSuggestIndex.pack() writes it: breadth-first node columns.
+
+    Completions are numbered in (kind, text) order, authors before titles,
+    and name a loaded book carrying the text, so no completion text is
+    stored twice. Children of a node are consecutive records, and an
+    entry's key is stored as its length: it is the tail of the
+    completion's lowercased text.
+    """
+
+    def __init__(self, sections, titles, authors):
+        (labels, child_starts, child_counts, top_ends, top_completions, top_scores, entry_ends,
+         entry_completions, entry_lengths, entry_scores, author_books, title_books, counts, copies) = sections
+        self.labels = _ramata_unpack_strings(labels, 1)
+        self.child_starts, self.child_counts, self.top_ends, self.entry_ends = (
+            _ramata_unpack_numbers('q', column) for column in (child_starts, child_counts, top_ends, entry_ends))
+        self.top_completions, self.top_scores = (_ramata_unpack_numbers('q', column)
+                                                 for column in (top_completions, top_scores))
+        self.entry_completions, self.entry_lengths, self.entry_scores = (
+            _ramata_unpack_numbers('q', column) for column in (entry_completions, entry_lengths, entry_scores))
+        self.author_books, self.title_books, self.counts, self.copies = (
+            _ramata_unpack_numbers('q', column) for column in (author_books, title_books, counts, copies))
+        self.titles, self.authors = titles, authors
+        node_count = len(self.labels)
+        if not (len(self.child_starts) == len(self.child_counts) == len(self.top_ends) == len(self.entry_ends)
+                == node_count) or node_count == 0:
+            raise ValueError(f"{node_count} suggestion nodes with mismatched columns")
+        if not (len(self.top_completions) == len(self.top_scores) == self.top_ends[-1] and
+                len(self.entry_completions) == len(self.entry_lengths) == len(self.entry_scores)
+                == self.entry_ends[-1] and len(self.counts) == len(self.copies) ==
+                len(self.author_books) + len(self.title_books)):
+            raise ValueError("suggestion columns do not add up")
+        book_count = len(titles)
+        if (max(map(operator.add, self.child_starts, self.child_counts), default=0) > node_count or
+                max(self.top_completions, default=-1) >= len(self.counts) or
+                max(self.entry_completions, default=-1) >= len(self.counts) or
+                max(self.author_books, default=-1) >= book_count or max(self.title_books, default=-1) >= book_count):
+            raise ValueError("suggestion records point past their columns")
+
+    def completion(self, number):
+        if number < len(self.author_books):
+            return "author", self.authors[self.author_books[number]]
+        return "title", self.titles[self.title_books[number - len(self.author_books)]]
+
+    def find(self, completion):
+        """The number of a stored completion, or None."""
+        kind, text = completion
+        books, texts, first = ((self.author_books, self.authors, 0) if kind == "author" else
+                               (self.title_books, self.titles, len(self.author_books)))
+        low, high = 0, len(books)
+        while low < high:
+            middle = (low + high) // 2
+            if texts[books[middle]] < text:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(books) and texts[books[low]] == text:
+            return first + low
+        return None
+
+    def node(self, record):
+        """A node's label, children (None for a leaf) and top list."""
+        count = self.child_counts[record]
+        children = None
+        if count >= 0:
+            start = self.child_starts[record]
+            children = {self.labels[child][0]: _RamataStoredTrieNode(self, child)
+                        for child in range(start, start + count)}
+        start, end = self.top_ends[record - 1] if record else 0, self.top_ends[record]
+        top = [(-score, self.completion(number))
+               for number, score in zip(self.top_completions[start:end], self.top_scores[start:end])]
+        return self.labels[record], children, top
+
+    def entries(self, record):
+        start, end = self.entry_ends[record - 1] if record else 0, self.entry_ends[record]
+        entries = {}
+        for number, length, score in zip(self.entry_completions[start:end], self.entry_lengths[start:end],
+                                         self.entry_scores[start:end]):
+            completion = self.completion(number)
+            lowered = completion[1].lower()
+            entries[(lowered[len(lowered) - length:], completion)] = score
+        return entries
+
+
+class RamataSuggestIndex:
+    """Prefix trie of title and author words for as-you-type suggestions.
+
+    Each title or author is reachable from the start of every word in it.
+    Keys collect in leaves of up to RAMATA_SUGGEST_BUCKET_SIZE, and a full
+    leaf splits where its keys branch, so the trie reaches as deep as the
+    keys need and runs of characters no key branches in are single edges.
+    Every node keeps its RAMATA_SUGGEST_TOP best completions, so a lookup
+    costs the prefix length plus k, plus one leaf filtered when the prefix
+    runs past the trie. A lowered score repairs a node's top list from its
+    own entries, at most a leaf's worth, and its children's top lists
+    rather than from every key below it. Completions are
+    (kind, text) pairs ranked by the total copies of the books carrying
+    that text, the catalog's own measure of demand.
+    """
+
+    def __init__(self, top=RAMATA_SUGGEST_TOP, bucket_size=RAMATA_SUGGEST_BUCKET_SIZE):
+        self.top_size = top
+        self.bucket_size = bucket_size
+        self._root = _RamataTrieNode()
+        # (kind, text) -> [number of books with it, their total copies];
+        # after load() only those updated since, the rest read from _stored
+        self._totals = {}
+        self._stored = None
+
+    def add(self, kind, text, copies):
+        totals = self._totals_of((kind, text))
+        if totals is None:
+            totals = self._totals[(kind, text)] = [0, 0]
+        old = totals[1] if totals[0] else None
+        totals[0] += 1
+        totals[1] += copies
+        self._set_score((kind, text), old, totals[1])
+
+    def remove(self, kind, text, copies):
+        totals = self._totals_of((kind, text))
+        old = totals[1]
+        totals[0] -= 1
+        totals[1] -= copies
+        if totals[0] == 0:
+            # Emptied stored totals stay, so the snapshot's are not read back
+            if self._stored is None or self._stored.find((kind, text)) is None:
+                del self._totals[(kind, text)]
+            self._set_score((kind, text), old, None)
+        else:
+            self._set_score((kind, text), old, totals[1])
+
+    def adjust(self, kind, text, delta):
+        totals = self._totals_of((kind, text))
+        old = totals[1]
+        totals[1] += delta
+        self._set_score((kind, text), old, totals[1])
+
+    def suggest(self, prefix, k=5):
+        """Return up to k (text, kind) completions for prefix, best first."""
+        prefix = prefix.lower().lstrip()
+        k = min(k, self.top_size)
+        if not prefix or k <= 0:
+            return []
+        node, depth = self._root, 0
+        while depth < len(prefix):
+            if node.children is None:
+                # The leaf holds every key under the prefix walked so far
+                ranked = self._rank(((-score, completion) for (key, completion), score
+                                     in node.entries.items() if key.startswith(prefix)), k)
+                return [(text, kind) for _, (kind, text) in ranked]
+            node = node.children.get(prefix[depth])
+            # The prefix may end part-way along the edge
+            if node is None or not (prefix.startswith(node.label, depth) or
+                                    node.label.startswith(prefix[depth:])):
+                return []
+            depth += len(node.label)
+        return [(text, kind) for _, (kind, text) in node.top[:k]]
+
+    def clear(self):
+        self._root = _RamataTrieNode()
+        self._totals.clear()
+        self._stored = None
+
+    def load(self, stored):
+        """Replace the contents with a _RamataStoredTrie; its nodes are decoded as they are visited."""
+        self._root = _RamataStoredTrieNode(stored, 0)
+        self._totals.clear()
+        self._stored = stored
+
+    def pack(self, title_positions, author_positions):
+        """Snapshot sections for _RamataStoredTrie; the positions map each title or author to a book carrying it."""
+        totals = dict(self._all_totals())
+        authors = sorted(text for kind, text in totals if kind == "author")
+        titles = sorted(text for kind, text in totals if kind == "title")
+        # Per kind, so lookups hash only the text, whose hash is cached
+        numbers = {"author": dict(zip(authors, range(len(authors)))),
+                   "title": dict(zip(titles, range(len(authors), len(authors) + len(titles))))}
+        labels, child_starts, child_counts = [], array('q'), array('q')
+        top_ends, top_completions, top_scores = array('q'), array('q'), array('q')
+        entry_ends, entry_completions, entry_lengths, entry_scores = array('q'), array('q'), array('q'), array('q')
+        nodes = [self._root]
+        # Breadth first, so each node's children are consecutive records
+        for node in nodes:
+            labels.append(node.label)
+            if node.children is None:
+                child_starts.append(0)
+                child_counts.append(-1)
+            else:
+                child_starts.append(len(nodes))
+                child_counts.append(len(node.children))
+                nodes.extend(node.children.values())
+            top_completions.extend([numbers[kind][text] for _, (kind, text) in node.top])
+            top_scores.extend([-negative_score for negative_score, _ in node.top])
+            top_ends.append(len(top_completions))
+            if node.entries:
+                keys, owners = zip(*node.entries)
+                entry_completions.extend([numbers[kind][text] for kind, text in owners])
+                entry_lengths.extend(map(len, keys))
+                entry_scores.extend(node.entries.values())
+            entry_ends.append(len(entry_completions))
+        completions = [("author", text) for text in authors] + [("title", text) for text in titles]
+        return [_ramata_pack_strings(labels),
+                *(_ramata_pack_numbers('q', column) for column in (
+                    child_starts, child_counts, top_ends, top_completions, top_scores, entry_ends,
+                    entry_completions, entry_lengths, entry_scores)),
+                _ramata_pack_numbers('q', map(author_positions.__getitem__, authors)),
+                _ramata_pack_numbers('q', map(title_positions.__getitem__, titles)),
+                _ramata_pack_numbers('q', map(operator.itemgetter(0), map(totals.__getitem__, completions))),
+                _ramata_pack_numbers('q', map(operator.itemgetter(1), map(totals.__getitem__, completions)))]
+
+    def _totals_of(self, completion):
+        """completion's [books, copies], read from the loaded snapshot on first use; None if unknown."""
+        totals = self._totals.get(completion)
+        if totals is None and self._stored is not None:
+            number = self._stored.find(completion)
+            if number is not None:
+                totals = self._totals[completion] = [self._stored.counts[number], self._stored.copies[number]]
+        return totals
+
+    def _all_totals(self):
+        """Every (completion, [books, copies]) with at least one book."""
+        for completion, totals in self._totals.items():
+            if totals[0]:
+                yield completion, totals
+        if self._stored is not None:
+            for number in range(len(self._stored.counts)):
+                completion = self._stored.completion(number)
+                if completion not in self._totals:
+                    yield completion, [self._stored.counts[number], self._stored.copies[number]]
+
+    def _keys(self, text):
+        text = text.lower()
+        return {text[i:] for i in range(len(text)) if text[i] != " " and (i == 0 or text[i - 1] == " ")}
+
+    def _set_score(self, completion, old, score):
+        """Move completion from its old score to score (None removes it) and repair the top lists on its paths."""
+        for key in self._keys(completion[1]):
+            path, depth = self._path(key)
+            end = path[-1]
+            if score is None:
+                del end.entries[(key, completion)]
+            else:
+                end.entries[(key, completion)] = score
+                if end.children is None and len(end.entries) > self.bucket_size:
+                    self._split(end, depth)
+
+            for node in reversed(path):
+                if score is not None and (old is None or score >= old):
+                    # Every ancestor's cut-off is at least as high, so once
+                    # the completion neither ranks nor is listed, stop
+                    if not self._promote(node, completion, score, old):
+                        break
+                elif old is not None and (-old, completion) in node.top:
+                    self._rebuild_top(node)
+
+            if score is None:
+                self._prune(path)
+
+    def _path(self, key):
+        """Nodes from the root to the one storing key, and that node's depth.
+
+        Adds the leaf a new key needs, and splits an edge the key leaves or
+        ends part-way along.
+        """
+        path, depth = [self._root], 0
+        while path[-1].children is not None and depth < len(key):
+            children = path[-1].children
+            node = children.get(key[depth])
+            if node is None:
+                node = children[key[depth]] = _RamataTrieNode(key[depth])
+            elif not key.startswith(node.label, depth):
+                shared = len(os.path.commonprefix([node.label, key[depth:]]))
+                middle = _RamataTrieNode(node.label[:shared])
+                middle.children = {node.label[shared]: node}
+                middle.top = list(node.top)
+                node.label = node.label[shared:]
+                node = children[key[depth]] = middle
+            path.append(node)
+            depth += len(node.label)
+        return path, depth
+
+    def _split(self, node, depth):
+        """Give a full leaf a child leaf per branch of its keys; keys ending at the node stay in it."""
+        node.children = {}
+        staying, branches = {}, {}
+        for (key, completion), score in node.entries.items():
+            if len(key) == depth:
+                staying[(key, completion)] = score
+            else:
+                branches.setdefault(key[depth], {})[(key, completion)] = score
+        node.entries = staying
+        for char, entries in branches.items():
+            keys = [key for key, _ in entries]
+            child = node.children[char] = _RamataTrieNode(os.path.commonprefix([min(keys)[depth:],
+                                                                                 max(keys)[depth:]]))
+            child.entries = entries
+            if len(entries) > self.bucket_size:
+                self._split(child, depth + len(child.label))
+            self._rebuild_top(child)
+
+    def _promote(self, node, completion, score, old):
+        """Rank completion's raised score at node; False when it is neither listed nor good enough.
+
+        Top lists always hold a completion's current score, or its previous
+        one until this update reaches them.
+        """
+        top = node.top
+        entry = (-score, completion)
+        if entry in top:
+            return True
+        if old is not None and (-old, completion) in top:
+            top.remove((-old, completion))
+        elif len(top) >= self.top_size and entry >= top[-1]:
+            return False
+        insort(top, entry)
+        del top[self.top_size:]
+        return True
+
+    def _rebuild_top(self, node):
+        if node.children and len(node.children) == 1 and not node.entries:
+            # Along a shared run of characters a node lists exactly what its only child does
+            node.top = list(next(iter(node.children.values())).top)
+        else:
+            node.top = self._rank(self._candidates(node), self.top_size)
+
+    def _candidates(self, node):
+        """The node's own entries and its children's top lists, which hold its top list between them."""
+        for (_, completion), score in node.entries.items():
+            yield -score, completion
+        if node.children:
+            for child in node.children.values():
+                yield from child.top
+
+    def _rank(self, entries, k):
+        best = {}
+        for negative_score, completion in entries:
+            if completion not in best or negative_score < best[completion]:
+                best[completion] = negative_score
+        return heapq.nsmallest(k, ((negative_score, completion) for completion, negative_score in best.items()))
+
+    def _prune(self, path):
+        """Drop nodes left with no entries and no children after a removal."""
+        for position in range(len(path) - 1, 0, -1):
+            node = path[position]
+            if node.children or node.entries:
+                return
+            del path[position - 1].children[node.label[0]]
+
+
+class RamataDueIndex:
+    """Open loans in a binary min-heap by due time, with each loan's heap position tracked.
+
+    Keys are (member_id, isbn). Because positions are tracked, push,
+    remove and reschedule each cost O(log n) with no stale entries left
+    behind. due_by() walks only the heap nodes due by the given time (every
+    child is due no earlier than its parent), and earliest() expands a
+    frontier of n nodes, so both run in time proportional to the answer.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._positions = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, key, due_at):
+        self._heap.append((due_at, key))
+        self._positions[key] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def remove(self, key):
+        position = self._positions.pop(key)
+        last = self._heap.pop()
+        if position < len(self._heap):
+            self._heap[position] = last
+            self._positions[last[1]] = position
+            self._sift_down(self._sift_up(position))
+
+    def reschedule(self, key, due_at):
+        position = self._positions[key]
+        self._heap[position] = (due_at, key)
+        self._sift_down(self._sift_up(position))
+
+    def due_by(self, as_of):
+        """(due_at, key) of every loan due at or before as_of, earliest first."""
+        heap = self._heap
+        found = []
+        stack = [0] if heap and heap[0][0] <= as_of else []
+        while stack:
+            position = stack.pop()
+            found.append(heap[position])
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap) and heap[child][0] <= as_of:
+                    stack.append(child)
+        found.sort()
+        return found
+
+    def earliest(self, n):
+        """(due_at, key) of the n loans due first, earliest first."""
+        heap = self._heap
+        found = []
+        frontier = [(heap[0], 0)] if heap and n > 0 else []
+        while frontier and len(found) < n:
+            entry, position = heapq.heappop(frontier)
+            found.append(entry)
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return found
+
+    def clear(self):
+        self._heap.clear()
+        self._positions.clear()
+
+    def _sift_up(self, position):
+        heap, positions = self._heap, self._positions
+        entry = heap[position]
+        while position > 0:
+            parent = (position - 1) // 2
+            if heap[parent] <= entry:
+                break
+            heap[position] = heap[parent]
+            positions[heap[position][1]] = position
+            position = parent
+        heap[position] = entry
+        positions[entry[1]] = position
+        return position
+
+    def _sift_down(self, position):
+        heap, positions = self._heap, self._positions
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= len(heap):
+                break
+            if child + 1 < len(heap) and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[position] = heap[child]
+            positions[heap[position][1]] = position
+            position = child
+        heap[position] = entry
+        positions[entry[1]] = position
+        return position
+
+
+class _RamataCountBucket:
+    __slots__ = ("count", "keys", "lower", "higher")
+
+    def __init__(self, count, lower, higher):
+        self.count = count
+        self.keys = {}
+        self.lower = lower
+        self.higher = higher
+
+
+class RamataPopularityIndex:
+    """Lifetime counts kept in buckets of equal count, linked in count order.
+
+    Each key lives in the bucket for its count, so increment() moves it to
+    the neighbouring bucket (creating it if needed) and remove() drops it,
+    both in O(1). top(n) walks down from the highest bucket and costs O(n).
+    Ties are listed in the order the keys reached the count.
+    """
 
-class RamataMiniLibraryManagementSystem:
     def __init__(self):
+        self._buckets = {}
+        self._lowest = None
+        self._highest = None
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def count(self, key):
+        bucket = self._buckets.get(key)
+        return 0 if bucket is None else bucket.count
+
+    def items(self):
+        """(key, count) of every counted key."""
+        return [(key, bucket.count) for key, bucket in self._buckets.items()]
+
+    def increment(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            lower, higher, count = None, self._lowest, 1
+        else:
+            lower, higher, count = bucket, bucket.higher, bucket.count + 1
+        if higher is None or higher.count != count:
+            higher = self._link(count, lower, higher)
+        higher.keys[key] = None
+        self._buckets[key] = higher
+        if bucket is not None:
+            self._discard(bucket, key)
+
+    def remove(self, key):
+        bucket = self._buckets.pop(key, None)
+        if bucket is not None:
+            self._discard(bucket, key)
+
+    def top(self, n):
+        """(key, count) of the n highest counts, highest first."""
+        found = []
+        bucket = self._highest
+        while bucket is not None and len(found) < n:
+            for key in bucket.keys:
+                found.append((key, bucket.count))
+                if len(found) == n:
+                    break
+            bucket = bucket.lower
+        return found
+
+    def load(self, counts):
+        """Replace the contents with (key, count) pairs; pairs with a count below 1 are skipped."""
+        self.clear()
+        for key, count in sorted(counts, key=operator.itemgetter(1)):
+            if count < 1:
+                continue
+            if self._highest is None or self._highest.count != count:
+                self._link(count, self._highest, None)
+            self._highest.keys[key] = None
+            self._buckets[key] = self._highest
+
+    def clear(self):
+        self._buckets.clear()
+        self._lowest = self._highest = None
+
+    def _link(self, count, lower, higher):
+        bucket = _RamataCountBucket(count, lower, higher)
+        if lower is None:
+            self._lowest = bucket
+        else:
+            lower.higher = bucket
+        if higher is None:
+            self._highest = bucket
+        else:
+            higher.lower = bucket
+        return bucket
+
+    def _discard(self, bucket, key):
+        del bucket.keys[key]
+        if bucket.keys:
+            return
+        if bucket.lower is None:
+            self._lowest = bucket.higher
+        else:
+            bucket.lower.higher = bucket.higher
+        if bucket.higher is None:
+            self._highest = bucket.lower
+        else:
+            bucket.higher.lower = bucket.lower
+
+
+class RamataInventoryColumns:
+    """Column-oriented copy counts for catalog-wide inventory reports.
+
+    Each book owns one slot in parallel arrays of total copies, available
+    copies and genre codes (indexes into the valid genres tuple). Reports
+    are vectorized with NumPy views of the arrays when NumPy is installed,
+    and otherwise run as builtin map/compress/sum passes, so no Python code
+    executes per book either way. Slots of deleted books are zeroed and
+    reused.
+
+    Running per-genre sums of total and available copies are kept as the
+    slots change, under a lock of their own since circulation adjusts
+    slots from different ISBN stripes; totals_by_genre() reads them in
+    O(genres).
+    """
+
+    def __init__(self, genres):
+        self.genres = genres
+        self._genre_codes = {genre: code for code, genre in enumerate(genres)}
+        self.total = array('q')
+        self.available = array('q')
+        self.genre = array('B')
+        self.isbns = []
+        self._slots = {}
+        self._free_slots = []
+        self._genre_total = [0] * len(genres)
+        self._genre_available = [0] * len(genres)
+        self._totals_lock = threading.Lock()
+
+    def add(self, isbn, genre, total_copies, available_copies):
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self.isbns[slot] = isbn
+            self.total[slot] = total_copies
+            self.available[slot] = available_copies
+            self.genre[slot] = self._genre_codes[genre]
+        else:
+            slot = len(self.isbns)
+            self.isbns.append(isbn)
+            self.total.append(total_copies)
+            self.available.append(available_copies)
+            self.genre.append(self._genre_codes[genre])
+        self._slots[isbn] = slot
+        with self._totals_lock:
+            self._genre_total[self.genre[slot]] += total_copies
+            self._genre_available[self.genre[slot]] += available_copies
+
+    def extend(self, isbns, genres, total_copies, available_copies):
+        """Append one slot per book for many new books at once."""
+        start = len(self.isbns)
+        self.isbns.extend(isbns)
+        self.total.extend(total_copies)
+        self.available.extend(available_copies)
+        self.genre.extend(map(self._genre_codes.__getitem__, genres))
+        self._slots.update(zip(isbns, range(start, len(self.isbns))))
+        codes = self.genre[start:]
+        totals = self._sums_by_genre(codes, self.total[start:])
+        available = self._sums_by_genre(codes, self.available[start:])
+        with self._totals_lock:
+            self._genre_total = list(map(operator.add, self._genre_total, totals))
+            self._genre_available = list(map(operator.add, self._genre_available, available))
+
+    def remove(self, isbn):
+        slot = self._slots.pop(isbn)
+        with self._totals_lock:
+            self._genre_total[self.genre[slot]] -= self.total[slot]
+            self._genre_available[self.genre[slot]] -= self.available[slot]
+        self.isbns[slot] = None
+        self.total[slot] = 0
+        self.available[slot] = 0
+        self._free_slots.append(slot)
+
+    def set_counts(self, isbn, total_copies, available_copies):
+        slot = self._slots[isbn]
+        with self._totals_lock:
+            self._genre_total[self.genre[slot]] += total_copies - self.total[slot]
+            self._genre_available[self.genre[slot]] += available_copies - self.available[slot]
+        self.total[slot] = total_copies
+        self.available[slot] = available_copies
+
+    def set_genre(self, isbn, genre):
+        slot = self._slots[isbn]
+        code = self._genre_codes[genre]
+        with self._totals_lock:
+            self._genre_total[self.genre[slot]] -= self.total[slot]
+            self._genre_available[self.genre[slot]] -= self.available[slot]
+            self._genre_total[code] += self.total[slot]
+            self._genre_available[code] += self.available[slot]
+        self.genre[slot] = code
+
+    def adjust_available(self, isbn, delta):
+        slot = self._slots[isbn]
+        self.available[slot] += delta
+        with self._totals_lock:
+            self._genre_available[self.genre[slot]] += delta
+
+    def totals_by_genre(self):
+        """{genre: (total copies, available copies)} from the running sums."""
+        with self._totals_lock:
+            return dict(zip(self.genres, zip(self._genre_total, self._genre_available)))
+
+    def clear(self):
+        self.__init__(self.genres)
+
+    def copies_out_by_genre(self):
+        if numpy is not None:
+            copies_out = numpy.frombuffer(self.total, numpy.int64) - numpy.frombuffer(self.available, numpy.int64)
+            counts = numpy.bincount(numpy.frombuffer(self.genre, numpy.uint8), weights=copies_out,
+                                    minlength=len(self.genres))
+            return {genre: int(counts[code]) for genre, code in self._genre_codes.items()}
+        copies_out = array('q', map(operator.sub, self.total, self.available))
+        return {genre: sum(compress(copies_out, map(code.__eq__, self.genre)))
+                for genre, code in self._genre_codes.items()}
+
+    def fully_checked_out(self):
+        """ISBNs with at least one copy and none on the shelf, in slot order."""
+        if numpy is not None:
+            total = numpy.frombuffer(self.total, numpy.int64)
+            available = numpy.frombuffer(self.available, numpy.int64)
+            return [self.isbns[slot] for slot in numpy.flatnonzero((total > 0) & (available == 0))]
+        return list(compress(self.isbns, map(operator.gt, map(bool, self.total), map(bool, self.available))))
+
+    def _sums_by_genre(self, codes, values):
+        if numpy is not None:
+            sums = numpy.bincount(numpy.frombuffer(codes, numpy.uint8), weights=numpy.frombuffer(values, numpy.int64),
+                                  minlength=len(self.genres))
+            return [int(value) for value in sums]
+        return [sum(compress(values, _ramata_code_mask(codes, code))) for code in range(len(self.genres))]
+
+    def utilization(self):
+        if numpy is not None:
+            total_copies = int(numpy.frombuffer(self.total, numpy.int64).sum())
+            available_copies = int(numpy.frombuffer(self.available, numpy.int64).sum())
+        else:
+            total_copies = sum(self.total)
+            available_copies = sum(self.available)
+        return (total_copies - available_copies) / total_copies if total_copies else 0.0
+
+
+class _RamataLockSet:
+    """Acquire several locks in the given (globally consistent) order."""
+    __slots__ = ("locks",)
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+
+    def __exit__(self, exc_type, exc, traceback):
+        for lock in reversed(self.locks):
+            lock.release()
+        return False
+
+
+# Operation -> number of arguments before the trailing now of timed
+# mutations; expire_holds journals each release as (now, isbn) itself, and
+# execute() runs it only as of the library clock
+_RAMATA_TIMED_ARGUMENTS = {"expire_holds": 0}
+
+
+def _ramata_mutation(scope, timed=0):
+    """Run a core mutation under its locks and log it to the journal if it succeeds.
+
+    scope names the locks taken, always in the order catalog lock, member
+    stripe, ISBN stripe: "book" (catalog + ISBN in args[0]), "member"
+    (catalog + member in args[0]), "catalog" (catalog only),
+    "circulation" (member in args[0] + ISBN in args[1], no catalog lock) or
+    "cart" (member in args[0] + the ISBN stripes of every ISBN in args[1],
+    in ascending stripe order; args[1] must be a list or tuple, and any
+    other cart fails with RamataCode.BAD_REQUEST).
+
+    timed=N mutations take N arguments and then now; a call without now
+    is stamped with library.ramata_clock(), so the journal logs the time
+    and a replay dates its loans and holds exactly as the original call did.
+    Only replay() passes now by name; execute() refuses it.
+
+    The journal entry is encoded before the mutation runs, so arguments
+    that cannot be logged fail it untouched. If writing the entry fails
+    afterwards, the journal restores the library from disk once the locks
+    are released, and the call fails instead of leaving memory ahead of
+    the log.
+    """
+    def decorate(method):
+        operation = method.__name__.lstrip("_")
+        if timed:
+            _RAMATA_TIMED_ARGUMENTS[operation] = timed
+
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            if timed and len(args) == timed:
+                args += (self.ramata_clock(),)
+            try:
+                if scope == "circulation":
+                    first_lock = self._ramata_member_locks[hash(args[0]) % RAMATA_LOCK_STRIPES]
+                    second_lock = self._ramata_book_locks[hash(args[1]) % RAMATA_LOCK_STRIPES]
+                elif scope == "cart":
+                    # A string would otherwise be read as a cart of one-character ISBNs
+                    if not isinstance(args[1], (list, tuple)):
+                        return self._fail(RamataCode.BAD_REQUEST, "The cart must be a list of ISBNs!")
+                    args = (args[0], list(args[1])) + args[2:]
+                    first_lock = self._ramata_member_locks[hash(args[0]) % RAMATA_LOCK_STRIPES]
+                    stripes = sorted({hash(isbn) % RAMATA_LOCK_STRIPES for isbn in args[1]})
+                    second_lock = _RamataLockSet([self._ramata_book_locks[stripe] for stripe in stripes])
+                elif scope == "book":
+                    first_lock = self._ramata_catalog_lock
+                    second_lock = self._ramata_book_locks[hash(args[0]) % RAMATA_LOCK_STRIPES]
+                elif scope == "member":
+                    first_lock = self._ramata_catalog_lock
+                    second_lock = self._ramata_member_locks[hash(args[0]) % RAMATA_LOCK_STRIPES]
+                else:
+                    first_lock = second_lock = self._ramata_catalog_lock
+            except IndexError:
+                # Too few arguments to pick the locks; the call raises its usual TypeError
+                return method(self, *args)
+
+            journal = self.ramata_journal
+            entry = None
+            if journal is not None:
+                try:
+                    entry = journal.prepare(operation, args)
+                except RamataJournalError as error:
+                    return self._journal_failed(journal, error)
+            try:
+                with first_lock, second_lock:
+                    result = method(self, *args)
+                    if result.ok and entry is not None:
+                        journal.record(entry)
+            except RamataJournalError as error:
+                return self._journal_failed(journal, error)
+            if result.ok and journal is not None:
+                journal.checkpoint()
+            return result
+        return wrapper
+    return decorate
+
+
+def _ramata_metered(method):
+    """Report each call's outcome and duration to library.ramata_metrics, when set.
+
+    Applied outermost, so the time includes waiting for locks.
+    """
+    operation = method.__name__.lstrip("_")
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.ramata_metrics
+        if metrics is None:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter_ns()
+        result = method(self, *args, **kwargs)
+        metrics.observe(operation, result.ok, result.code, time.perf_counter_ns() - start)
+        return result
+    return wrapper
+
+
+def _ramata_add_posting(postings, seq):
+    """Add a catalog sequence number to an ascending postings array, once."""
+    if not postings or postings[-1] < seq:
+        # New books have the highest sequence number, so adds append
+        postings.append(seq)
+        return
+    position = bisect_left(postings, seq)
+    if postings[position] != seq:
+        postings.insert(position, seq)
+
+
+def _ramata_discard_posting(postings, seq):
+    position = bisect_left(postings, seq)
+    if position < len(postings) and postings[position] == seq:
+        del postings[position]
+
+
+def _ramata_ngrams(text):
+    """Return every RAMATA_NGRAM_SIZE character n-gram of lowercased text."""
+    text = text.lower()
+    return {text[start:start + RAMATA_NGRAM_SIZE] for start in range(len(text) - RAMATA_NGRAM_SIZE + 1)}
+
+
+@contextlib.contextmanager
+def _ramata_gc_paused():
+    """Pause the cyclic garbage collector while many acyclic records are allocated.
+
+    Left running, it rescans the growing catalog every few thousand
+    allocations during a bulk load.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _ramata_code_mask(codes, code):
+    """A 0/1 byte per entry of a byte array of codes, marking those equal to code.
+
+    Translating the codes' bytes keeps per-code passes such as compress()
+    in C.
+    """
+    return codes.tobytes().translate(bytes(other == code for other in range(256)))
+
+
+def _ramata_pack_strings(strings):
+    """One UTF-8 blob of NUL-separated strings, so a whole column decodes in one call."""
+    blob = "\0".join(strings)
+    if blob.count("\0") != max(len(strings) - 1, 0):
+        raise ValueError("Snapshot strings cannot contain NUL characters")
+    return blob.encode("utf-8")
+
+
+def _ramata_unpack_strings(blob, count):
+    # A non-empty blob always decodes to its strings, so a wrong count shows up as a length mismatch
+    return bytes(blob).decode("utf-8").split("\0") if count or len(blob) else []
+
+
+def _ramata_pack_numbers(typecode, numbers):
+    column = numbers
+    if sys.byteorder == "big" or not (isinstance(numbers, array) and numbers.typecode == typecode):
+        column = array(typecode, numbers)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _ramata_unpack_numbers(typecode, blob):
+    column = array(typecode)
+    column.frombytes(blob)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _ramata_pack_postings(postings_list, renumber=None):
+    """Posting arrays as a section of their lengths and one of their entries end to end.
+
+    renumber maps catalog sequence numbers to snapshot positions when the
+    two differ.
+    """
+    positions = array('q')
+    for postings in postings_list:
+        positions.extend(postings if renumber is None else map(renumber.__getitem__, postings))
+    return _ramata_pack_numbers('q', map(len, postings_list)), _ramata_pack_numbers('q', positions)
+
+
+def _ramata_unpack_postings(lengths, positions, count, book_count):
+    """The count posting arrays written by _ramata_pack_postings, checked against book_count books."""
+    lengths = _ramata_unpack_numbers('q', lengths)
+    positions = _ramata_unpack_numbers('q', positions)
+    if len(lengths) != count or sum(lengths) != len(positions) or min(lengths, default=0) < 0:
+        raise ValueError(f"{len(positions)} posting entries do not add up to {count} arrays")
+    ends = list(accumulate(lengths))
+    postings_list = [positions[start:end] for start, end in zip([0] + ends[:-1], ends)]
+    # Each array is ascending, so its ends bound it
+    if any(postings[0] < 0 or postings[-1] >= book_count for postings in postings_list if postings):
+        raise ValueError(f"postings point past the {book_count} books")
+    return postings_list
+
+
+class RamataMiniLibraryManagementSystem:
+    # Operations that execute() will dispatch by name
+    RAMATA_OPERATIONS = ("add_book", "add_member", "search_books", "update_book", "update_member",
+                         "delete_book", "delete_member", "borrow_book", "return_book", "borrow_books",
+                         "return_books", "renew_loan", "reserve", "cancel_reservation", "expire_holds",
+                         "get_book_details", "get_member_details", "get_book_borrowers", "get_overdue_loans",
+                         "get_next_due_loans", "get_reservation_position", "get_stats")
+
+    def __init__(self, event_sink=print_ramata_event):
         self.ramata_books = {}
 
-        self.ramata_members = []
+        # Members keyed by member ID; dicts keep registration order
+        self.ramata_members = {}
+
+        # Normalized email -> member ID, for O(1) uniqueness checks
+        self.ramata_member_emails = {}
+
+        # ISBN -> set of member IDs currently holding it; ISBNs with no
+        # loans have no entry
+        self.ramata_book_borrowers = {}
 
         self.ramata_valid_genres = ("Romance", "Contemporary Fiction", "Self-Help", "Biography", "Mystery",
                                     "Historical Fiction", "Health & Wellness")
+        self._ramata_genre_set = frozenset(self.ramata_valid_genres)
 
         # Counter for generating unique member IDs
         self.ramata_next_member_id = 1
 
+        # Receives a RamataEvent per message; None keeps the library silent
+        self.ramata_event_sink = event_sink
+
+        # Receives observe(operation, ok, code, elapsed_ns) for every core
+        # operation (see metrics.RamataMetrics); None records nothing
+        self.ramata_metrics = None
+
+        # Journal with prepare(operation, args), which encodes an entry
+        # before the mutation runs, record(entry), called under the
+        # mutation's locks after every success, and checkpoint() and
+        # rollback(), called once they are released. prepare and record
+        # raise RamataJournalError when the entry cannot be logged
+        self.ramata_journal = None
+
+        # Structural changes (adding/removing records, text and email
+        # indexes) take the catalog lock; circulation only takes the
+        # member and ISBN stripes, so unrelated checkouts run in parallel
+        self._ramata_catalog_lock = threading.RLock()
+        self._ramata_member_locks = [threading.RLock() for _ in range(RAMATA_LOCK_STRIPES)]
+        self._ramata_book_locks = [threading.RLock() for _ in range(RAMATA_LOCK_STRIPES)]
+
+        # Trigram -> ascending array of the catalog sequence numbers (see
+        # _ramata_book_order) of books whose text contains it, kept in sync
+        # by add/update/delete_book
+        self._ramata_title_index = {}
+        self._ramata_author_index = {}
+
+        # Copy counts and genre codes as parallel arrays for inventory reports
+        self.ramata_inventory = RamataInventoryColumns(self.ramata_valid_genres)
+
+        # Genre -> ascending array of catalog sequence numbers, for faceted
+        # searches; availability is read from the records as a page is walked
+        self._ramata_genre_index = {genre: array('q') for genre in self.ramata_valid_genres}
+
+        # Bumped whenever a title, author or genre changes or a book comes or
+        # goes; cached search pages are only valid at their version
+        self._ramata_catalog_version = 0
+        self.ramata_search_cache = RamataSearchCache()
+
+        # Title and author prefixes for autocomplete, ranked by copies
+        self._ramata_suggestions = RamataSuggestIndex()
+
+        # ISBN -> insertion sequence, so indexed searches keep catalog order,
+        # and sequence -> ISBN (None once the book is deleted)
+        self._ramata_book_order = {}
+        self._ramata_book_isbns = []
+        self._ramata_next_book_seq = 0
+
+        # Bulk-loaded books not yet in the title/author n-gram indexes or the
+        # suggestion trie, in load order, plus the same ISBNs as a set; a
+        # background pass indexes them a chunk at a time, and operations that
+        # need them first lend a hand (see _index_pending_text). With
+        # background indexing off, the first such operation does it all
+        self._ramata_unindexed_queue = deque()
+        self._ramata_unindexed_isbns = set()
+        self.ramata_background_indexing = True
+
+        # Source of loan times (epoch seconds by default) and every open
+        # loan by due time; circulation runs under different stripes, so
+        # the heap has a lock of its own
+        self.ramata_clock = time.time
+        self._ramata_due_index = RamataDueIndex()
+        self._ramata_due_lock = threading.Lock()
+
+        # ISBN -> member IDs waiting for a copy, first come first served,
+        # and ISBN -> {member ID: hold expiry} for copies set aside for the
+        # head of the queue; both change under the ISBN's stripe
+        self.ramata_waitlists = {}
+        self.ramata_holds = {}
+
+        # Member ID -> ISBNs they have reserved, waiting or held; expiring
+        # holds update it under ISBN stripes, so it has a lock of its own
+        self._ramata_reservations = {}
+        self._ramata_reservation_lock = threading.Lock()
+
+        # Members with at least one loan, kept with the due index under its
+        # lock, and lifetime borrows per ISBN ranked for get_stats(); loans
+        # of different ISBNs bump the ranking, so it has a lock of its own.
+        # The same counts are tallied in a plain dict, the record dump_state()
+        # saves and check_stats() verifies the ranking against
+        self._ramata_active_borrowers = 0
+        self._ramata_popularity = RamataPopularityIndex()
+        self._ramata_borrow_tally = {}
+        self._ramata_popularity_lock = threading.Lock()
+
     # ---------------------------
     # Helper print methods
     # ---------------------------
@@ -49,316 +1425,1632 @@ class RamataMiniLibraryManagementSystem:
     def _print_return(self, message):
         print(f"📚 {message}")
 
-    def add_book(self, isbn, title, author, genre, total_copies):
-        print()
-        self._print_book("ADDING NEW BOOK TO RAMATA LIBRARY")
-        print()
+    # ---------------------------
+    # Event and result helpers
+    # ---------------------------
 
-        if not isbn or not title or not author or not genre:
-            self._print_error("All fields are required!")
-            return False
+    def _emit(self, kind, message, heading=False):
+        if self.ramata_event_sink is not None:
+            self.ramata_event_sink(RamataEvent(kind, message, heading))
 
-        # Check if ISBN already exists
-        if isbn in self.ramata_books:
-            self._print_error(f"Book with ISBN '{isbn}' already exists!")
-            return False
+    def _succeed(self, message, data=None):
+        self._emit("success", message)
+        return RamataResult(True, RamataCode.OK, message, data)
 
-        # Validate genre
-        if genre not in self.ramata_valid_genres:
-            self._print_error(f"Invalid genre! Must be one of: {self.ramata_valid_genres}")
-            return False
+    def _fail(self, code, message, data=None):
+        self._emit("error", message)
+        return RamataResult(False, code, message, data)
 
-        # Validate total copies
-        if total_copies <= 0:
-            self._print_error("Total copies cannot be less than or equal to 0!")
-            return False
+    def _journal_failed(self, journal, error):
+        """Drop changes the journal could not log, then fail; callers hold no library locks."""
+        journal.rollback()
+        return self._fail(error.code, str(error))
 
-        # Add book to dictionary
-        self.ramata_books[isbn] = {
-            'title': title,
-            'author': author,
-            'genre': genre,
-            'total_copies': total_copies,
-            'available_copies': total_copies
-        }
+    # ---------------------------
+    # Public API
+    # ---------------------------
 
-        self._print_success(f"Book '{title}' added successfully to Ramata Library!")
-        return True
+    def execute(self, operation, *args):
+        """Run a core operation by name and return its RamataResult.
+
+        Timed mutations are always stamped with ramata_clock(); a trailing
+        time argument is refused, so callers cannot backdate loans or holds.
+        """
+        if operation not in self.RAMATA_OPERATIONS:
+            return RamataResult(False, RamataCode.UNKNOWN_OPERATION, f"Unknown operation '{operation}'")
+        timed = _RAMATA_TIMED_ARGUMENTS.get(operation)
+        if timed is not None and len(args) > timed:
+            return RamataResult(False, RamataCode.BAD_REQUEST,
+                                f"'{operation}' takes {timed} arguments, got {len(args)}")
+        return getattr(self, f"_{operation}")(*args)
+
+    def replay(self, operation, *args):
+        """Re-run a journaled mutation with its logged arguments, including the time of timed ones.
+
+        For journal recovery only; everything else goes through execute().
+        """
+        if operation not in self.RAMATA_OPERATIONS:
+            return RamataResult(False, RamataCode.UNKNOWN_OPERATION, f"Unknown operation '{operation}'")
+        return getattr(self, f"_{operation}")(*args)
+
+    def add_book(self, isbn, title, author, genre, total_copies):
+        return self._add_book(isbn, title, author, genre, total_copies).ok
 
     def add_member(self, name, email):
-        print()
-        self._print_member("ADDING NEW MEMBER TO RAMATA LIBRARY")
-        print()
+        return self._add_member(name, email).ok
+
+    def search_books(self, search_type, search_term, genre=None, available_only=False, offset=0, limit=None):
+        """Search by title or author, optionally narrowed to a genre and to books on the shelf.
+
+        Results come back in catalog order, one page at a time when limit is
+        given: skip offset matches, then return at most limit of them. The
+        term may be empty when a genre or available_only narrows the search.
+        """
+        result = self._search_books(search_type, search_term, genre, available_only, offset, limit)
+        return result.ok, result.data if result.ok else []
+
+    def update_book(self, isbn, field, new_value):
+        return self._update_book(isbn, field, new_value).ok
+
+    def update_member(self, member_id, field, new_value):
+        return self._update_member(member_id, field, new_value).ok
+
+    def delete_book(self, isbn):
+        return self._delete_book(isbn).ok
+
+    def delete_member(self, member_id):
+        return self._delete_member(member_id).ok
+
+    def borrow_book(self, member_id, isbn):
+        return self._borrow_book(member_id, isbn).ok
+
+    def return_book(self, member_id, isbn):
+        return self._return_book(member_id, isbn).ok
+
+    def renew_loan(self, member_id, isbn):
+        """Push a loan's due date RAMATA_LOAN_PERIOD past the later of now and its current due date."""
+        return self._renew_loan(member_id, isbn).ok
+
+    def reserve(self, member_id, isbn):
+        """Join the waitlist for a book with no copy on the shelf.
+
+        Returned copies are held for the head of the queue for
+        RAMATA_HOLD_PERIOD; borrowing the book collects the hold. Waiting
+        and held reservations count toward the 3-book limit.
+        """
+        return self._reserve(member_id, isbn).ok
+
+    def cancel_reservation(self, member_id, isbn):
+        """Leave a waitlist, passing any copy held for the member on to the next in line."""
+        return self._cancel_reservation(member_id, isbn).ok
+
+    def expire_holds(self, as_of=None):
+        """Release every hold that ran out by as_of (default now); returns how many were released.
+
+        Holds on a book are also released by the next borrow, return,
+        reservation or cancellation of it.
+        """
+        return self._expire_holds(as_of).data or 0
+
+    def borrow_books(self, member_id, isbns):
+        """Borrow every ISBN in the cart, a list or tuple, or none of them.
+
+        Returns (ok, rejected) where rejected lists (isbn, code, message) for
+        each item that kept the cart from going through.
+        """
+        result = self._borrow_books(member_id, isbns)
+        return result.ok, result.data or []
+
+    def return_books(self, member_id, isbns):
+        """Return every ISBN in the cart or none of them; same result shape as borrow_books."""
+        result = self._return_books(member_id, isbns)
+        return result.ok, result.data or []
+
+    def add_books_bulk(self, rows, on_reject=None):
+        """Add books from an iterable of row mappings; return added/rejected counts.
+
+        Rows need 'isbn', 'title', 'author', 'genre' and 'total_copies' keys.
+        Rejected rows are passed to on_reject(row_number, row, code, message)
+        as they are found, so nothing is held back for the final report.
+        """
+        return self._add_books_bulk(rows, on_reject).data
+
+    def add_members_bulk(self, rows, on_reject=None):
+        """Add members from an iterable of 'name'/'email' row mappings.
+
+        Rows are validated a chunk at a time and each chunk's accepted members
+        receive one contiguous range of RAMnnn IDs.
+        """
+        return self._add_members_bulk(rows, on_reject).data
+
+    def dump_state(self):
+        """Return the whole library state as plain lists and numbers."""
+        with self.quiesce():
+            return {
+                'books': [[isbn, book.title, book.author, book.genre, book.total_copies,
+                           book.available_copies] for isbn, book in self.ramata_books.items()],
+                'members': [[member.member_id, member.name, member.email, list(member.borrowed_books)]
+                            for member in self.ramata_members.values()],
+                # [borrowed_at, due_at] of each loan above, in the same order
+                'loan_dates': [[loan.borrowed_at, loan.due_at] for member in self.ramata_members.values()
+                               for loan in map(member.borrowed_books.loan, member.borrowed_books)],
+                'next_member_id': self.ramata_next_member_id,
+                # [isbn, member_id] of each waiting reservation, in queue order
+                'waitlists': [[isbn, member_id] for isbn, waitlist in sorted(self.ramata_waitlists.items())
+                              for member_id in waitlist],
+                'holds': [[isbn, member_id, expires_at] for isbn, holds in sorted(self.ramata_holds.items())
+                          for member_id, expires_at in holds.items()],
+                # [isbn, lifetime borrows] of every book borrowed at least once
+                'borrow_counts': sorted(map(list, self._lifetime_borrow_counts())),
+            }
+
+    def load_state(self, state):
+        """Replace the library contents with a state produced by dump_state().
+
+        States saved before loans had dates may lack 'loan_dates'; their
+        loans are dated from the time of loading. States saved before
+        reservations have none, and those saved before borrow counts start
+        every book at zero.
+        """
+        book_columns = list(zip(*state['books'])) or [()] * 6
+        self._load_columns(book_columns, state['members'], state['next_member_id'], state.get('loan_dates'))
+        self._load_reservations(state.get('waitlists', ()), state.get('holds', ()))
+        self._load_borrow_counts(state.get('borrow_counts', ()))
+
+    def export_snapshot(self, path):
+        """Write books, members, loans and the next member ID to path in the binary snapshot format.
+
+        Every column is stored as one section: strings as a NUL-separated
+        UTF-8 blob, numbers as a little-endian array. The header carries
+        the format version, the record counts and a CRC-32 of the header
+        and the sections. Loan dates, reservations and lifetime borrow
+        counts follow the books and members, then the genre, trigram and
+        suggestion indexes as they stand, so loading needs no indexing pass.
+        """
+        with self.quiesce():
+            self._index_pending_text()
+            state = self.dump_state()
+            isbns, titles, authors, genres, total_copies, available_copies = list(zip(*state['books'])) or [()] * 6
+            index_sections = self._export_indexes(isbns, titles, authors)
+        member_ids, names, emails, loans = list(zip(*state['members'])) or [()] * 4
+        genre_codes = {genre: code for code, genre in enumerate(self.ramata_valid_genres)}
+        sections = [
+            _ramata_pack_strings(isbns), _ramata_pack_strings(titles), _ramata_pack_strings(authors),
+            _ramata_pack_numbers('B', map(genre_codes.__getitem__, genres)),
+            _ramata_pack_numbers('q', total_copies), _ramata_pack_numbers('q', available_copies),
+            _ramata_pack_strings(member_ids), _ramata_pack_strings(names), _ramata_pack_strings(emails),
+            _ramata_pack_numbers('q', map(len, loans)),
+            _ramata_pack_strings([isbn for member_loans in loans for isbn in member_loans]),
+            _ramata_pack_numbers('d', (dates[0] for dates in state['loan_dates'])),
+            _ramata_pack_numbers('d', (dates[1] for dates in state['loan_dates'])),
+            _ramata_pack_numbers('q', (len(state['waitlists']), len(state['holds']))),
+            _ramata_pack_strings([isbn for isbn, _ in state['waitlists']]),
+            _ramata_pack_strings([member_id for _, member_id in state['waitlists']]),
+            _ramata_pack_strings([hold[0] for hold in state['holds']]),
+            _ramata_pack_strings([hold[1] for hold in state['holds']]),
+            _ramata_pack_numbers('d', (hold[2] for hold in state['holds'])),
+            _ramata_pack_strings([isbn for isbn, _ in state['borrow_counts']]),
+            _ramata_pack_numbers('q', (count for _, count in state['borrow_counts'])),
+        ]
+        sections += index_sections or [b""] * _RAMATA_SNAPSHOT_INDEX_SECTIONS
+        flags = RAMATA_SNAPSHOT_INDEXED if index_sections else 0
+        payload = b"".join(_RAMATA_SNAPSHOT_SECTION.pack(len(section)) + section for section in sections)
+        header = _RAMATA_SNAPSHOT_HEADER.pack(RAMATA_SNAPSHOT_MAGIC, RAMATA_SNAPSHOT_VERSION, flags, len(isbns),
+                                              len(member_ids), sum(map(len, loans)), state['next_member_id'], 0)
+        # The checksum is the header's last field and covers the fields before it
+        header = header[:-4] + struct.pack("<I", zlib.crc32(payload, zlib.crc32(header[:-4])))
+
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as handle:
+            handle.write(header)
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary_path, path)
+
+    def load_snapshot(self, path):
+        """Replace the library contents with a snapshot written by export_snapshot().
+
+        Raises ValueError if the file is not a snapshot, has an unsupported
+        version, fails its checksum, or has columns whose lengths do not
+        match the header's record counts. Stored indexes are taken as they
+        are; only snapshots written without them are indexed afterwards.
+        """
+        with open(path, "rb") as handle:
+            data = memoryview(handle.read())
+        if len(data) < _RAMATA_SNAPSHOT_HEADER.size:
+            raise ValueError(f"{path} is too short to be a Ramata snapshot")
+        magic, version, flags, book_count, member_count, loan_count, next_member_id, checksum = \
+            _RAMATA_SNAPSHOT_HEADER.unpack_from(data)
+        if magic != RAMATA_SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a Ramata snapshot")
+        if version != RAMATA_SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} in {path}")
+        payload = data[_RAMATA_SNAPSHOT_HEADER.size:]
+        if zlib.crc32(payload, zlib.crc32(data[:_RAMATA_SNAPSHOT_HEADER.size - 4])) != checksum:
+            raise ValueError(f"Snapshot {path} is corrupt (checksum mismatch)")
+
+        sections, offset = [], 0
+        while offset < len(payload):
+            size, = _RAMATA_SNAPSHOT_SECTION.unpack_from(payload, offset)
+            offset += _RAMATA_SNAPSHOT_SECTION.size
+            sections.append(payload[offset:offset + size])
+            offset += size
+        if len(sections) != _RAMATA_SNAPSHOT_SECTIONS or offset != len(payload):
+            raise ValueError(f"Snapshot {path} is corrupt (expected {_RAMATA_SNAPSHOT_SECTIONS} sections)")
+
+        def column(values, count, name):
+            if len(values) != count:
+                raise ValueError(f"Snapshot {path} is corrupt ({len(values)} {name} for a count of {count})")
+            return values
+
+        (isbns, titles, authors, genre_codes, total_copies, available_copies,
+         member_ids, names, emails, loan_counts, loan_isbns, borrowed_ats, due_ats,
+         reservation_counts, waitlist_isbns, waitlist_members, hold_isbns, hold_members, hold_expiries,
+         borrow_count_isbns, borrow_counts, *index_sections) = sections
+        loan_dates = zip(column(_ramata_unpack_numbers('d', borrowed_ats), loan_count, "loan dates"),
+                         column(_ramata_unpack_numbers('d', due_ats), loan_count, "due dates"))
+
+        column(genre_codes, book_count, "genre codes")
+        if max(genre_codes, default=0) >= len(self.ramata_valid_genres):
+            raise ValueError(f"Snapshot {path} is corrupt (genre code {max(genre_codes)} is not a known genre)")
+        book_columns = [column(_ramata_unpack_strings(isbns, book_count), book_count, "ISBNs"),
+                        column(_ramata_unpack_strings(titles, book_count), book_count, "titles"),
+                        column(_ramata_unpack_strings(authors, book_count), book_count, "authors"),
+                        list(map(self.ramata_valid_genres.__getitem__, genre_codes)),
+                        column(_ramata_unpack_numbers('q', total_copies), book_count, "total copies"),
+                        column(_ramata_unpack_numbers('q', available_copies), book_count, "available copies")]
+        loan_isbns = column(_ramata_unpack_strings(loan_isbns, loan_count), loan_count, "loans")
+        loan_counts = column(_ramata_unpack_numbers('q', loan_counts), member_count, "loan counts")
+        loan_ends = list(accumulate(loan_counts))
+        if (loan_ends[-1] if loan_ends else 0) != loan_count:
+            raise ValueError(f"Snapshot {path} is corrupt (member loans do not add up to {loan_count})")
+        loans = map(loan_isbns.__getitem__, map(slice, [0] + loan_ends[:-1], loan_ends))
+        members = zip(column(_ramata_unpack_strings(member_ids, member_count), member_count, "member IDs"),
+                      column(_ramata_unpack_strings(names, member_count), member_count, "names"),
+                      column(_ramata_unpack_strings(emails, member_count), member_count, "emails"), loans)
+
+        waiting_count, hold_count = column(_ramata_unpack_numbers('q', reservation_counts), 2, "reservation counts")
+        waitlists = zip(column(_ramata_unpack_strings(waitlist_isbns, waiting_count), waiting_count, "waitlist ISBNs"),
+                        column(_ramata_unpack_strings(waitlist_members, waiting_count), waiting_count,
+                               "waitlist members"))
+        holds = zip(column(_ramata_unpack_strings(hold_isbns, hold_count), hold_count, "hold ISBNs"),
+                    column(_ramata_unpack_strings(hold_members, hold_count), hold_count, "hold members"),
+                    column(_ramata_unpack_numbers('d', hold_expiries), hold_count, "hold expiries"))
+        counts = _ramata_unpack_numbers('q', borrow_counts)
+        borrow_counts = zip(column(_ramata_unpack_strings(borrow_count_isbns, len(counts)), len(counts),
+                                   "borrow count ISBNs"), counts)
+
+        indexes = None
+        if flags & RAMATA_SNAPSHOT_INDEXED:
+            try:
+                indexes = self._stored_indexes(index_sections, book_columns[1], book_columns[2])
+            except ValueError as error:
+                raise ValueError(f"Snapshot {path} is corrupt ({error})") from None
+
+        # Every column is checked before anything is replaced
+        waitlists, holds, borrow_counts = list(waitlists), list(holds), list(borrow_counts)
+        self._load_columns(book_columns, members, next_member_id, loan_dates, indexes)
+        self._load_reservations(waitlists, holds)
+        self._load_borrow_counts(borrow_counts)
+
+    def _export_indexes(self, isbns, titles, authors):
+        """The genre, trigram and suggestion index sections of a snapshot of these books.
+
+        Books are numbered by their position in isbns, which is catalog
+        order; callers hold every lock and have indexed any pending text.
+        """
+        seqs = list(map(self._ramata_book_order.__getitem__, isbns))
+        # Without deletes or sharding the sequence numbers are the positions already
+        renumber = None if not seqs or seqs[-1] == len(seqs) - 1 else dict(zip(seqs, range(len(seqs))))
+        sections = list(_ramata_pack_postings(
+            [self._ramata_genre_index[genre] for genre in self.ramata_valid_genres], renumber))
+        for index in (self._ramata_title_index, self._ramata_author_index):
+            sections.append(_ramata_pack_strings(list(index)))
+            sections += _ramata_pack_postings(list(index.values()), renumber)
+        sections += self._ramata_suggestions.pack(dict(zip(titles, range(len(titles)))),
+                                                  dict(zip(authors, range(len(authors)))))
+        return sections
+
+    def _stored_indexes(self, sections, titles, authors):
+        """Unpack the sections _export_indexes wrote, for _restore_books."""
+        (genre_lengths, genre_positions, title_grams, title_lengths, title_positions,
+         author_grams, author_lengths, author_positions, *trie_sections) = sections
+        genre_postings = _ramata_unpack_postings(genre_lengths, genre_positions, len(self.ramata_valid_genres),
+                                                 len(titles))
+        text_indexes = []
+        for grams, lengths, positions in ((title_grams, title_lengths, title_positions),
+                                          (author_grams, author_lengths, author_positions)):
+            grams = _ramata_unpack_strings(grams, 0)
+            text_indexes.append(dict(zip(grams, _ramata_unpack_postings(lengths, positions, len(grams),
+                                                                        len(titles)))))
+        return genre_postings, text_indexes[0], text_indexes[1], _RamataStoredTrie(trie_sections, titles, authors)
+
+    def quiesce(self):
+        """Context manager holding every library lock, for consistent whole-state work."""
+        return _RamataLockSet([self._ramata_catalog_lock] + self._ramata_member_locks + self._ramata_book_locks)
+
+    def suggest(self, prefix, k=5):
+        """Up to k (text, kind) completions of prefix from titles and authors, most copies first.
+
+        Matches the start of any word, so "mag" suggests "Big Magic". k is
+        capped at RAMATA_SUGGEST_TOP.
+        """
+        return self._suggest(prefix, k).data
+
+    def get_search_cache_stats(self):
+        """Hits, misses, evictions, size and hit rate of the search result cache."""
+        with self._ramata_catalog_lock:
+            return self.ramata_search_cache.stats()
+
+    def get_metrics(self):
+        """Snapshot of per-operation counters and latency histograms; empty when metrics are off."""
+        if self.ramata_metrics is None:
+            return {}
+        return self.ramata_metrics.snapshot()
+
+    def get_inventory_report(self):
+        """Copies out per genre, fully checked-out ISBNs and overall utilization."""
+        return self._get_inventory_report().data
+
+    def get_stats(self, top=RAMATA_TOP_BORROWED):
+        """Live circulation figures and the top most-borrowed titles, without walking the catalog.
+
+        Returns titles, members, total/available copies, copies out, open
+        loans, active borrowers, per-genre titles and copies, and
+        most_borrowed as (isbn, title, lifetime borrows), highest first.
+        """
+        return self._get_stats(top).data
+
+    def check_stats(self, top=RAMATA_TOP_BORROWED):
+        """Compare get_stats() with figures recomputed by walking every book and member.
+
+        Runs with the library quiesced and returns (figure, live value,
+        recomputed value) for each mismatch, so an empty list means the
+        incremental figures are correct. No loan history is kept to recount
+        lifetime borrows from, so most_borrowed is checked against the
+        plain per-ISBN tally kept beside the popularity index. Equal borrow
+        counts may rank in any order, so it is compared by counts and titles.
+        """
+        with self.quiesce():
+            live = self.get_stats(top)
+            books = self.get_all_books()
+            borrowers = [member for member in self.get_all_members() if member.borrowed_books]
+            genres = {genre: {'titles': 0, 'total_copies': 0, 'available_copies': 0}
+                      for genre in self.ramata_valid_genres}
+            for book in books.values():
+                figures = genres[book.genre]
+                figures['titles'] += 1
+                figures['total_copies'] += book.total_copies
+                figures['available_copies'] += book.available_copies
+            total_copies = sum(figures['total_copies'] for figures in genres.values())
+            available_copies = sum(figures['available_copies'] for figures in genres.values())
+            counts = dict(self._lifetime_borrow_counts())
+            ranked = sorted(counts.values(), reverse=True)[:top]
+            recomputed = {
+                'titles': len(books),
+                'members': len(self.get_all_members()),
+                'total_copies': total_copies,
+                'available_copies': available_copies,
+                'copies_out': total_copies - available_copies,
+                'open_loans': sum(len(member.borrowed_books) for member in borrowers),
+                'active_borrowers': len(borrowers),
+                'genres': genres,
+                'most_borrowed': [(isbn, books[isbn].title, counts[isbn])
+                                  for isbn, _, _ in live['most_borrowed']
+                                  if isbn in books and isbn in counts],
+            }
+            mismatches = [(figure, live[figure], value) for figure, value in recomputed.items()
+                          if figure != 'most_borrowed' and live[figure] != value]
+            if (live['most_borrowed'] != recomputed['most_borrowed']
+                    or [count for _, _, count in live['most_borrowed']] != ranked):
+                mismatches.append(('most_borrowed', live['most_borrowed'], ranked))
+            return mismatches
+
+    def get_book_details(self, isbn):
+        return self._get_book_details(isbn).data
+
+    def get_member_details(self, member_id):
+        return self._get_member_details(member_id).data
+
+    def get_book_borrowers(self, isbn):
+        """Member IDs currently holding isbn, sorted; None if the book does not exist."""
+        return self._get_book_borrowers(isbn).data
+
+    def get_overdue_loans(self, as_of=None):
+        """(member_id, isbn, due_at) of every loan due by as_of (default now), earliest first."""
+        return self._get_overdue_loans(as_of).data
+
+    def get_next_due_loans(self, n=10):
+        """(member_id, isbn, due_at) of the n loans due first, overdue ones included, earliest first."""
+        return self._get_next_due_loans(n).data
+
+    def get_reservation_position(self, member_id, isbn):
+        """0 if a copy is held for the member, their place in the waitlist if waiting, else None."""
+        return self._get_reservation_position(member_id, isbn).data
+
+    def get_all_books(self):
+        return self.ramata_books
+
+    def get_all_members(self):
+        return list(self.ramata_members.values())
+
+    def iter_books(self, sort_by=None, reverse=False, genre=None, available_only=False, where=None):
+        """Lazily yield (isbn, book) pairs, safe to run while the catalog changes.
+
+        Only the matching ISBNs are snapshotted up front (under the catalog
+        lock); each record is fetched as it is yielded, and books deleted in
+        the meantime are skipped. genre walks the genre index, and
+        available_only checks each record; where is an optional predicate
+        on the book record.
+        """
+        if sort_by is not None and sort_by not in RAMATA_BOOK_SORT_FIELDS:
+            raise ValueError(f"Cannot sort books by '{sort_by}'; use one of {RAMATA_BOOK_SORT_FIELDS}")
+        with self._ramata_catalog_lock:
+            if genre is None:
+                isbns = list(self.ramata_books)
+            else:
+                isbns = list(map(self._ramata_book_isbns.__getitem__, self._ramata_genre_index.get(genre, ())))
+            if available_only:
+                isbns = [isbn for isbn in isbns if self.ramata_books[isbn].available_copies > 0]
+            if sort_by == "isbn":
+                isbns.sort(reverse=reverse)
+            elif sort_by is not None:
+                isbns.sort(key=lambda isbn: getattr(self.ramata_books[isbn], sort_by), reverse=reverse)
+            elif reverse:
+                isbns.reverse()
+        return self._iter_records(isbns, self.ramata_books, where, pairs=True)
+
+    def iter_members(self, sort_by=None, reverse=False, where=None):
+        """Lazily yield member records in registration order (or sorted), like iter_books."""
+        if sort_by is not None and sort_by not in RAMATA_MEMBER_SORT_FIELDS:
+            raise ValueError(f"Cannot sort members by '{sort_by}'; use one of {RAMATA_MEMBER_SORT_FIELDS}")
+        with self._ramata_catalog_lock:
+            member_ids = list(self.ramata_members)
+            if sort_by is not None:
+                member_ids.sort(key=lambda member_id: getattr(self.ramata_members[member_id], sort_by),
+                                reverse=reverse)
+            elif reverse:
+                member_ids.reverse()
+        return self._iter_records(member_ids, self.ramata_members, where, pairs=False)
+
+    # ---------------------------
+    # Core operations
+    # ---------------------------
+
+    @_ramata_metered
+    @_ramata_mutation("book")
+    def _add_book(self, isbn, title, author, genre, total_copies):
+        self._emit("book", "ADDING NEW BOOK TO RAMATA LIBRARY", heading=True)
+
+        code, message, book = self._validate_book(isbn, title, author, genre, total_copies)
+        if code != RamataCode.OK:
+            return self._fail(code, message)
+
+        self._insert_book(*book)
+        return self._succeed(f"Book '{title}' added successfully to Ramata Library!", isbn)
+
+    @_ramata_metered
+    @_ramata_mutation("catalog")
+    def _add_member(self, name, email):
+        self._emit("member", "ADDING NEW MEMBER TO RAMATA LIBRARY", heading=True)
 
         if not name or not email:
-            self._print_error("Name and email are required!")
-            return False
+            return self._fail(RamataCode.MISSING_FIELDS, "Name and email are required!")
 
         # Check if email already exists
-        for member in self.ramata_members:
-            if member['email'] == email:
-                self._print_error("Member with this email already exists!")
-                return False
+        email_key = self._normalize_email(email)
+        if self._email_owner(email_key) is not None:
+            return self._fail(RamataCode.DUPLICATE_EMAIL, "Member with this email already exists!")
 
         # Generate unique member ID
         member_id = f"RAM{self.ramata_next_member_id:03d}"
         self.ramata_next_member_id += 1
 
-        # Add member to list
-        self.ramata_members.append({
-            'member_id': member_id,
-            'name': name,
-            'email': email,
-            'borrowed_books': []  # List of ISBNs
-        })
-
-        self._print_success(f"Member '{name}' added successfully with ID: {member_id}")
-        return True
+        self._insert_member(member_id, name, email, email_key)
+        return self._succeed(f"Member '{name}' added successfully with ID: {member_id}", member_id)
 
-    def search_books(self, search_type, search_term):
-        print()
-        self._print_search("SEARCHING RAMATA LIBRARY BOOKS")
-        print()
+    @_ramata_metered
+    def _search_books(self, search_type, search_term, genre=None, available_only=False, offset=0, limit=None):
+        self._emit("search", "SEARCHING RAMATA LIBRARY BOOKS", heading=True)
 
-        if not search_term:
-            self._print_error("Search term cannot be empty!")
-            return False, []
+        if not search_term and genre is None and not available_only:
+            return self._fail(RamataCode.MISSING_FIELDS, "Search term cannot be empty!")
 
-        results = []
-        search_term = search_term.lower()
+        search_term = (search_term or "").lower()
 
         if search_type == "title":
-            # Search by title
-            for isbn, book in self.ramata_books.items():
-                if search_term in book['title'].lower():
-                    results.append((isbn, book))
+            index = self._ramata_title_index
         elif search_type == "author":
-            # Search by author
-            for isbn, book in self.ramata_books.items():
-                if search_term in book['author'].lower():
-                    results.append((isbn, book))
+            index = self._ramata_author_index
         else:
-            self._print_error("Invalid search type! Use 'title' or 'author'")
-            return False, []
+            return self._fail(RamataCode.INVALID_SEARCH_TYPE, "Invalid search type! Use 'title' or 'author'")
+
+        if genre is not None and genre not in self._ramata_genre_set:
+            return self._fail(RamataCode.INVALID_GENRE, f"Invalid genre! Must be one of: {self.ramata_valid_genres}")
+
+        if offset < 0 or (limit is not None and limit < 0):
+            return self._fail(RamataCode.INVALID_FIELD, "Offset and limit cannot be negative!")
+
+        self._index_pending_text()
+        with self._ramata_catalog_lock:
+            self._index_pending_text()
+            # Availability changes on every borrow and return, which do not
+            # take the catalog lock, so only availability-blind pages are cached
+            if available_only:
+                results = self._search_page(index, search_type, search_term, genre, True, offset, limit)
+            else:
+                key = (search_type, search_term, genre, offset, limit)
+                cached = self.ramata_search_cache.get(key, self._ramata_catalog_version)
+                if cached is None:
+                    cached = tuple(self._search_page(index, search_type, search_term, genre, False, offset, limit))
+                    self.ramata_search_cache.put(key, self._ramata_catalog_version, cached)
+                results = list(cached)
 
         if results:
-            self._print_success(f"Found {len(results)} book(s) matching '{search_term}'")
-        else:
-            self._print_info("No books found matching your search")
+            matching = f"'{search_term}'" if search_term else "the filters"
+            return self._succeed(f"Found {len(results)} book(s) matching {matching}", results)
 
-        return True, results
+        message = "No books found matching your search"
+        self._emit("info", message)
+        return RamataResult(True, RamataCode.OK, message, results)
 
-    def update_book(self, isbn, field, new_value):
-        print()
-        self._print_update("UPDATING BOOK INFORMATION")
-        print()
+    @_ramata_metered
+    @_ramata_mutation("book", timed=3)
+    def _update_book(self, isbn, field, new_value, now):
+        self._emit("update", "UPDATING BOOK INFORMATION", heading=True)
 
         if isbn not in self.ramata_books:
-            self._print_error(f"Book with ISBN '{isbn}' not found in Ramata Library!")
-            return False
+            return self._fail(RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found in Ramata Library!")
 
         book = self.ramata_books[isbn]
+        self._index_pending_book(isbn)
 
         try:
             if field == "title":
                 if not new_value:
-                    self._print_error("Title cannot be empty!")
-                    return False
-                book['title'] = new_value
-                self._print_success("Book title updated successfully!")
-                return True
+                    return self._fail(RamataCode.MISSING_FIELDS, "Title cannot be empty!")
+                self._unindex_text(self._ramata_title_index, isbn, book.title)
+                self._ramata_suggestions.remove("title", book.title, book.total_copies)
+                self._ramata_suggestions.add("title", new_value, book.total_copies)
+                book.title = new_value
+                self._index_text(self._ramata_title_index, isbn, new_value)
+                self._ramata_catalog_version += 1
+                return self._succeed("Book title updated successfully!")
 
             elif field == "author":
                 if not new_value:
-                    self._print_error("Author cannot be empty!")
-                    return False
-                book['author'] = new_value
-                self._print_success("Book author updated successfully!")
-                return True
+                    return self._fail(RamataCode.MISSING_FIELDS, "Author cannot be empty!")
+                self._unindex_text(self._ramata_author_index, isbn, book.author)
+                self._ramata_suggestions.remove("author", book.author, book.total_copies)
+                self._ramata_suggestions.add("author", new_value, book.total_copies)
+                book.author = new_value
+                self._index_text(self._ramata_author_index, isbn, new_value)
+                self._ramata_catalog_version += 1
+                return self._succeed("Book author updated successfully!")
 
             elif field == "genre":
-                if new_value not in self.ramata_valid_genres:
-                    self._print_error(f"Invalid genre! Must be one of: {self.ramata_valid_genres}")
-                    return False
-                book['genre'] = new_value
-                self._print_success("Book genre updated successfully!")
-                return True
+                if new_value not in self._ramata_genre_set:
+                    return self._fail(RamataCode.INVALID_GENRE,
+                                      f"Invalid genre! Must be one of: {self.ramata_valid_genres}")
+                seq = self._ramata_book_order[isbn]
+                _ramata_discard_posting(self._ramata_genre_index[book.genre], seq)
+                _ramata_add_posting(self._ramata_genre_index[new_value], seq)
+                book.genre = new_value
+                self.ramata_inventory.set_genre(isbn, new_value)
+                self._ramata_catalog_version += 1
+                return self._succeed("Book genre updated successfully!")
 
             elif field == "total_copies":
                 try:
                     new_copies = int(new_value)
                     if new_copies < 0:
-                        self._print_error("Copies cannot be negative!")
-                        return False
-
-                    # Adjust available copies accordingly
-                    borrowed_count = book['total_copies'] - book['available_copies']
-                    book['total_copies'] = new_copies
-                    book['available_copies'] = max(0, new_copies - borrowed_count)
-                    self._print_success("Total copies updated successfully!")
-                    return True
+                        return self._fail(RamataCode.INVALID_COPIES, "Copies cannot be negative!")
+
+                    # Adjust available copies accordingly; held copies count as out
+                    self._release_expired_holds(isbn, now)
+                    borrowed_count = book.total_copies - book.available_copies
+                    self._ramata_suggestions.adjust("title", book.title, new_copies - book.total_copies)
+                    self._ramata_suggestions.adjust("author", book.author, new_copies - book.total_copies)
+                    book.total_copies = new_copies
+                    book.available_copies = max(0, new_copies - borrowed_count)
+                    self.ramata_inventory.set_counts(isbn, new_copies, book.available_copies)
+                    self._serve_waitlist(isbn, now)
+                    return self._succeed("Total copies updated successfully!")
                 except ValueError:
-                    self._print_error("Total copies must be a number!")
-                    return False
+                    return self._fail(RamataCode.INVALID_COPIES, "Total copies must be a number!")
 
             else:
-                self._print_error("Invalid field! Use 'title', 'author', 'genre', or 'total_copies'")
-                return False
+                return self._fail(RamataCode.INVALID_FIELD,
+                                  "Invalid field! Use 'title', 'author', 'genre', or 'total_copies'")
 
         except Exception as e:
-            self._print_error(f"Error updating book: {e}")
-            return False
+            return self._fail(RamataCode.UNEXPECTED_ERROR, f"Error updating book: {e}")
 
-    def update_member(self, member_id, field, new_value):
-        print()
-        self._print_update("UPDATING MEMBER INFORMATION")
-        print()
+    @_ramata_metered
+    @_ramata_mutation("member")
+    def _update_member(self, member_id, field, new_value):
+        self._emit("update", "UPDATING MEMBER INFORMATION", heading=True)
 
         member = self._find_member_by_id(member_id)
         if not member:
-            self._print_error(f"Member with ID '{member_id}' not found!")
-            return False
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
 
         if field == "name":
             if not new_value:
-                self._print_error("Name cannot be empty!")
-                return False
-            member['name'] = new_value
-            self._print_success("Member name updated successfully!")
-            return True
+                return self._fail(RamataCode.MISSING_FIELDS, "Name cannot be empty!")
+            member.name = new_value
+            return self._succeed("Member name updated successfully!")
 
         elif field == "email":
             if not new_value:
-                self._print_error("Email cannot be empty!")
-                return False
+                return self._fail(RamataCode.MISSING_FIELDS, "Email cannot be empty!")
 
-            for m in self.ramata_members:
-                if m['email'] == new_value and m['member_id'] != member_id:
-                    self._print_error("Email already exists!")
-                    return False
+            email_key = self._normalize_email(new_value)
+            owner_id = self._email_owner(email_key)
+            if owner_id is not None and owner_id != member_id:
+                return self._fail(RamataCode.DUPLICATE_EMAIL, "Email already exists!")
 
-            member['email'] = new_value
-            self._print_success("Member email updated successfully!")
-            return True
+            del self.ramata_member_emails[self._normalize_email(member.email)]
+            self.ramata_member_emails[email_key] = member_id
+            member.email = new_value
+            return self._succeed("Member email updated successfully!")
 
         else:
-            self._print_error("Invalid field! Use 'name' or 'email'")
-            return False
+            return self._fail(RamataCode.INVALID_FIELD, "Invalid field! Use 'name' or 'email'")
 
-    def delete_book(self, isbn):
-        print()
-        self._print_delete("DELETING BOOK FROM RAMATA LIBRARY")
-        print()
+    @_ramata_metered
+    @_ramata_mutation("book")
+    def _delete_book(self, isbn):
+        self._emit("delete", "DELETING BOOK FROM RAMATA LIBRARY", heading=True)
 
         if isbn not in self.ramata_books:
-            self._print_error(f"Book with ISBN '{isbn}' not found!")
-            return False
+            return self._fail(RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
 
         book = self.ramata_books[isbn]
 
-        if book['available_copies'] < book['total_copies']:
-            self._print_error("Cannot delete book - some copies are currently borrowed!")
-            return False
-
+        if book.available_copies + len(self.ramata_holds.get(isbn, ())) < book.total_copies:
+            return self._fail(RamataCode.BOOK_BORROWED, "Cannot delete book - some copies are currently borrowed!")
+
+        self._drop_reservations_for(isbn)
+        with self._ramata_popularity_lock:
+            self._ramata_popularity.remove(isbn)
+            self._ramata_borrow_tally.pop(isbn, None)
+        self._index_pending_book(isbn)
+        self._unindex_text(self._ramata_title_index, isbn, book.title)
+        self._unindex_text(self._ramata_author_index, isbn, book.author)
+        self._ramata_suggestions.remove("title", book.title, book.total_copies)
+        self._ramata_suggestions.remove("author", book.author, book.total_copies)
+        seq = self._ramata_book_order.pop(isbn)
+        self._ramata_book_isbns[seq] = None
+        _ramata_discard_posting(self._ramata_genre_index[book.genre], seq)
+        self.ramata_inventory.remove(isbn)
+        self.ramata_book_borrowers.pop(isbn, None)
         del self.ramata_books[isbn]
-        self._print_success("Book deleted successfully from Ramata Library!")
-        return True
+        self._ramata_catalog_version += 1
+        return self._succeed("Book deleted successfully from Ramata Library!")
 
-    def delete_member(self, member_id):
-        print()
-        self._print_delete("REMOVING MEMBER FROM RAMATA LIBRARY")
-        print()
+    @_ramata_metered
+    @_ramata_mutation("member", timed=1)
+    def _delete_member(self, member_id, now):
+        self._emit("delete", "REMOVING MEMBER FROM RAMATA LIBRARY", heading=True)
 
         member = self._find_member_by_id(member_id)
         if not member:
-            self._print_error(f"Member with ID '{member_id}' not found!")
-            return False
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
 
-        if member['borrowed_books']:
-            self._print_error(f"Cannot delete member - they have {len(member['borrowed_books'])} borrowed book(s)!")
-            return False
+        if member.borrowed_books:
+            return self._fail(RamataCode.MEMBER_HAS_LOANS,
+                              f"Cannot delete member - they have {len(member.borrowed_books)} borrowed book(s)!")
 
-        self.ramata_members.remove(member)
-        self._print_success("Member deleted successfully from Ramata Library!")
-        return True
+        self._cancel_reservations_of(member_id, now)
+        del self.ramata_members[member_id]
+        del self.ramata_member_emails[self._normalize_email(member.email)]
+        return self._succeed("Member deleted successfully from Ramata Library!")
 
-    def borrow_book(self, member_id, isbn):
-        print()
-        self._print_borrow("BORROWING BOOK FROM RAMATA LIBRARY")
-        print()
+    @_ramata_metered
+    @_ramata_mutation("circulation", timed=2)
+    def _borrow_book(self, member_id, isbn, now):
+        self._emit("borrow", "BORROWING BOOK FROM RAMATA LIBRARY", heading=True)
 
         member = self._find_member_by_id(member_id)
         if not member:
-            self._print_error(f"Member with ID '{member_id}' not found!")
-            return False
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
 
-        if len(member['borrowed_books']) >= 3:
-            self._print_error("You have reached the maximum borrowing limit of 3 books!")
-            return False
+        reserved = self._reserved_isbns(member_id)
+        if len(member.borrowed_books) + len(reserved) - (isbn in reserved) >= 3:
+            return self._fail(RamataCode.BORROW_LIMIT, "You have reached the maximum borrowing limit of 3 books!")
 
         if isbn not in self.ramata_books:
-            self._print_error(f"Book with ISBN '{isbn}' not found!")
-            return False
+            return self._fail(RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
 
         book = self.ramata_books[isbn]
+        self._release_expired_holds(isbn, now)
 
-        if book['available_copies'] <= 0:
-            self._print_error("This book is currently not available!")
-            return False
+        if book.available_copies <= 0 and not self._holds_copy(member_id, isbn):
+            return self._fail(RamataCode.NO_COPIES, "This book is currently not available!")
 
-        if isbn in member['borrowed_books']:
-            self._print_error("You have already borrowed this book!")
-            return False
+        if isbn in member.borrowed_books:
+            return self._fail(RamataCode.ALREADY_BORROWED, "You have already borrowed this book!")
 
-        book['available_copies'] -= 1
-        member['borrowed_books'].append(isbn)
+        self._lend(member, isbn, now)
 
-        self._print_success(f"Book '{book['title']}' borrowed successfully!")
-        self._print_info(f"You now have {len(member['borrowed_books'])} book(s) borrowed")
-        return True
+        result = self._succeed(f"Book '{book.title}' borrowed successfully!")
+        self._emit("info", f"You now have {len(member.borrowed_books)} book(s) borrowed")
+        return result
 
-    def return_book(self, member_id, isbn):
-        print()
-        self._print_return("RETURNING BOOK TO RAMATA LIBRARY")
-        print()
+    @_ramata_metered
+    @_ramata_mutation("circulation", timed=2)
+    def _return_book(self, member_id, isbn, now):
+        self._emit("return", "RETURNING BOOK TO RAMATA LIBRARY", heading=True)
 
         member = self._find_member_by_id(member_id)
         if not member:
-            self._print_error(f"Member with ID '{member_id}' not found!")
-            return False
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
 
-        if isbn not in member['borrowed_books']:
-            self._print_error("You haven't borrowed this book!")
-            return False
+        if isbn not in member.borrowed_books:
+            return self._fail(RamataCode.NOT_BORROWED, "You haven't borrowed this book!")
 
         if isbn not in self.ramata_books:
-            self._print_error("Book not found in Ramata Library system!")
-            return False
+            return self._fail(RamataCode.BOOK_NOT_FOUND, "Book not found in Ramata Library system!")
 
-        member['borrowed_books'].remove(isbn)
-        self.ramata_books[isbn]['available_copies'] += 1
+        self._take_back(member, isbn, now)
 
-        self._print_success(f"Book '{self.ramata_books[isbn]['title']}' returned successfully!")
-        return True
+        return self._succeed(f"Book '{self.ramata_books[isbn].title}' returned successfully!")
 
-    def get_book_details(self, isbn):
-        return self.ramata_books.get(isbn)
+    @_ramata_metered
+    @_ramata_mutation("circulation", timed=2)
+    def _renew_loan(self, member_id, isbn, now):
+        self._emit("borrow", "RENEWING LOAN AT RAMATA LIBRARY", heading=True)
 
-    def get_member_details(self, member_id):
-        return self._find_member_by_id(member_id)
+        member = self._find_member_by_id(member_id)
+        if not member:
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+        loan = member.borrowed_books.loan(isbn)
+        if loan is None:
+            return self._fail(RamataCode.NOT_BORROWED, "You haven't borrowed this book!")
+
+        loan.due_at = max(loan.due_at, now) + RAMATA_LOAN_PERIOD
+        with self._ramata_due_lock:
+            self._ramata_due_index.reschedule((member_id, isbn), loan.due_at)
+
+        return self._succeed(f"Loan of '{isbn}' renewed until {time.ctime(loan.due_at)}", loan.due_at)
+
+    @_ramata_metered
+    @_ramata_mutation("cart", timed=2)
+    def _borrow_books(self, member_id, isbns, now):
+        self._emit("borrow", "BORROWING BOOKS FROM RAMATA LIBRARY", heading=True)
+        return self._borrow_cart(member_id, isbns, now)
+
+    @_ramata_metered
+    @_ramata_mutation("cart", timed=2)
+    def _return_books(self, member_id, isbns, now):
+        self._emit("return", "RETURNING BOOKS TO RAMATA LIBRARY", heading=True)
+        return self._return_cart(member_id, isbns, now)
+
+    @_ramata_metered
+    @_ramata_mutation("circulation", timed=2)
+    def _reserve(self, member_id, isbn, now):
+        self._emit("borrow", "RESERVING BOOK AT RAMATA LIBRARY", heading=True)
+        return self._place_reservation(member_id, isbn, now)
+
+    @_ramata_metered
+    @_ramata_mutation("circulation", timed=2)
+    def _cancel_reservation(self, member_id, isbn, now):
+        self._emit("return", "CANCELLING RESERVATION AT RAMATA LIBRARY", heading=True)
+        return self._withdraw_reservation(member_id, isbn, now)
+
+    @_ramata_metered
+    def _expire_holds(self, now=None, isbn=None):
+        """Release holds that ran out by now, on isbn only or on every book.
+
+        Not journaled itself: each release is logged as expire_holds(now,
+        isbn) by _release_expired_holds, under the ISBN's stripe.
+        """
+        if now is None:
+            now = self.ramata_clock()
+        journal = self.ramata_journal
+        try:
+            if isbn is not None:
+                with self._book_lock(isbn):
+                    return RamataResult(True, data=self._release_expired_holds(isbn, now))
+            with self.quiesce():
+                return RamataResult(True, data=sum(self._release_expired_holds(held_isbn, now)
+                                                   for held_isbn in list(self.ramata_holds)))
+        except RamataJournalError as error:
+            return self._journal_failed(journal, error)
+
+    @_ramata_metered
+    def _get_book_details(self, isbn):
+        book = self._find_book(isbn)
+        if book is None:
+            return RamataResult(False, RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
+        return RamataResult(True, data=book)
+
+    @_ramata_metered
+    def _get_book_borrowers(self, isbn):
+        with self._book_lock(isbn):
+            if self._find_book(isbn) is None:
+                return RamataResult(False, RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
+            return RamataResult(True, data=sorted(self.ramata_book_borrowers.get(isbn, ())))
+
+    @_ramata_metered
+    def _get_overdue_loans(self, as_of=None):
+        if as_of is None:
+            as_of = self.ramata_clock()
+        with self._ramata_due_lock:
+            due = self._ramata_due_index.due_by(as_of)
+        return RamataResult(True, data=[(member_id, isbn, due_at) for due_at, (member_id, isbn) in due])
+
+    @_ramata_metered
+    def _get_next_due_loans(self, n=10):
+        if n < 0:
+            return RamataResult(False, RamataCode.INVALID_FIELD, "The number of loans cannot be negative!")
+        with self._ramata_due_lock:
+            due = self._ramata_due_index.earliest(n)
+        return RamataResult(True, data=[(member_id, isbn, due_at) for due_at, (member_id, isbn) in due])
+
+    @_ramata_metered
+    def _get_reservation_position(self, member_id, isbn):
+        with self._book_lock(isbn):
+            if self._find_member_by_id(member_id) is None:
+                return RamataResult(False, RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+            if self._find_book(isbn) is None:
+                return RamataResult(False, RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
+            position = self._reservation_position(member_id, isbn)
+        if position is None:
+            return RamataResult(False, RamataCode.NOT_RESERVED, "You haven't reserved this book!")
+        return RamataResult(True, data=position)
+
+    @_ramata_metered
+    def _suggest(self, prefix, k=5):
+        self._index_pending_text()
+        with self._ramata_catalog_lock:
+            self._index_pending_text()
+            return RamataResult(True, data=self._ramata_suggestions.suggest(prefix, k))
+
+    @_ramata_metered
+    def _get_inventory_report(self):
+        with self._ramata_catalog_lock:
+            return RamataResult(True, data={
+                'copies_out_by_genre': self.ramata_inventory.copies_out_by_genre(),
+                'fully_checked_out': self.ramata_inventory.fully_checked_out(),
+                'utilization': self.ramata_inventory.utilization(),
+            })
+
+    @_ramata_metered
+    def _get_stats(self, top=RAMATA_TOP_BORROWED):
+        if top < 0:
+            return RamataResult(False, RamataCode.INVALID_FIELD, "The number of titles cannot be negative!")
+        totals = self.ramata_inventory.totals_by_genre()
+        genres = {genre: {'titles': len(self._ramata_genre_index[genre]), 'total_copies': total_copies,
+                          'available_copies': available_copies}
+                  for genre, (total_copies, available_copies) in totals.items()}
+        total_copies = sum(total for total, _ in totals.values())
+        available_copies = sum(available for _, available in totals.values())
+        with self._ramata_due_lock:
+            open_loans = len(self._ramata_due_index)
+            active_borrowers = self._ramata_active_borrowers
+        # delete_book drops a title from the ranking under this lock before
+        # the book goes, so every ranked ISBN still has a record here
+        with self._ramata_popularity_lock:
+            most_borrowed = [(isbn, self.ramata_books[isbn].title, count)
+                             for isbn, count in self._ramata_popularity.top(top)]
+        return RamataResult(True, data={
+            'titles': len(self.ramata_books),
+            'members': len(self.ramata_members),
+            'total_copies': total_copies,
+            'available_copies': available_copies,
+            'copies_out': total_copies - available_copies,
+            'open_loans': open_loans,
+            'active_borrowers': active_borrowers,
+            'genres': genres,
+            'most_borrowed': most_borrowed,
+        })
 
-    def get_all_books(self):
-        return self.ramata_books
+    @_ramata_metered
+    def _get_member_details(self, member_id):
+        member = self._find_member_by_id(member_id)
+        if member is None:
+            return RamataResult(False, RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+        return RamataResult(True, data=member)
+
+    @_ramata_metered
+    def _add_books_bulk(self, rows, on_reject=None):
+        self._emit("book", "BULK ADDING BOOKS TO RAMATA LIBRARY", heading=True)
+
+        journal = self.ramata_journal
+        added = rejected = 0
+        # Titles and authors are indexed afterwards, as for a restored catalog
+        with _ramata_gc_paused():
+            for row_number, row in enumerate(rows, 1):
+                try:
+                    with self._ramata_catalog_lock:
+                        code, message, book = self._validate_book_row(row)
+                        if code == RamataCode.OK:
+                            entry = journal.prepare("add_book", book) if journal is not None else None
+                            self._insert_book(*book, defer_text=True)
+                            if entry is not None:
+                                journal.record(entry)
+                except RamataJournalError as error:
+                    code, message = self._journal_failed(journal, error).code, str(error)
+                if code != RamataCode.OK:
+                    rejected += 1
+                    self._reject_row(on_reject, row_number, row, code, message)
+                    continue
+                if journal is not None:
+                    journal.checkpoint()
+                added += 1
+        self._start_text_indexing()
+
+        return self._succeed(f"Bulk load finished: {added} book(s) added, {rejected} row(s) rejected",
+                             {'added': added, 'rejected': rejected})
+
+    @_ramata_metered
+    def _add_members_bulk(self, rows, on_reject=None, chunk_size=RAMATA_BULK_CHUNK_SIZE):
+        self._emit("member", "BULK ADDING MEMBERS TO RAMATA LIBRARY", heading=True)
+
+        added = rejected = 0
+        chunk = []
+        for row_number, row in enumerate(rows, 1):
+            chunk.append((row_number, row))
+            if len(chunk) >= chunk_size:
+                chunk_added, chunk_rejected = self._add_member_chunk(chunk, on_reject)
+                added += chunk_added
+                rejected += chunk_rejected
+                chunk = []
+        if chunk:
+            chunk_added, chunk_rejected = self._add_member_chunk(chunk, on_reject)
+            added += chunk_added
+            rejected += chunk_rejected
+
+        return self._succeed(f"Bulk load finished: {added} member(s) added, {rejected} row(s) rejected",
+                             {'added': added, 'rejected': rejected})
 
-    def get_all_members(self):
-        return self.ramata_members
+    # ---------------------------
+    # Bulk ingest helpers
+    # ---------------------------
 
-    def _find_member_by_id(self, member_id):
-        for member in self.ramata_members:
-            if member['member_id'] == member_id:
-                return member
+    def _validate_book_row(self, row):
+        """Check one bulk book row; return (code, message, insert args)."""
+        if not isinstance(row, dict):
+            return RamataCode.BAD_REQUEST, "Row must be a mapping of field names to values!", None
+        return self._validate_book(row.get('isbn'), row.get('title'), row.get('author'), row.get('genre'),
+                                   row.get('total_copies'))
+
+    def _validate_book(self, isbn, title, author, genre, total_copies):
+        """Check a new book for add_book and bulk rows alike; return (code, message, insert args).
+
+        Text fields must be strings and total_copies an int or a string of
+        ASCII digits, so floats, bools and numbers standing in for text are
+        rejected rather than coerced.
+        """
+        if not isbn or not title or not author or not genre:
+            return RamataCode.MISSING_FIELDS, "All fields are required!", None
+        if not all(isinstance(value, str) for value in (isbn, title, author, genre)):
+            return RamataCode.INVALID_FIELD, "ISBN, title, author and genre must be text!", None
+        if isbn in self.ramata_books:
+            return RamataCode.DUPLICATE_ISBN, f"Book with ISBN '{isbn}' already exists!", None
+        if genre not in self._ramata_genre_set:
+            return RamataCode.INVALID_GENRE, f"Invalid genre! Must be one of: {self.ramata_valid_genres}", None
+        if isinstance(total_copies, str) and total_copies.isascii() and total_copies.isdigit():
+            total_copies = int(total_copies)
+        elif type(total_copies) is not int:
+            return RamataCode.INVALID_COPIES, "Total copies must be a whole number!", None
+        if total_copies <= 0:
+            return RamataCode.INVALID_COPIES, "Total copies cannot be less than or equal to 0!", None
+        return RamataCode.OK, "", (isbn, title, author, genre, total_copies)
+
+    def _add_member_chunk(self, chunk, on_reject):
+        """Validate a chunk of member rows, then give the survivors one ID range.
+
+        If the journal fails part-way, its rollback drops the members it
+        could not log, and their rows are rejected with the journal's error.
+        """
+        journal = self.ramata_journal
+        logged = 0
+        try:
+            with self._ramata_catalog_lock:
+                accepted, rejected = self._validate_member_chunk(chunk, on_reject)
+                first_id = self.ramata_next_member_id
+                self.ramata_next_member_id += len(accepted)
+                for row_number, row, name, email, email_key in accepted:
+                    entry = journal.prepare("add_member", (name, email)) if journal is not None else None
+                    self._insert_member(f"RAM{first_id + logged:03d}", name, email, email_key)
+                    if entry is not None:
+                        journal.record(entry)
+                    logged += 1
+        except RamataJournalError as error:
+            self._journal_failed(journal, error)
+            for row_number, row, *_ in accepted[logged:]:
+                self._reject_row(on_reject, row_number, row, error.code, str(error))
+            return logged, rejected + len(accepted) - logged
+        if logged and journal is not None:
+            journal.checkpoint()
+        return logged, rejected
+
+    def _validate_member_chunk(self, chunk, on_reject):
+        """Return the chunk's (row_number, row, name, email, email_key) survivors and how many were rejected."""
+        accepted = []
+        chunk_emails = set()
+        rejected = 0
+        for row_number, row in chunk:
+            if not isinstance(row, dict):
+                rejected += 1
+                self._reject_row(on_reject, row_number, row, RamataCode.BAD_REQUEST,
+                                 "Row must be a mapping of field names to values!")
+                continue
+            name = row.get('name')
+            email = row.get('email')
+            if not name or not email:
+                rejected += 1
+                self._reject_row(on_reject, row_number, row, RamataCode.MISSING_FIELDS,
+                                 "Name and email are required!")
+                continue
+            if not isinstance(name, str) or not isinstance(email, str):
+                rejected += 1
+                self._reject_row(on_reject, row_number, row, RamataCode.INVALID_FIELD,
+                                 "Name and email must be text!")
+                continue
+            email_key = self._normalize_email(email)
+            if email_key in chunk_emails or self._email_owner(email_key) is not None:
+                rejected += 1
+                self._reject_row(on_reject, row_number, row, RamataCode.DUPLICATE_EMAIL,
+                                 "Member with this email already exists!")
+                continue
+            chunk_emails.add(email_key)
+            accepted.append((row_number, row, name, email, email_key))
+
+        return accepted, rejected
+
+    def _borrow_cart(self, member_id, isbns, now):
+        """Check a whole cart against one member lookup, then lend all of it or nothing."""
+        member = self._find_member_by_id(member_id)
+        if not member:
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+        if not isbns:
+            return self._fail(RamataCode.MISSING_FIELDS, "No books in the cart!")
+
+        rejected = []
+        seen = set()
+        for isbn in isbns:
+            self._release_expired_holds(isbn, now)
+            book = self._find_book(isbn)
+            if book is None:
+                rejected.append((isbn, RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!"))
+            elif book.available_copies <= 0 and not self._holds_copy(member_id, isbn):
+                rejected.append((isbn, RamataCode.NO_COPIES, "This book is currently not available!"))
+            elif isbn in seen or isbn in member.borrowed_books:
+                rejected.append((isbn, RamataCode.ALREADY_BORROWED, "You have already borrowed this book!"))
+            seen.add(isbn)
+
+        # Reservations count toward the limit unless this cart collects them
+        reserved = set(self._reserved_isbns(member_id)).difference(isbns)
+        if len(member.borrowed_books) + len(isbns) + len(reserved) > 3:
+            return self._reject_cart(RamataCode.BORROW_LIMIT,
+                                     "This cart would exceed the maximum borrowing limit of 3 books!", rejected)
+        if rejected:
+            return self._reject_cart(rejected[0][1], f"{len(rejected)} book(s) in the cart cannot be borrowed!",
+                                     rejected)
+
+        for isbn in isbns:
+            self._lend(member, isbn, now)
+
+        result = self._succeed(f"{len(isbns)} book(s) borrowed successfully!")
+        self._emit("info", f"You now have {len(member.borrowed_books)} book(s) borrowed")
+        return result
+
+    def _return_cart(self, member_id, isbns, now):
+        """Check a whole cart of returns, then take back all of it or nothing."""
+        member = self._find_member_by_id(member_id)
+        if not member:
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+        if not isbns:
+            return self._fail(RamataCode.MISSING_FIELDS, "No books in the cart!")
+
+        rejected = []
+        seen = set()
+        for isbn in isbns:
+            if isbn in seen or isbn not in member.borrowed_books:
+                rejected.append((isbn, RamataCode.NOT_BORROWED, "You haven't borrowed this book!"))
+            elif self._find_book(isbn) is None:
+                rejected.append((isbn, RamataCode.BOOK_NOT_FOUND, "Book not found in Ramata Library system!"))
+            seen.add(isbn)
+
+        if rejected:
+            return self._reject_cart(rejected[0][1], f"{len(rejected)} book(s) in the cart cannot be returned!",
+                                     rejected)
+
+        for isbn in isbns:
+            self._take_back(member, isbn, now)
+
+        return self._succeed(f"{len(isbns)} book(s) returned successfully!")
+
+    def _place_reservation(self, member_id, isbn, now):
+        """Validate a reservation and add the member to the end of the book's waitlist."""
+        member = self._find_member_by_id(member_id)
+        if not member:
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+        self._release_expired_holds(isbn, now)
+        book = self._find_book(isbn)
+        if book is None:
+            return self._fail(RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
+
+        if isbn in member.borrowed_books:
+            return self._fail(RamataCode.ALREADY_BORROWED, "You have already borrowed this book!")
+
+        reserved = self._reserved_isbns(member_id)
+        if isbn in reserved:
+            return self._fail(RamataCode.ALREADY_RESERVED, "You have already reserved this book!")
+
+        if len(member.borrowed_books) + len(reserved) >= 3:
+            return self._fail(RamataCode.BORROW_LIMIT, "You have reached the maximum borrowing limit of 3 books!")
+
+        if book.available_copies > 0:
+            return self._fail(RamataCode.BOOK_AVAILABLE, "This book is on the shelf - borrow it instead!")
+
+        position = self._add_reservation(member_id, isbn)
+        return self._succeed(f"Book '{book.title}' reserved - you are number {position} in the queue", position)
+
+    def _withdraw_reservation(self, member_id, isbn, now):
+        """Drop the member's reservation, putting a copy held for them back into circulation."""
+        if self._find_member_by_id(member_id) is None:
+            return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+        self._release_expired_holds(isbn, now)
+        held = self._remove_reservation(member_id, isbn)
+        if held is None:
+            return self._fail(RamataCode.NOT_RESERVED, "You haven't reserved this book!")
+        if held:
+            self._restock(isbn, now)
+
+        return self._succeed(f"Reservation of '{isbn}' cancelled")
+
+    def _cancel_reservations_of(self, member_id, now):
+        """Cancel all of a departing member's reservations; callers hold the member's stripe."""
+        for isbn in sorted(self._reserved_isbns(member_id)):
+            with self._book_lock(isbn):
+                self._release_expired_holds(isbn, now)
+                if self._remove_reservation(member_id, isbn):
+                    self._restock(isbn, now)
+
+    def _reject_cart(self, code, message, rejected):
+        for isbn, _, reason in rejected:
+            self._emit("warning", f"{isbn}: {reason}")
+        return self._fail(code, message, rejected)
+
+    def _iter_records(self, keys, records, where, pairs):
+        for key in keys:
+            record = records.get(key)
+            if record is None or (where is not None and not where(record)):
+                continue
+            yield (key, record) if pairs else record
+
+    def _reject_row(self, on_reject, row_number, row, code, message):
+        if on_reject is not None:
+            on_reject(row_number, row, code, message)
+        else:
+            self._emit("warning", f"Row {row_number} rejected: {message}")
+
+    # ---------------------------
+    # Storage and index helpers
+    # ---------------------------
+
+    def _load_columns(self, book_columns, members, next_member_id, loan_dates=None, indexes=None):
+        """Replace the contents with books given column-wise and (id, name, email, loans) member rows.
+
+        loan_dates yields (borrowed_at, due_at) for each loan in member
+        order; without it every loan is dated from now. indexes are the
+        books' stored indexes from _stored_indexes, if the snapshot had them.
+        """
+        if loan_dates is None:
+            now = self.ramata_clock()
+            loan_dates = repeat((now, now + RAMATA_LOAN_PERIOD))
+        loan_dates = iter(loan_dates)
+        with self.quiesce(), _ramata_gc_paused():
+            self._clear()
+            self._restore_books(*book_columns, indexes=indexes)
+            for member_id, name, email, borrowed_books in members:
+                self._insert_member(member_id, name, email, self._normalize_email(email))
+                member = self.ramata_members[member_id]
+                for isbn in borrowed_books:
+                    self._add_loan(member, isbn, *next(loan_dates))
+            self.ramata_next_member_id = next_member_id
+        self._start_text_indexing()
+
+    def _restore_books(self, isbns, titles, authors, genres, total_copies, available_copies, indexes=None):
+        """Add validated books column-wise with bulk dict and array updates.
+
+        Stored indexes number the books by position and are taken as they
+        are, which holds because snapshots load into an emptied catalog.
+        Without them the genre postings are built from the genre column and
+        the title/author n-grams and suggestions are left to
+        _index_pending_text, which a background pass started by
+        _start_text_indexing runs, so loading costs no per-book Python work
+        beyond creating the records.
+        """
+        self.ramata_books.update(zip(isbns, map(RamataBook, titles, authors, genres, total_copies,
+                                                available_copies)))
+        first_slot = len(self.ramata_inventory.isbns)
+        self.ramata_inventory.extend(isbns, genres, total_copies, available_copies)
+        start = self._ramata_next_book_seq
+        self._ramata_next_book_seq += len(isbns)
+        self._ramata_book_order.update(zip(isbns, range(start, self._ramata_next_book_seq)))
+        self._ramata_book_isbns.extend(repeat(None, start - len(self._ramata_book_isbns)))
+        self._ramata_book_isbns.extend(isbns)
+        if indexes is not None:
+            genre_postings, title_index, author_index, suggestions = indexes
+            for genre, postings in zip(self.ramata_valid_genres, genre_postings):
+                self._ramata_genre_index[genre].extend(postings)
+            self._ramata_title_index.update(title_index)
+            self._ramata_author_index.update(author_index)
+            self._ramata_suggestions.load(suggestions)
+        else:
+            genre_codes = self.ramata_inventory.genre[first_slot:]
+            for code, genre in enumerate(self.ramata_valid_genres):
+                self._ramata_genre_index[genre].extend(compress(range(start, self._ramata_next_book_seq),
+                                                                _ramata_code_mask(genre_codes, code)))
+            self._ramata_unindexed_queue.extend(isbns)
+            self._ramata_unindexed_isbns.update(isbns)
+        self._ramata_catalog_version += 1
+
+    def _start_text_indexing(self):
+        """Index pending titles and authors on a background thread, if background indexing is on."""
+        if self._ramata_unindexed_isbns and self.ramata_background_indexing:
+            threading.Thread(target=self._index_pending_text, name="ramata-text-index", daemon=True).start()
+
+    def _index_pending_text(self, chunk_size=RAMATA_INDEX_CHUNK_SIZE):
+        """Index the titles and authors of bulk-restored books, returning once none are left.
+
+        Each chunk is indexed under the catalog lock, which is released in
+        between, so catalog writes are held up by one chunk at most. The
+        background pass and any search or suggestion that needs the
+        indexes share the work; a caller already holding the lock keeps it.
+        """
+        while self._ramata_unindexed_isbns:
+            with self._ramata_catalog_lock:
+                queue = self._ramata_unindexed_queue
+                for _ in range(min(chunk_size, len(queue))):
+                    self._index_pending_book(queue.popleft())
+            # Let a thread waiting for the catalog lock take it before the next chunk
+            time.sleep(0)
+
+    def _index_pending_book(self, isbn):
+        """Index one bulk-loaded book now if it is still pending; callers hold the catalog lock."""
+        if isbn not in self._ramata_unindexed_isbns:
+            return
+        self._ramata_unindexed_isbns.discard(isbn)
+        book = self.ramata_books[isbn]
+        self._index_text(self._ramata_title_index, isbn, book.title)
+        self._index_text(self._ramata_author_index, isbn, book.author)
+        self._ramata_suggestions.add("title", book.title, book.total_copies)
+        self._ramata_suggestions.add("author", book.author, book.total_copies)
+
+    def _clear(self):
+        self.ramata_books.clear()
+        self.ramata_members.clear()
+        self.ramata_member_emails.clear()
+        self.ramata_book_borrowers.clear()
+        self._ramata_title_index.clear()
+        self._ramata_author_index.clear()
+        for postings in self._ramata_genre_index.values():
+            del postings[:]
+        self._ramata_catalog_version += 1
+        self.ramata_search_cache.clear()
+        self._ramata_suggestions.clear()
+        self.ramata_inventory.clear()
+        self._ramata_book_order.clear()
+        self._ramata_book_isbns.clear()
+        self._ramata_next_book_seq = 0
+        self._ramata_unindexed_queue.clear()
+        self._ramata_unindexed_isbns.clear()
+        self._ramata_due_index.clear()
+        self.ramata_waitlists.clear()
+        self.ramata_holds.clear()
+        self._ramata_reservations.clear()
+        self._ramata_active_borrowers = 0
+        self._ramata_popularity.clear()
+        self._ramata_borrow_tally.clear()
+        self.ramata_next_member_id = 1
+
+    def _insert_book(self, isbn, title, author, genre, total_copies, available_copies=None, defer_text=False):
+        """Store a validated book and add it to every index.
+
+        With defer_text its title and author wait for _index_pending_text,
+        as restored books do.
+        """
+        if available_copies is None:
+            available_copies = total_copies
+        self.ramata_books[isbn] = RamataBook(title, author, genre, total_copies, available_copies)
+        self.ramata_inventory.add(isbn, genre, total_copies, available_copies)
+        seq = self._ramata_next_book_seq
+        self._ramata_book_order[isbn] = seq
+        self._ramata_book_isbns.extend(repeat(None, seq - len(self._ramata_book_isbns)))
+        self._ramata_book_isbns.append(isbn)
+        self._ramata_next_book_seq += 1
+        if defer_text:
+            self._ramata_unindexed_queue.append(isbn)
+            self._ramata_unindexed_isbns.add(isbn)
+        else:
+            self._index_text(self._ramata_title_index, isbn, title)
+            self._index_text(self._ramata_author_index, isbn, author)
+            self._ramata_suggestions.add("title", title, total_copies)
+            self._ramata_suggestions.add("author", author, total_copies)
+        _ramata_add_posting(self._ramata_genre_index[genre], seq)
+        self._ramata_catalog_version += 1
+
+    def _insert_member(self, member_id, name, email, email_key):
+        """Store a validated member under an already allocated ID."""
+        self.ramata_members[member_id] = RamataMember(member_id, name, email, [])
+        self.ramata_member_emails[email_key] = member_id
+
+    def _lend(self, member, isbn, now=None):
+        """Record one validated loan of isbn to member, taken out at now (default the clock's time).
+
+        A copy held for the member is collected; otherwise one comes off the shelf.
+        """
+        if now is None:
+            now = self.ramata_clock()
+        if not self._remove_reservation(member.member_id, isbn):
+            self._adjust_shelf(isbn, -1)
+        self._add_loan(member, isbn, now, now + RAMATA_LOAN_PERIOD)
+        with self._ramata_popularity_lock:
+            self._ramata_popularity.increment(isbn)
+            self._ramata_borrow_tally[isbn] = self._ramata_borrow_tally.get(isbn, 0) + 1
+
+    def _take_back(self, member, isbn, now=None):
+        """Close one validated loan of isbn held by member and pass the copy on."""
+        if now is None:
+            now = self.ramata_clock()
+        self._remove_loan(member, isbn)
+        self._restock(isbn, now)
+
+    def _adjust_shelf(self, isbn, delta):
+        book = self.ramata_books[isbn]
+        book.available_copies += delta
+        self.ramata_inventory.adjust_available(isbn, delta)
+
+    def _restock(self, isbn, now):
+        """Put one freed copy of isbn back, held for the next waiting member if there is one."""
+        self._release_expired_holds(isbn, now)
+        self._adjust_shelf(isbn, 1)
+        self._serve_waitlist(isbn, now)
+
+    def _serve_waitlist(self, isbn, now):
+        """Move shelved copies of isbn into holds for the members at the head of its waitlist.
+
+        Costs O(1) per copy held; callers hold the ISBN's stripe.
+        """
+        waitlist = self.ramata_waitlists.get(isbn)
+        if not waitlist:
+            return
+        book = self.ramata_books[isbn]
+        served = min(book.available_copies, len(waitlist))
+        if served <= 0:
+            return
+        holds = self.ramata_holds.setdefault(isbn, {})
+        for _ in range(served):
+            member_id = waitlist.popitem(last=False)[0]
+            holds[member_id] = now + RAMATA_HOLD_PERIOD
+            self._emit("info", f"A copy of '{book.title}' is held for {member_id} until "
+                               f"{time.ctime(holds[member_id])}")
+        if not waitlist:
+            del self.ramata_waitlists[isbn]
+        self._adjust_shelf(isbn, -served)
+
+    def _release_expired_holds(self, isbn, now):
+        """Return copies of isbn whose holds ran out by now, serving the waitlist again; returns how many.
+
+        Holds are kept in the order they were placed, so this stops at the
+        first live one. Each release is journaled as expire_holds(now,
+        isbn), since the operation that triggered it may itself fail; a
+        RamataJournalError from logging it is left to the caller's rollback.
+        """
+        holds = self.ramata_holds.get(isbn)
+        if not holds or next(iter(holds.values())) > now:
+            return 0
+        journal = self.ramata_journal
+        entry = journal.prepare("expire_holds", (now, isbn)) if journal is not None else None
+        released = 0
+        while holds:
+            member_id, expires_at = next(iter(holds.items()))
+            if expires_at > now:
+                break
+            del holds[member_id]
+            self._forget_reservation(member_id, isbn)
+            released += 1
+        if not holds:
+            del self.ramata_holds[isbn]
+        self._emit("info", f"{released} expired hold(s) on '{isbn}' released")
+        self._adjust_shelf(isbn, released)
+        self._serve_waitlist(isbn, now)
+        if entry is not None:
+            journal.record(entry)
+        return released
+
+    def _add_reservation(self, member_id, isbn):
+        """Queue a validated reservation; returns the member's place in the waitlist."""
+        waitlist = self.ramata_waitlists.get(isbn)
+        if waitlist is None:
+            waitlist = self.ramata_waitlists[isbn] = OrderedDict()
+        waitlist[member_id] = None
+        with self._ramata_reservation_lock:
+            self._ramata_reservations.setdefault(member_id, set()).add(isbn)
+        return len(waitlist)
+
+    def _remove_reservation(self, member_id, isbn):
+        """Drop the member's reservation of isbn.
+
+        Returns True if a copy was held for them, False if they were still
+        waiting and None if they had not reserved it.
+        """
+        holds = self.ramata_holds.get(isbn)
+        if holds is not None and member_id in holds:
+            del holds[member_id]
+            if not holds:
+                del self.ramata_holds[isbn]
+            held = True
+        else:
+            waitlist = self.ramata_waitlists.get(isbn)
+            if waitlist is None or member_id not in waitlist:
+                return None
+            del waitlist[member_id]
+            if not waitlist:
+                del self.ramata_waitlists[isbn]
+            held = False
+        self._forget_reservation(member_id, isbn)
+        return held
+
+    def _forget_reservation(self, member_id, isbn):
+        with self._ramata_reservation_lock:
+            isbns = self._ramata_reservations.get(member_id)
+            if isbns is not None:
+                isbns.discard(isbn)
+                if not isbns:
+                    del self._ramata_reservations[member_id]
+
+    def _drop_reservations_for(self, isbn):
+        """Forget every reservation of a book being deleted."""
+        for member_id in [*self.ramata_waitlists.pop(isbn, ()), *self.ramata_holds.pop(isbn, ())]:
+            self._forget_reservation(member_id, isbn)
+
+    def _reserved_isbns(self, member_id):
+        """The ISBNs member_id has reserved, waiting or held."""
+        with self._ramata_reservation_lock:
+            return tuple(self._ramata_reservations.get(member_id, ()))
+
+    def _holds_copy(self, member_id, isbn):
+        return member_id in self.ramata_holds.get(isbn, ())
+
+    def _reservation_position(self, member_id, isbn):
+        if self._holds_copy(member_id, isbn):
+            return 0
+        for position, waiting_id in enumerate(self.ramata_waitlists.get(isbn, ()), 1):
+            if waiting_id == member_id:
+                return position
         return None
 
+    def _load_reservations(self, waitlists, holds):
+        """Restore (isbn, member_id) waiting reservations in queue order and (isbn, member_id, expires_at) holds."""
+        with self.quiesce():
+            for isbn, member_id in waitlists:
+                self._add_reservation(member_id, isbn)
+            for isbn, member_id, expires_at in holds:
+                self.ramata_holds.setdefault(isbn, {})[member_id] = expires_at
+                self._ramata_reservations.setdefault(member_id, set()).add(isbn)
+
+    def _lifetime_borrow_counts(self):
+        """(isbn, lifetime borrows) of every book borrowed at least once."""
+        with self._ramata_popularity_lock:
+            return list(self._ramata_borrow_tally.items())
+
+    def _load_borrow_counts(self, counts):
+        """Restore (isbn, lifetime borrows) pairs; ISBNs not in the catalog are skipped."""
+        counts = [(isbn, count) for isbn, count in counts if isbn in self.ramata_books and count > 0]
+        with self.quiesce(), self._ramata_popularity_lock:
+            self._ramata_popularity.load(counts)
+            self._ramata_borrow_tally = dict(counts)
+
+    def _add_loan(self, member, isbn, borrowed_at, due_at):
+        """Add a loan to the member's set, the ISBN -> borrowers index and the due index."""
+        member.borrowed_books.add(isbn, RamataLoan(borrowed_at, due_at))
+        with self._ramata_due_lock:
+            self._ramata_due_index.push((member.member_id, isbn), due_at)
+            if len(member.borrowed_books) == 1:
+                self._ramata_active_borrowers += 1
+        borrowers = self.ramata_book_borrowers.get(isbn)
+        if borrowers is None:
+            self.ramata_book_borrowers[isbn] = {member.member_id}
+        else:
+            borrowers.add(member.member_id)
+
+    def _remove_loan(self, member, isbn):
+        member.borrowed_books.discard(isbn)
+        with self._ramata_due_lock:
+            self._ramata_due_index.remove((member.member_id, isbn))
+            if not member.borrowed_books:
+                self._ramata_active_borrowers -= 1
+        borrowers = self.ramata_book_borrowers.get(isbn)
+        if borrowers is not None:
+            borrowers.discard(member.member_id)
+            if not borrowers:
+                del self.ramata_book_borrowers[isbn]
+
+    def _find_book(self, isbn):
+        return self.ramata_books.get(isbn)
+
+    def _find_member_by_id(self, member_id):
+        return self.ramata_members.get(member_id)
+
+    def _member_lock(self, member_id):
+        return self._ramata_member_locks[hash(member_id) % RAMATA_LOCK_STRIPES]
+
+    def _book_lock(self, isbn):
+        return self._ramata_book_locks[hash(isbn) % RAMATA_LOCK_STRIPES]
+
+    def _normalize_email(self, email):
+        return email.strip().lower()
+
+    def _email_owner(self, email_key):
+        return self.ramata_member_emails.get(email_key)
+
+    def _index_text(self, index, isbn, text):
+        seq = self._ramata_book_order[isbn]
+        for gram in _ramata_ngrams(text):
+            postings = index.get(gram)
+            if postings is None:
+                index[gram] = array('q', (seq,))
+            else:
+                _ramata_add_posting(postings, seq)
+
+    def _unindex_text(self, index, isbn, text):
+        seq = self._ramata_book_order[isbn]
+        for gram in _ramata_ngrams(text):
+            postings = index.get(gram)
+            if postings is not None:
+                _ramata_discard_posting(postings, seq)
+                if not postings:
+                    del index[gram]
+
+    def _search_page(self, index, search_type, search_term, genre, available_only, offset, limit):
+        """Collect one page of matches, walking candidates in catalog order until it is full.
+
+        The walk follows the shortest of the term's n-gram postings and the
+        genre's postings, or the whole catalog when neither narrows it, and
+        checks every filter on each book it reaches, so a page costs the
+        candidates passed before it fills rather than a sort of all matches.
+        """
+        postings = []
+        if len(search_term) >= RAMATA_NGRAM_SIZE:
+            postings.append(min((index.get(gram, ()) for gram in _ramata_ngrams(search_term)), key=len))
+        if genre is not None:
+            postings.append(self._ramata_genre_index[genre])
+        if postings:
+            candidates = map(self._ramata_book_isbns.__getitem__, min(postings, key=len))
+        else:
+            candidates = filter(None, self._ramata_book_isbns)
+
+        results = []
+        if limit == 0:
+            return results
+        for isbn in candidates:
+            book = self.ramata_books[isbn]
+            if search_term not in getattr(book, search_type).lower():
+                continue
+            if (genre is not None and book.genre != genre) or (available_only and book.available_copies <= 0):
+                continue
+            if offset:
+                offset -= 1
+                continue
+            results.append((isbn, book))
+            if len(results) == limit:
+                break
+        return results
+
     def display_menu(self):
         terminal_width = shutil.get_terminal_size().columns
         print()
@@ -409,9 +3101,9 @@ class RamataMiniLibraryManagementSystem:
                 elif choice == "9":
                     self._interactive_return_book()
                 elif choice == "10":
-                    self._display_all_books()
+                    self._display_all_books(self._terminal_page_size())
                 elif choice == "11":
-                    self._display_all_members()
+                    self._display_all_members(self._terminal_page_size())
                 elif choice == "12":
                     print("🙏 Thank you for using Ramata Library System!")
                     print("🌟 Have a wonderful day! 🌟")
@@ -459,13 +3151,13 @@ class RamataMiniLibraryManagementSystem:
             print()
             self._print_book("SEARCH RESULTS")
             for isbn, book in result:
-                available = book['available_copies']
-                total = book['total_copies']
+                available = book.available_copies
+                total = book.total_copies
                 status = "✅ Available" if available > 0 else "❌ Out of Stock"
                 print(f"   ISBN: {isbn}")
-                print(f"   Title: {book['title']}")
-                print(f"   Author: {book['author']}")
-                print(f"   Genre: {book['genre']}")
+                print(f"   Title: {book.title}")
+                print(f"   Author: {book.author}")
+                print(f"   Genre: {book.genre}")
                 print(f"   Status: {available}/{total} copies - {status}")
                 print("   " + "-" * 40)
 
@@ -523,42 +3215,210 @@ class RamataMiniLibraryManagementSystem:
 
         self.return_book(member_id, isbn)
 
-    def _display_all_books(self):
+    def _display_all_books(self, page_size=None):
         print()
         self._print_book("ALL BOOKS IN RAMATA LIBRARY")
         print()
-        books = self.get_all_books()
-        if not books:
+        blocks = (self._format_book_block(isbn, book) for isbn, book in self.iter_books())
+        if not self._write_listing(blocks, page_size):
             self._print_info("No books in the Ramata Library yet.")
-            return
 
-        for isbn, book in books.items():
-            available = book['available_copies']
-            total = book['total_copies']
-            status = "✅ Available" if available > 0 else "❌ Out of Stock"
-            print(f"📖 {book['title']} by {book['author']}")
-            print(f"   ISBN: {isbn}")
-            print(f"   Genre: {book['genre']}")
-            print(f"   Status: {available}/{total} copies - {status}")
-            print("   " + "🌸" * 30)
-
-    def _display_all_members(self):
+    def _display_all_members(self, page_size=None):
         print()
         self._print_member("ALL MEMBERS OF RAMATA LIBRARY")
         print()
-        members = self.get_all_members()
-        if not members:
+        blocks = (self._format_member_block(member) for member in self.iter_members())
+        if not self._write_listing(blocks, page_size):
             self._print_info("No members registered in Ramata Library yet.")
-            return
 
-        for member in members:
-            borrowed_count = len(member['borrowed_books'])
-            print(f"👤 {member['name']}")
-            print(f"   ID: {member['member_id']}")
-            print(f"   Email: {member['email']}")
-            print(f"   Borrowed Books: {borrowed_count}")
-            print("   " + "💫" * 30)
+    def _format_book_block(self, isbn, book):
+        available = book.available_copies
+        total = book.total_copies
+        status = "✅ Available" if available > 0 else "❌ Out of Stock"
+        return (f"📖 {book.title} by {book.author}\n"
+                f"   ISBN: {isbn}\n"
+                f"   Genre: {book.genre}\n"
+                f"   Status: {available}/{total} copies - {status}\n"
+                f"   {'🌸' * 30}\n")
+
+    def _format_member_block(self, member):
+        return (f"👤 {member.name}\n"
+                f"   ID: {member.member_id}\n"
+                f"   Email: {member.email}\n"
+                f"   Borrowed Books: {len(member.borrowed_books)}\n"
+                f"   {'💫' * 30}\n")
+
+    def _write_listing(self, blocks, page_size=None):
+        """Write rendered records in chunks of RAMATA_DISPLAY_CHUNK_SIZE; return how many were written.
+
+        With page_size set, output pauses after every page_size records until
+        Enter is pressed (q stops the listing).
+        """
+        out = sys.stdout
+        buffer = []
+        written = 0
+        for block in blocks:
+            if page_size and written and written % page_size == 0:
+                out.write("".join(buffer))
+                buffer.clear()
+                out.flush()
+                if input("-- More: Enter to continue, q to stop -- ").strip().lower() == "q":
+                    return written
+            buffer.append(block)
+            written += 1
+            if len(buffer) >= RAMATA_DISPLAY_CHUNK_SIZE:
+                out.write("".join(buffer))
+                buffer.clear()
+        out.write("".join(buffer))
+        out.flush()
+        return written
+
+    def _terminal_page_size(self):
+        """Records that fit on one screen, or None (no paging) when not writing to a terminal."""
+        if not sys.stdout.isatty():
+            return None
+        return max(1, (shutil.get_terminal_size().lines - 2) // 5)
+
+
+# ---------------------------
+# Batch command mode
+# ---------------------------
+
+def _ramata_json_default(value):
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if isinstance(value, RamataLoanSet):
+        return list(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_ramata_result(request_id, result):
+    """One compact JSON line (newline included) carrying request_id and the result's fields."""
+    response = result.to_dict()
+    response['id'] = request_id
+    return json.dumps(response, default=_ramata_json_default, separators=(",", ":")) + "\n"
+
+
+def _ramata_csv_arguments(operation, fields):
+    """Convert CSV fields (all strings) into the arguments operation expects."""
+    if operation == "add_book" and len(fields) == 5:
+        return fields[:4] + [int(fields[4])]
+    if operation in ("borrow_books", "return_books") and fields:
+        return [fields[0], fields[1:]]
+    if operation == "get_overdue_loans" and fields:
+        return [float(fields[0])] + fields[1:]
+    if operation in ("get_next_due_loans", "get_stats") and fields:
+        return [int(fields[0])]
+    if operation == "search_books" and len(fields) > 2:
+        genre = fields[2] or None
+        available_only = len(fields) > 3 and fields[3].lower() in ("1", "true", "yes")
+        offset = int(fields[4]) if len(fields) > 4 and fields[4] else 0
+        limit = int(fields[5]) if len(fields) > 5 and fields[5] else None
+        return fields[:2] + [genre, available_only, offset, limit]
+    return fields
+
+
+def parse_ramata_command(line, allow_csv=True):
+    """Parse a JSON object line or a CSV line into (request_id, operation, args).
+
+    JSON lines look like {"id": 1, "op": "borrow_book", "args": ["RAM001",
+    "978-0735211292"]}; CSV lines put the operation first, then its
+    arguments: borrow_book,RAM001,978-0735211292. Raises ValueError for
+    anything else, including CSV when allow_csv is false.
+    """
+    if isinstance(line, bytes):
+        line = line.decode()
+    line = line.strip()
+    if line.startswith("{"):
+        request = json.loads(line)
+        try:
+            request_id = request.get('id')
+            operation = request['op']
+            args = request.get('args', [])
+        except (KeyError, AttributeError):
+            raise ValueError("Request needs an 'op'") from None
+        if not isinstance(args, list):
+            raise ValueError("args must be a list")
+        return request_id, operation, args
+    if not allow_csv:
+        raise ValueError("Expected a JSON object")
+
+    fields = next(csv.reader([line]), None)
+    if not fields or not fields[0]:
+        raise ValueError("Empty command")
+    return None, fields[0].strip(), _ramata_csv_arguments(fields[0].strip(), fields[1:])
+
+
+def execute_ramata_line(library, line, allow_csv=True):
+    """Execute one JSON or CSV command line and return its encoded result line."""
+    try:
+        request_id, operation, args = parse_ramata_command(line, allow_csv)
+    except ValueError:
+        return encode_ramata_result(None, RamataResult(False, RamataCode.BAD_REQUEST, "Malformed request line"))
+
+    try:
+        result = library.execute(operation, *args)
+    except TypeError as e:
+        result = RamataResult(False, RamataCode.BAD_REQUEST, f"Bad arguments for '{operation}': {e}")
+    except Exception as e:
+        # Arguments of the wrong type can fail deep inside an operation;
+        # the request is answered and the caller moves on to the next line
+        result = RamataResult(False, RamataCode.UNEXPECTED_ERROR, f"'{operation}' failed: {e!r}")
+    try:
+        return encode_ramata_result(request_id, result)
+    except (TypeError, ValueError) as e:
+        # Unserializable result data or request id; the line still gets its answer
+        if not isinstance(request_id, (str, int, float, bool, type(None))):
+            request_id = None
+        return encode_ramata_result(request_id, RamataResult(False, RamataCode.UNEXPECTED_ERROR,
+                                                             f"Cannot encode the result of '{operation}': {e}"))
+
+
+def run_ramata_batch(library, lines, out=None):
+    """Execute every non-blank command line, writing one result line each; return the count.
+
+    Nothing is rendered besides the result lines, which are written
+    RAMATA_DISPLAY_CHUNK_SIZE at a time. A command that fails is answered
+    with a BAD_REQUEST or UNEXPECTED_ERROR line and the batch carries on;
+    if reading the input itself fails, the finished lines are still written.
+    """
+    out = out or sys.stdout
+    buffer = []
+    executed = 0
+    try:
+        for line in lines:
+            if not line.strip():
+                continue
+            buffer.append(execute_ramata_line(library, line))
+            executed += 1
+            if len(buffer) >= RAMATA_DISPLAY_CHUNK_SIZE:
+                out.write("".join(buffer))
+                buffer.clear()
+    finally:
+        out.write("".join(buffer))
+        out.flush()
+    return executed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ramata Mini Library Management System")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="run JSON or CSV command lines from FILE (default: stdin) and print one "
+                             "JSON result line per command instead of the interactive menu")
+    args = parser.parse_args(argv)
+
+    if args.batch is None:
+        RamataMiniLibraryManagementSystem().run_interactive()
+        return 0
+
+    library = RamataMiniLibraryManagementSystem(event_sink=None)
+    if args.batch == "-":
+        run_ramata_batch(library, sys.stdin)
+    else:
+        with open(args.batch, encoding="utf-8", newline="") as commands:
+            run_ramata_batch(library, commands)
+    return 0
+
 
 if __name__ == "__main__":
-    library = RamataMiniLibraryManagementSystem()
-    library.run_interactive()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
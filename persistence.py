@@ -0,0 +1,243 @@
+import json
+import os
+import threading
+
+from operations import RamataCode, RamataJournalError, RamataMiniLibraryManagementSystem
+
+
+# Core operations that can appear in the write-ahead log
+RAMATA_LOGGED_OPERATIONS = ("add_book", "add_member", "update_book", "update_member", "delete_book",
+                            "delete_member", "borrow_book", "return_book", "borrow_books", "return_books",
+                            "renew_loan", "reserve", "cancel_reservation", "expire_holds")
+
+
+class RamataWriteAheadLog:
+    """Append-only JSON-lines log of successful library mutations.
+
+    Each line is [sequence, operation, args]. Writes are flushed and
+    fsync'ed once every fsync_every entries, so a crash loses at most that
+    many of the most recent mutations.
+    """
+
+    def __init__(self, path, fsync_every=1):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self._handle = open(path, "a", encoding="utf-8")
+        self._unsynced = 0
+
+    @staticmethod
+    def encode(operation, args):
+        """Return the JSON text of an entry's operation and arguments; raises TypeError/ValueError."""
+        return json.dumps([operation, list(args)], separators=(",", ":"))[1:]
+
+    def append(self, sequence, encoded):
+        self._handle.write(f"[{sequence},{encoded}\n")
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._unsynced = 0
+
+    def truncate(self):
+        """Drop every entry; called once a snapshot covers them."""
+        self._handle.close()
+        self._handle = open(self.path, "w", encoding="utf-8")
+        self.sync()
+
+    def close(self):
+        if not self._handle.closed:
+            self.sync()
+            self._handle.close()
+
+    def abandon(self):
+        """Close after a failed write without syncing; whatever reached the file is cut off on recovery."""
+        try:
+            self._handle.close()
+        except OSError:
+            pass
+
+
+def read_log(path):
+    """Yield (sequence, operation, args, end_offset) for every intact entry.
+
+    Only the last write can be partial, so reading stops at the first line
+    that is not complete, valid JSON.
+    """
+    if not os.path.exists(path):
+        return
+    offset = 0
+    with open(path, "rb") as handle:
+        for line in handle:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                sequence, operation, args = json.loads(line)
+            except ValueError:
+                return
+            offset += len(line)
+            yield sequence, operation, args, offset
+
+
+class RamataPersistentStore:
+    """Keeps a library durable with a write-ahead log plus periodic snapshots.
+
+    Startup loads the latest snapshot and replays only the log entries
+    written after it. Once snapshot_every entries have been logged the
+    state is compacted into a new snapshot and the log is truncated.
+
+    If a log write fails, the store stops logging and rollback() reloads
+    the library from the snapshot and the intact log, dropping the change
+    that could not be logged, before reopening the log.
+    """
+
+    SNAPSHOT_FILE = "snapshot.json"
+    LOG_FILE = "wal.jsonl"
+
+    def __init__(self, directory, fsync_every=1, snapshot_every=100_000):
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, self.LOG_FILE)
+        self.library = None
+        self._log = None
+        self._sequence = 0
+        self._logged_since_snapshot = 0
+        # Set when a log write fails; the library is reloaded from disk
+        # before anything is logged again
+        self._needs_rollback = False
+        # Serializes log appends from concurrent mutations; always taken
+        # after the library's own locks
+        self._lock = threading.Lock()
+
+    def open(self, event_sink=None):
+        """Recover the library from disk and start logging its mutations."""
+        os.makedirs(self.directory, exist_ok=True)
+        library = self._recover()
+        library.ramata_event_sink = event_sink
+        library.ramata_journal = self
+        self.library = library
+        self._log = RamataWriteAheadLog(self.log_path, self.fsync_every)
+        return library
+
+    def _recover(self, last_sequence=None):
+        """Return a new library rebuilt from the snapshot and the intact log entries after it.
+
+        Entries after last_sequence, when given, are cut off with any torn tail.
+        """
+        library = RamataMiniLibraryManagementSystem(event_sink=None)
+        self._sequence = 0
+        self._logged_since_snapshot = 0
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as handle:
+                snapshot = json.load(handle)
+            library.load_state(snapshot['state'])
+            self._sequence = snapshot['sequence']
+
+        intact_size = 0
+        for sequence, operation, args, end_offset in read_log(self.log_path):
+            if last_sequence is not None and sequence > last_sequence:
+                break
+            intact_size = end_offset
+            if sequence <= self._sequence:
+                continue
+            if operation not in RAMATA_LOGGED_OPERATIONS:
+                raise ValueError(f"Unknown operation '{operation}' in {self.log_path}")
+            library.replay(operation, *args)
+            self._sequence = sequence
+            self._logged_since_snapshot += 1
+
+        # Cut off a torn final entry so new entries start on a clean line
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > intact_size:
+            os.truncate(self.log_path, intact_size)
+        return library
+
+    def snapshot(self):
+        """Write the current state as the new snapshot and empty the log."""
+        with self.library.quiesce(), self._lock:
+            self._log.sync()
+            temporary_path = self.snapshot_path + ".tmp"
+            with open(temporary_path, "w", encoding="utf-8") as handle:
+                json.dump({'sequence': self._sequence, 'state': self.library.dump_state()}, handle,
+                          separators=(",", ":"))
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temporary_path, self.snapshot_path)
+            self._log.truncate()
+            self._logged_since_snapshot = 0
+
+    # ---------------------------
+    # Library journal protocol
+    # ---------------------------
+
+    def prepare(self, operation, args):
+        """Encode a mutation's entry before it runs, so one that cannot be logged is refused untouched."""
+        if self._log is None:
+            with self._lock:
+                if not self._needs_rollback:
+                    self._reopen_log()
+            if self._log is None:
+                raise RamataJournalError(RamataCode.UNEXPECTED_ERROR, "The write-ahead log is unavailable!")
+        try:
+            return RamataWriteAheadLog.encode(operation, args)
+        except (TypeError, ValueError) as error:
+            raise RamataJournalError(RamataCode.BAD_REQUEST,
+                                     f"Arguments of '{operation}' cannot be logged: {error}") from None
+
+    def record(self, entry):
+        """Log one successful mutation; runs under the mutation's locks."""
+        with self._lock:
+            if self._log is None:
+                self._needs_rollback = True
+                raise RamataJournalError(RamataCode.UNEXPECTED_ERROR, "The write-ahead log is unavailable!")
+            try:
+                self._log.append(self._sequence + 1, entry)
+            except OSError as error:
+                self._needs_rollback = True
+                self._log.abandon()
+                self._log = None
+                raise RamataJournalError(RamataCode.UNEXPECTED_ERROR,
+                                         f"Could not write the write-ahead log: {error}") from None
+            self._sequence += 1
+            self._logged_since_snapshot += 1
+
+    def rollback(self):
+        """Reload the library from disk after a failed log write, then reopen the log.
+
+        Runs with no library locks held, after every journal failure.
+        Until the reload and the reopen succeed, mutations are refused
+        before they run, and each refusal tries again.
+        """
+        library = self.library
+        with library.quiesce(), self._lock:
+            if self._needs_rollback:
+                try:
+                    # The failed entry may have reached the file in part or in full
+                    library.load_state(self._recover(self._sequence).dump_state())
+                except OSError:
+                    return
+                self._needs_rollback = False
+            self._reopen_log()
+
+    def _reopen_log(self):
+        if self._log is None:
+            try:
+                self._log = RamataWriteAheadLog(self.log_path, self.fsync_every)
+            except OSError:
+                pass
+
+    def checkpoint(self):
+        """Compact into a snapshot once enough entries have been logged."""
+        if self._log is not None and self._logged_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self.library is not None:
+            self.library.ramata_journal = None
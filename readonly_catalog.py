@@ -0,0 +1,318 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from bisect import bisect_right
+from collections.abc import Mapping
+from itertools import accumulate
+
+from operations import (RamataBook, RamataCode, RamataMiniLibraryManagementSystem, _ramata_metered,
+                        _ramata_pack_numbers, print_ramata_event)
+
+
+# Catalog file header: magic, format version, reserved and book count,
+# followed by an (offset, length) pair for each section
+RAMATA_CATALOG_MAGIC = b"RMLC"
+RAMATA_CATALOG_VERSION = 1
+RAMATA_CATALOG_SECTIONS = ("isbn_order", "record_starts", "records", "genres", "total_copies",
+                           "available_copies", "title_starts", "titles", "author_starts", "authors")
+_RAMATA_CATALOG_HEADER = struct.Struct("<4sHHQ")
+_RAMATA_CATALOG_SECTION = struct.Struct("<QQ")
+_RAMATA_CATALOG_NUMBER = struct.Struct("<q")
+
+
+def _ramata_blob_starts(blobs):
+    """Start offset of each blob in their concatenation, plus the total length."""
+    starts = [0]
+    starts.extend(accumulate(map(len, blobs)))
+    return _ramata_pack_numbers('q', starts)
+
+
+def write_ramata_catalog(library, path):
+    """Write the library's books to path in the memory-mappable catalog format.
+
+    Records are kept in catalog order. An ISBN-sorted index of record
+    numbers lets readers binary-search by ISBN, and the lowercased titles
+    and authors are stored as NUL-terminated blobs so searches scan them
+    with mmap.find(). Members and loans are not included.
+    """
+    books = library.dump_state()['books']
+    genre_codes = {genre: code for code, genre in enumerate(library.ramata_valid_genres)}
+    records, titles, authors = [], [], []
+    for isbn, title, author, genre, total_copies, available_copies in books:
+        if "\0" in isbn + title + author:
+            raise ValueError(f"Book '{isbn}' cannot be written to a catalog: NUL characters are not allowed")
+        records.append(f"{isbn}\0{title}\0{author}".encode("utf-8"))
+        titles.append(title.lower().encode("utf-8") + b"\0")
+        authors.append(author.lower().encode("utf-8") + b"\0")
+    # UTF-8 byte order is code point order, so readers compare encoded ISBNs
+    encoded_isbns = [record[:record.index(b"\0")] for record in records]
+
+    sections = [
+        _ramata_pack_numbers('q', sorted(range(len(books)), key=encoded_isbns.__getitem__)),
+        _ramata_blob_starts(records), b"".join(records),
+        bytes(genre_codes[book[3]] for book in books),
+        _ramata_pack_numbers('q', (book[4] for book in books)),
+        _ramata_pack_numbers('q', (book[5] for book in books)),
+        _ramata_blob_starts(titles), b"".join(titles),
+        _ramata_blob_starts(authors), b"".join(authors),
+    ]
+    # Sections start on 8-byte boundaries
+    offset = _RAMATA_CATALOG_HEADER.size + _RAMATA_CATALOG_SECTION.size * len(sections)
+    table, padded = [], []
+    for section in sections:
+        table.append(_RAMATA_CATALOG_SECTION.pack(offset, len(section)))
+        padding = b"\0" * (-len(section) % 8)
+        padded.append(section + padding)
+        offset += len(section) + len(padding)
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as handle:
+        handle.write(_RAMATA_CATALOG_HEADER.pack(RAMATA_CATALOG_MAGIC, RAMATA_CATALOG_VERSION, 0, len(books)))
+        handle.writelines(table)
+        handle.writelines(padded)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary_path, path)
+
+
+class _RamataPackedColumn:
+    """A little-endian int64 array inside a buffer, decoded one item per access."""
+    __slots__ = ("_buffer", "_offset", "_length")
+
+    def __init__(self, buffer, offset, length):
+        self._buffer = buffer
+        self._offset = offset
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return _RAMATA_CATALOG_NUMBER.unpack_from(self._buffer, self._offset + 8 * index)[0]
+
+
+class RamataCatalogFile(Mapping):
+    """Read-only ISBN -> RamataBook mapping over a memory-mapped catalog file.
+
+    Opening only maps the file and reads its header, so it takes the same
+    time for any catalog size, and processes mapping the same file share
+    its pages. Each lookup binary-searches the ISBN index and decodes just
+    the one record; a fresh RamataBook is returned every time. There is no
+    checksum, since verifying one would read the whole file.
+    """
+
+    def __init__(self, path, genres):
+        self.path = path
+        self.genres = genres
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _RAMATA_CATALOG_HEADER.size:
+            raise ValueError(f"{path} is too short to be a Ramata catalog")
+        magic, version, _, self._count = _RAMATA_CATALOG_HEADER.unpack_from(self._map)
+        if magic != RAMATA_CATALOG_MAGIC:
+            raise ValueError(f"{path} is not a Ramata catalog")
+        if version != RAMATA_CATALOG_VERSION:
+            raise ValueError(f"Unsupported catalog version {version} in {path}")
+
+        sections = {}
+        for number, name in enumerate(RAMATA_CATALOG_SECTIONS):
+            offset, length = _RAMATA_CATALOG_SECTION.unpack_from(
+                self._map, _RAMATA_CATALOG_HEADER.size + number * _RAMATA_CATALOG_SECTION.size)
+            if offset + length > len(self._map):
+                raise ValueError(f"Catalog {path} is truncated")
+            sections[name] = offset
+        self._records = sections['records']
+        self._genres = sections['genres']
+        self._text = {'title': sections['titles'], 'author': sections['authors']}
+        self._isbn_order = self._column(sections['isbn_order'], self._count)
+        self._record_starts = self._column(sections['record_starts'], self._count + 1)
+        self._total_copies = self._column(sections['total_copies'], self._count)
+        self._available_copies = self._column(sections['available_copies'], self._count)
+        self._text_starts = {'title': self._column(sections['title_starts'], self._count + 1),
+                             'author': self._column(sections['author_starts'], self._count + 1)}
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return map(self.isbn_at, range(self._count))
+
+    def __contains__(self, isbn):
+        return self.record_of(isbn) is not None
+
+    def __getitem__(self, isbn):
+        record = self.record_of(isbn)
+        if record is None:
+            raise KeyError(isbn)
+        return self.book_at(record)
+
+    def record_of(self, isbn):
+        """Catalog position of isbn, or None."""
+        if not isinstance(isbn, str):
+            return None
+        key = isbn.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record = self._isbn_order[middle]
+            found = self._isbn_bytes(record)
+            if found == key:
+                return record
+            if found < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def isbn_at(self, record):
+        return self._isbn_bytes(record).decode("utf-8")
+
+    def book_at(self, record):
+        start = self._records + self._record_starts[record]
+        end = self._records + self._record_starts[record + 1]
+        _, title, author = self._map[start:end].decode("utf-8").split("\0")
+        return RamataBook(title, author, self.genres[self._map[self._genres + record]],
+                          self._total_copies[record], self._available_copies[record])
+
+    def available_at(self, record):
+        return self._available_copies[record]
+
+    def next_match(self, record, field, needle, genre_code=None):
+        """First position from record on whose lowercased field contains needle and whose genre matches.
+
+        needle is lowercased UTF-8 and may be empty; genre_code None matches
+        any genre. The text and genre scans leapfrog each other, both
+        running in C over the mapped pages. Returns None past the last match.
+        """
+        while record < self._count:
+            candidate = record
+            if needle:
+                candidate = self._find_text(field, needle, candidate)
+            if candidate is not None and genre_code is not None:
+                candidate = self._find_genre(genre_code, candidate)
+            if candidate is None or candidate == record:
+                return candidate
+            record = candidate
+        return None
+
+    def _column(self, offset, length):
+        return _RamataPackedColumn(self._map, offset, length)
+
+    def _isbn_bytes(self, record):
+        start = self._records + self._record_starts[record]
+        return self._map[start:self._map.find(b"\0", start)]
+
+    def _find_text(self, field, needle, record):
+        base, starts = self._text[field], self._text_starts[field]
+        position = self._map.find(needle, base + starts[record], base + starts[self._count])
+        if position < 0:
+            return None
+        # Every text ends in NUL and needles never contain one, so a match
+        # lies inside a single record's text
+        return bisect_right(starts, position - base, record) - 1
+
+    def _find_genre(self, genre_code, record):
+        position = self._map.find(bytes((genre_code,)), self._genres + record, self._genres + self._count)
+        return None if position < 0 else position - self._genres
+
+
+def _ramata_read_only(operation):
+    def reject(self, *args, **kwargs):
+        return self._fail(RamataCode.READ_ONLY,
+                          f"Ramata catalog '{self.ramata_books.path}' is read-only; {operation} is not allowed!")
+    reject.__name__ = f"_{operation}"
+    return _ramata_metered(reject)
+
+
+class RamataReadOnlyCatalog(RamataMiniLibraryManagementSystem):
+    """Ramata Library serving searches and book details from a memory-mapped catalog file.
+
+    ramata_books is a RamataCatalogFile, so startup costs the same for any
+    catalog size and nothing is decoded until it is asked for. Searches
+    scan the file's lowercased title or author text in catalog order and
+    stop once the page is full. The catalog has no members, loans or
+    derived indexes, so every mutation, suggest(), get_stats() and
+    get_inventory_report() fails with RamataCode.READ_ONLY (the public
+    methods return None), and load_state(), load_snapshot() and
+    check_stats() raise PermissionError.
+    """
+
+    def __init__(self, path, event_sink=print_ramata_event):
+        super().__init__(event_sink=event_sink)
+        self.ramata_books = RamataCatalogFile(path, self.ramata_valid_genres)
+
+    def close(self):
+        self.ramata_books.close()
+
+    _add_book = _ramata_read_only("add_book")
+    _add_member = _ramata_read_only("add_member")
+    _update_book = _ramata_read_only("update_book")
+    _update_member = _ramata_read_only("update_member")
+    _delete_book = _ramata_read_only("delete_book")
+    _delete_member = _ramata_read_only("delete_member")
+    _borrow_book = _ramata_read_only("borrow_book")
+    _return_book = _ramata_read_only("return_book")
+    _borrow_books = _ramata_read_only("borrow_books")
+    _return_books = _ramata_read_only("return_books")
+    _renew_loan = _ramata_read_only("renew_loan")
+    _reserve = _ramata_read_only("reserve")
+    _cancel_reservation = _ramata_read_only("cancel_reservation")
+    _add_books_bulk = _ramata_read_only("add_books_bulk")
+    _add_members_bulk = _ramata_read_only("add_members_bulk")
+    _suggest = _ramata_read_only("suggest")
+    _get_stats = _ramata_read_only("get_stats")
+    _get_inventory_report = _ramata_read_only("get_inventory_report")
+
+    def iter_books(self, sort_by=None, reverse=False, genre=None, available_only=False, where=None):
+        def matches(book):
+            return ((genre is None or book.genre == genre) and (not available_only or book.available_copies > 0)
+                    and (where is None or where(book)))
+        return super().iter_books(sort_by, reverse, where=matches)
+
+    def _load_columns(self, book_columns, members, next_member_id, loan_dates=None):
+        raise PermissionError(f"Ramata catalog '{self.ramata_books.path}' is read-only")
+
+    def check_stats(self, top=None):
+        raise PermissionError(f"Ramata catalog '{self.ramata_books.path}' keeps no stats to check")
+
+    def _search_page(self, index, search_type, search_term, genre, available_only, offset, limit):
+        needle = search_term.encode("utf-8")
+        if b"\0" in needle:
+            return []
+        genre_code = None if genre is None else self.ramata_valid_genres.index(genre)
+
+        catalog = self.ramata_books
+        results = []
+        record = catalog.next_match(0, search_type, needle, genre_code)
+        while record is not None and (limit is None or len(results) < limit):
+            if not available_only or catalog.available_at(record) > 0:
+                if offset:
+                    offset -= 1
+                else:
+                    results.append((catalog.isbn_at(record), catalog.book_at(record)))
+            record = catalog.next_match(record + 1, search_type, needle, genre_code)
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a read-only Ramata catalog from a binary snapshot")
+    parser.add_argument("snapshot", help="file written by export_snapshot()")
+    parser.add_argument("catalog", help="catalog file to write")
+    args = parser.parse_args(argv)
+
+    library = RamataMiniLibraryManagementSystem(event_sink=None)
+    library.load_snapshot(args.snapshot)
+    write_ramata_catalog(library, args.catalog)
+    print(f"✅ {len(library.ramata_books)} books written to {args.catalog}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
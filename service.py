@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from operations import (RamataCode, RamataMiniLibraryManagementSystem, RamataResult, encode_ramata_result,
+                        execute_ramata_line, parse_ramata_command)
+from readonly_catalog import RamataReadOnlyCatalog
+
+# Requests read ahead of the one being executed, per connection; when the
+# queue is full the server stops reading and TCP pushes back on the client
+RAMATA_PIPELINE_DEPTH = 64
+
+
+def encode_response(request_id, result):
+    return encode_ramata_result(request_id, result).encode()
+
+
+def handle_request_line(library, line):
+    """Execute one JSON request line and return the encoded response line.
+
+    Never raises: a request that fails in any way, including while its
+    result is encoded, is answered with RamataCode.UNEXPECTED_ERROR.
+    """
+    try:
+        return execute_ramata_line(library, line, allow_csv=False).encode()
+    except Exception as e:
+        try:
+            request_id = parse_ramata_command(line, allow_csv=False)[0]
+        except Exception:
+            request_id = None
+        if not isinstance(request_id, (str, int, float, bool, type(None))):
+            request_id = None
+        return encode_response(request_id, RamataResult(False, RamataCode.UNEXPECTED_ERROR,
+                                                        f"Request failed: {e!r}"))
+
+
+class RamataLibraryService:
+    """Line-protocol TCP front end for a silent Ramata Library.
+
+    Each request is one JSON line, {"id": 1, "op": "borrow_book", "args":
+    ["RAM001", "978-0735211292"]}, answered by one JSON line carrying the
+    same id plus ok, code, message and data. Clients may pipeline: a
+    connection's requests are executed and answered in order while later
+    ones are still being read, up to RAMATA_PIPELINE_DEPTH at a time.
+    """
+
+    def __init__(self, library=None, pipeline_depth=RAMATA_PIPELINE_DEPTH):
+        self.library = library if library is not None else RamataMiniLibraryManagementSystem(event_sink=None)
+        self.pipeline_depth = pipeline_depth
+        self._server = None
+        self._connections = set()
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        self._server.close()
+        for connection in self._connections:
+            connection.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _serve_connection(self, reader, writer):
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        pending = asyncio.Queue(self.pipeline_depth)
+        responder = asyncio.create_task(self._respond(pending, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    await pending.put(line)
+            await pending.put(None)
+            await responder
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            await pending.put(None)
+            await responder
+        except asyncio.CancelledError:
+            # Shut down by stop(): queued requests are dropped unanswered
+            responder.cancel()
+        finally:
+            writer.close()
+            self._connections.discard(connection)
+
+    async def _respond(self, pending, writer):
+        try:
+            while True:
+                line = await pending.get()
+                if line is None:
+                    break
+                # handle_request_line answers every request, so one bad
+                # request cannot stop the responses to those behind it
+                writer.write(handle_request_line(self.library, line))
+                # Only wait for the socket once nothing else is queued, so
+                # pipelined responses go out in batches
+                if pending.empty():
+                    await writer.drain()
+        except ConnectionError:
+            # The client went away; drain what it already sent
+            while await pending.get() is not None:
+                pass
+
+
+async def _load_client(host, port, requests, pipeline, latencies, make_request):
+    reader, writer = await asyncio.open_connection(host, port)
+    window = asyncio.Semaphore(pipeline)
+    sent_at = {}
+
+    async def receive():
+        for _ in range(requests):
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent_at.pop(response['id']))
+            window.release()
+
+    receiver = asyncio.create_task(receive())
+    for number in range(requests):
+        await window.acquire()
+        sent_at[number] = time.perf_counter()
+        writer.write(json.dumps(make_request(number)).encode() + b"\n")
+        await writer.drain()
+    await receiver
+    writer.close()
+
+
+async def run_load_test(host, port, clients=20, requests=2_000, pipeline=16, books=1_000):
+    """Drive the service from many pipelined clients; return rps and latency percentiles."""
+    def seed_request(number):
+        return {'id': number, 'op': "add_book",
+                'args': [f"LOAD-{number:06d}", f"Load Book {number}", "Load Author", "Mystery", 5]}
+    await _load_client(host, port, books, pipeline, [], seed_request)
+
+    def mixed_request(number):
+        isbn = f"LOAD-{number % books:06d}"
+        if number % 4 == 0:
+            return {'id': number, 'op': "search_books", 'args': ["title", f"book {number % books}"]}
+        return {'id': number, 'op': "get_book_details", 'args': [isbn]}
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_load_client(host, port, requests, pipeline, latencies, mixed_request)
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1e3,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1e3,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ramata Library network service")
+    parser.add_argument("command", choices=("serve", "loadtest"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2_000, help="requests per client")
+    parser.add_argument("--pipeline", type=int, default=16, help="requests in flight per client")
+    parser.add_argument("--catalog", help="serve this read-only catalog file (see readonly_catalog.py)")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        async def serve():
+            library = RamataReadOnlyCatalog(args.catalog, event_sink=None) if args.catalog else None
+            service = RamataLibraryService(library)
+            host, port = await service.start(args.host, args.port)
+            print(f"🏛️  Ramata Library service listening on {host}:{port}")
+            await service.serve_forever()
+        asyncio.run(serve())
+    else:
+        report = asyncio.run(run_load_test(args.host, args.port, args.clients, args.requests, args.pipeline))
+        print(f"📊 {report['requests']:,} requests: {report['requests_per_sec']:,.0f} req/s, "
+              f"p50 {report['p50_ms']:.2f} ms, p99 {report['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
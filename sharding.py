@@ -0,0 +1,358 @@
+import heapq
+import multiprocessing
+import os
+import threading
+import zlib
+from itertools import islice
+
+from operations import RamataCode, RamataMember, RamataMiniLibraryManagementSystem, RamataResult
+
+# Bulk rows sent to the shards per round trip
+RAMATA_SHARD_BATCH_SIZE = 20_000
+
+
+def ramata_shard_for(isbn, shard_count):
+    """Index of the shard that owns isbn; stable across runs and processes."""
+    return zlib.crc32(str(isbn).encode()) % shard_count
+
+
+# ---------------------------
+# Shard process side
+# ---------------------------
+
+def _shard_add_book(library, seq, isbn, title, author, genre, total_copies):
+    # Searches merge shard results by this catalog-wide sequence number
+    library._ramata_next_book_seq = seq
+    return library._add_book(isbn, title, author, genre, total_copies)
+
+
+def _shard_ingest(library, numbered_rows):
+    rejected = []
+
+    def rows():
+        for _, seq, row in numbered_rows:
+            library._ramata_next_book_seq = seq
+            yield row
+
+    def on_reject(local_number, row, code, message):
+        rejected.append((numbered_rows[local_number - 1][0], code, message))
+
+    return library._add_books_bulk(rows(), on_reject).data['added'], rejected
+
+
+def _shard_search(library, search_type, search_term, genre, available_only, limit):
+    result = library._search_books(search_type, search_term, genre, available_only, 0, limit)
+    if result.ok:
+        result.data = [(library._ramata_book_order[isbn], isbn, book) for isbn, book in result.data]
+    return result
+
+
+def _shard_lend(library, member_id, isbn, already_borrowed):
+    book = library.ramata_books.get(isbn)
+    if book is None:
+        return RamataResult(False, RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
+    if book.available_copies <= 0:
+        return RamataResult(False, RamataCode.NO_COPIES, "This book is currently not available!")
+    if already_borrowed:
+        return RamataResult(False, RamataCode.ALREADY_BORROWED, "You have already borrowed this book!")
+    # The member record lives in the coordinator; a stand-in keeps the borrowers index
+    library._lend(RamataMember(member_id, "", "", ()), isbn)
+    return RamataResult(True, RamataCode.OK, f"Book '{book.title}' borrowed successfully!")
+
+
+def _shard_take_back(library, member_id, isbn):
+    book = library.ramata_books.get(isbn)
+    if book is None:
+        return RamataResult(False, RamataCode.BOOK_NOT_FOUND, "Book not found in Ramata Library system!")
+    library._take_back(RamataMember(member_id, "", "", (isbn,)), isbn)
+    return RamataResult(True, RamataCode.OK, f"Book '{book.title}' returned successfully!")
+
+
+_RAMATA_SHARD_COMMANDS = {
+    'add_book': _shard_add_book,
+    'ingest': _shard_ingest,
+    'search': _shard_search,
+    'lend': _shard_lend,
+    'take_back': _shard_take_back,
+    'execute': RamataMiniLibraryManagementSystem.execute,
+    'get_book_details': RamataMiniLibraryManagementSystem.get_book_details,
+    'book_count': lambda library: len(library.ramata_books),
+}
+
+
+def _shard_worker(connection):
+    """Serve (command, args) requests against this shard's books until sent None."""
+    library = RamataMiniLibraryManagementSystem(event_sink=None)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        command, args = request
+        try:
+            connection.send((True, _RAMATA_SHARD_COMMANDS[command](library, *args)))
+        except Exception as e:
+            connection.send((False, e))
+    connection.close()
+
+
+# ---------------------------
+# Coordinator side
+# ---------------------------
+
+class RamataShardedLibrary:
+    """Ramata Library whose books are partitioned across worker processes.
+
+    Each of shard_count processes owns the books whose ISBN hashes to it
+    (see ramata_shard_for) with all their indexes. Point operations go to
+    the owning shard only; searches and bulk ingest are sent to every
+    shard at once, so each shard works on its part on its own core, and the
+    results are merged back here in catalog order. Members and their loans
+    stay in this process. Calls from several threads are serialized; the
+    library is always silent.
+    """
+
+    RAMATA_OPERATIONS = ("add_book", "add_member", "search_books", "update_book", "update_member",
+                         "delete_book", "delete_member", "borrow_book", "return_book",
+                         "get_book_details", "get_member_details", "get_book_borrowers")
+
+    def __init__(self, shard_count=None, start_method=None):
+        self.shard_count = shard_count or os.cpu_count() or 1
+        context = multiprocessing.get_context(start_method)
+        self._connections = []
+        self._processes = []
+        for _ in range(self.shard_count):
+            connection, child_connection = context.Pipe()
+            process = context.Process(target=_shard_worker, args=(child_connection,), daemon=True)
+            process.start()
+            child_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+        # Holds the members only; its book tables stay empty
+        self._members = RamataMiniLibraryManagementSystem(event_sink=None)
+        self._next_book_seq = 0
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.send(None)
+            for connection, process in zip(self._connections, self._processes):
+                process.join()
+                connection.close()
+            self._connections = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    # ---------------------------
+    # Public operations
+    # ---------------------------
+
+    def execute(self, operation, *args):
+        """Run a core operation by name and return its RamataResult."""
+        if operation not in self.RAMATA_OPERATIONS:
+            return RamataResult(False, RamataCode.UNKNOWN_OPERATION, f"Unknown operation '{operation}'")
+        return getattr(self, f"_{operation}")(*args)
+
+    def add_book(self, isbn, title, author, genre, total_copies):
+        return self._add_book(isbn, title, author, genre, total_copies).ok
+
+    def add_member(self, name, email):
+        return self._add_member(name, email).ok
+
+    def search_books(self, search_type, search_term, genre=None, available_only=False, offset=0, limit=None):
+        """Same contract as RamataMiniLibraryManagementSystem.search_books, across every shard."""
+        result = self._search_books(search_type, search_term, genre, available_only, offset, limit)
+        return result.ok, result.data if result.ok else []
+
+    def update_book(self, isbn, field, new_value):
+        return self._update_book(isbn, field, new_value).ok
+
+    def update_member(self, member_id, field, new_value):
+        return self._update_member(member_id, field, new_value).ok
+
+    def delete_book(self, isbn):
+        return self._delete_book(isbn).ok
+
+    def delete_member(self, member_id):
+        return self._delete_member(member_id).ok
+
+    def borrow_book(self, member_id, isbn):
+        return self._borrow_book(member_id, isbn).ok
+
+    def return_book(self, member_id, isbn):
+        return self._return_book(member_id, isbn).ok
+
+    def add_books_bulk(self, rows, on_reject=None):
+        """Add books from row mappings, RAMATA_SHARD_BATCH_SIZE rows per parallel round.
+
+        Rejected rows reach on_reject(row_number, row, code, message) in row
+        order within each round.
+        """
+        return self._add_books_bulk(rows, on_reject).data
+
+    def add_members_bulk(self, rows, on_reject=None):
+        with self._lock:
+            return self._members.add_members_bulk(rows, on_reject)
+
+    def get_book_details(self, isbn):
+        return self._call(isbn, "get_book_details", isbn)
+
+    def get_member_details(self, member_id):
+        with self._lock:
+            return self._members.get_member_details(member_id)
+
+    def get_book_borrowers(self, isbn):
+        """Member IDs currently holding isbn, sorted; None if the book does not exist."""
+        return self._get_book_borrowers(isbn).data
+
+    def get_book_count(self):
+        return sum(self._broadcast("book_count", [()] * self.shard_count))
+
+    # ---------------------------
+    # Core operations
+    # ---------------------------
+
+    def _add_book(self, isbn, title, author, genre, total_copies):
+        with self._lock:
+            seq = self._next_book_seq
+            self._next_book_seq += 1
+        return self._call(isbn, "add_book", seq, isbn, title, author, genre, total_copies)
+
+    def _add_member(self, name, email):
+        with self._lock:
+            return self._members._add_member(name, email)
+
+    def _update_book(self, isbn, field, new_value):
+        return self._call(isbn, "execute", "update_book", isbn, field, new_value)
+
+    def _update_member(self, member_id, field, new_value):
+        with self._lock:
+            return self._members._update_member(member_id, field, new_value)
+
+    def _delete_book(self, isbn):
+        return self._call(isbn, "execute", "delete_book", isbn)
+
+    def _delete_member(self, member_id):
+        with self._lock:
+            return self._members._delete_member(member_id)
+
+    def _get_book_details(self, isbn):
+        return self._call(isbn, "execute", "get_book_details", isbn)
+
+    def _get_member_details(self, member_id):
+        with self._lock:
+            return self._members._get_member_details(member_id)
+
+    def _get_book_borrowers(self, isbn):
+        return self._call(isbn, "execute", "get_book_borrowers", isbn)
+
+    def _borrow_book(self, member_id, isbn):
+        with self._lock:
+            member = self._members.get_member_details(member_id)
+            if not member:
+                return RamataResult(False, RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+            if len(member.borrowed_books) >= 3:
+                return RamataResult(False, RamataCode.BORROW_LIMIT,
+                                    "You have reached the maximum borrowing limit of 3 books!")
+            result = self._call_locked(isbn, "lend", member_id, isbn, isbn in member.borrowed_books)
+            if result.ok:
+                member.borrowed_books.add(isbn)
+            return result
+
+    def _return_book(self, member_id, isbn):
+        with self._lock:
+            member = self._members.get_member_details(member_id)
+            if not member:
+                return RamataResult(False, RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+            if isbn not in member.borrowed_books:
+                return RamataResult(False, RamataCode.NOT_BORROWED, "You haven't borrowed this book!")
+            result = self._call_locked(isbn, "take_back", member_id, isbn)
+            if result.ok:
+                member.borrowed_books.discard(isbn)
+            return result
+
+    def _search_books(self, search_type, search_term, genre=None, available_only=False, offset=0, limit=None):
+        if offset < 0 or (limit is not None and limit < 0):
+            return RamataResult(False, RamataCode.INVALID_FIELD, "Offset and limit cannot be negative!")
+
+        # Every shard returns its first offset + limit matches tagged with
+        # their catalog sequence numbers; the page is cut from the merge
+        shard_limit = None if limit is None else offset + limit
+        results = self._broadcast("search", [(search_type, search_term, genre, available_only, shard_limit)]
+                                  * self.shard_count)
+        for result in results:
+            if not result.ok:
+                return result
+
+        merged = heapq.merge(*(result.data for result in results))
+        end = None if limit is None else offset + limit
+        page = [(isbn, book) for _, isbn, book in islice(merged, offset, end)]
+        if page:
+            search_term = (search_term or "").lower()
+            matching = f"'{search_term}'" if search_term else "the filters"
+            return RamataResult(True, RamataCode.OK, f"Found {len(page)} book(s) matching {matching}", page)
+        return RamataResult(True, RamataCode.OK, "No books found matching your search", page)
+
+    def _add_books_bulk(self, rows, on_reject=None):
+        added = rejected = 0
+        rows = enumerate(rows, 1)
+        while True:
+            batch = list(islice(rows, RAMATA_SHARD_BATCH_SIZE))
+            if not batch:
+                break
+            with self._lock:
+                first_seq = self._next_book_seq
+                self._next_book_seq += len(batch)
+
+            parts = [[] for _ in range(self.shard_count)]
+            for offset, (row_number, row) in enumerate(batch):
+                parts[ramata_shard_for(row.get('isbn'), self.shard_count)].append((row_number, first_seq + offset, row))
+
+            rejections = []
+            for shard_added, shard_rejections in self._broadcast("ingest", [(part,) for part in parts]):
+                added += shard_added
+                rejections += shard_rejections
+            rejected += len(rejections)
+            if on_reject is not None:
+                first_row_number = batch[0][0]
+                for row_number, code, message in sorted(rejections):
+                    on_reject(row_number, batch[row_number - first_row_number][1], code, message)
+
+        return RamataResult(True, RamataCode.OK,
+                            f"Bulk load finished: {added} book(s) added, {rejected} row(s) rejected",
+                            {'added': added, 'rejected': rejected})
+
+    # ---------------------------
+    # Shard messaging
+    # ---------------------------
+
+    def _call(self, isbn, command, *args):
+        with self._lock:
+            return self._call_locked(isbn, command, *args)
+
+    def _call_locked(self, isbn, command, *args):
+        connection = self._connections[ramata_shard_for(isbn, self.shard_count)]
+        connection.send((command, args))
+        return self._receive(connection)
+
+    def _broadcast(self, command, shard_args):
+        """Send command to every shard before waiting on any, then gather the replies in shard order."""
+        with self._lock:
+            for connection, args in zip(self._connections, shard_args):
+                connection.send((command, args))
+            replies = [connection.recv() for connection in self._connections]
+        for ok, value in replies:
+            if not ok:
+                raise value
+        return [value for _, value in replies]
+
+    def _receive(self, connection):
+        ok, value = connection.recv()
+        if not ok:
+            raise value
+        return value
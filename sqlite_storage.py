@@ -0,0 +1,844 @@
+import itertools
+import sqlite3
+import threading
+import time
+
+from operations import (RAMATA_BOOK_SORT_FIELDS, RAMATA_DISPLAY_CHUNK_SIZE, RAMATA_HOLD_PERIOD, RAMATA_LOAN_PERIOD,
+                        RAMATA_MEMBER_SORT_FIELDS, RAMATA_SUGGEST_TOP, RAMATA_TOP_BORROWED, RamataBook, RamataCode, RamataLoan,
+                        RamataMember, RamataMiniLibraryManagementSystem, RamataResult, _ramata_metered,
+                        print_ramata_event)
+
+
+RAMATA_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    isbn TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    total_copies INTEGER NOT NULL,
+    available_copies INTEGER NOT NULL,
+    title_key TEXT NOT NULL,
+    author_key TEXT NOT NULL,
+    borrow_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS books_author_key ON books (author_key);
+CREATE INDEX IF NOT EXISTS books_genre ON books (genre);
+CREATE INDEX IF NOT EXISTS books_borrow_count ON books (borrow_count);
+
+CREATE TABLE IF NOT EXISTS members (
+    member_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS loans (
+    member_id TEXT NOT NULL,
+    isbn TEXT NOT NULL,
+    borrowed_at REAL NOT NULL,
+    due_at REAL NOT NULL,
+    PRIMARY KEY (member_id, isbn)
+);
+CREATE INDEX IF NOT EXISTS loans_isbn ON loans (isbn);
+CREATE INDEX IF NOT EXISTS loans_due_at ON loans (due_at, member_id, isbn);
+
+-- One row per reservation; rowid order is queue order, and held_until is
+-- NULL while the member is still waiting
+CREATE TABLE IF NOT EXISTS reservations (
+    isbn TEXT NOT NULL,
+    member_id TEXT NOT NULL,
+    held_until REAL,
+    PRIMARY KEY (isbn, member_id)
+);
+CREATE INDEX IF NOT EXISTS reservations_member ON reservations (member_id);
+CREATE INDEX IF NOT EXISTS reservations_held_until ON reservations (held_until);
+
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO settings (name, value) VALUES ('next_member_id', 1);
+
+-- Live figures for get_stats(), kept by triggers inside the transaction of
+-- every change to books, members and loans
+CREATE TABLE IF NOT EXISTS genre_stats (
+    genre TEXT PRIMARY KEY,
+    titles INTEGER NOT NULL,
+    total_copies INTEGER NOT NULL,
+    available_copies INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (name, value) VALUES ('members', 0), ('open_loans', 0), ('active_borrowers', 0);
+
+CREATE TRIGGER IF NOT EXISTS books_stats_insert AFTER INSERT ON books BEGIN
+    INSERT OR IGNORE INTO genre_stats VALUES (NEW.genre, 0, 0, 0);
+    UPDATE genre_stats SET titles = titles + 1, total_copies = total_copies + NEW.total_copies,
+                           available_copies = available_copies + NEW.available_copies
+    WHERE genre = NEW.genre;
+END;
+CREATE TRIGGER IF NOT EXISTS books_stats_delete AFTER DELETE ON books BEGIN
+    UPDATE genre_stats SET titles = titles - 1, total_copies = total_copies - OLD.total_copies,
+                           available_copies = available_copies - OLD.available_copies
+    WHERE genre = OLD.genre;
+END;
+CREATE TRIGGER IF NOT EXISTS books_stats_update AFTER UPDATE OF genre, total_copies, available_copies ON books BEGIN
+    UPDATE genre_stats SET titles = titles - 1, total_copies = total_copies - OLD.total_copies,
+                           available_copies = available_copies - OLD.available_copies
+    WHERE genre = OLD.genre;
+    INSERT OR IGNORE INTO genre_stats VALUES (NEW.genre, 0, 0, 0);
+    UPDATE genre_stats SET titles = titles + 1, total_copies = total_copies + NEW.total_copies,
+                           available_copies = available_copies + NEW.available_copies
+    WHERE genre = NEW.genre;
+END;
+CREATE TRIGGER IF NOT EXISTS members_stats_insert AFTER INSERT ON members BEGIN
+    UPDATE stats SET value = value + 1 WHERE name = 'members';
+END;
+CREATE TRIGGER IF NOT EXISTS members_stats_delete AFTER DELETE ON members BEGIN
+    UPDATE stats SET value = value - 1 WHERE name = 'members';
+END;
+-- A member becomes an active borrower with their first loan and stops with their last
+CREATE TRIGGER IF NOT EXISTS loans_stats_insert AFTER INSERT ON loans BEGIN
+    UPDATE stats SET value = value + 1 WHERE name = 'open_loans';
+    UPDATE stats SET value = value + 1 WHERE name = 'active_borrowers'
+        AND (SELECT COUNT(*) FROM loans WHERE member_id = NEW.member_id) = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS loans_stats_delete AFTER DELETE ON loans BEGIN
+    UPDATE stats SET value = value - 1 WHERE name = 'open_loans';
+    UPDATE stats SET value = value - 1 WHERE name = 'active_borrowers'
+        AND NOT EXISTS (SELECT 1 FROM loans WHERE member_id = OLD.member_id);
+END;
+"""
+
+BOOK_COLUMNS = "isbn, title, author, genre, total_copies, available_copies"
+
+
+class RamataSQLiteLibrary(RamataMiniLibraryManagementSystem):
+    """Ramata Library whose books, members and loans live in a SQLite database.
+
+    Public methods behave as in the in-memory library, except that the
+    records handed back are copies read from the database rather than the
+    live ones. Borrowing and returning each run in one transaction, so the
+    availability check and the copy count change are atomic. get_stats()
+    reads per-genre and library-wide counter rows that triggers keep up
+    to date; lifetime borrows are a books column ranked through its index.
+    """
+
+    def __init__(self, path, event_sink=print_ramata_event):
+        super().__init__(event_sink=event_sink)
+        self.ramata_database_path = path
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        # One transaction at a time on the shared connection
+        self._connection_lock = threading.RLock()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(RAMATA_SQLITE_SCHEMA)
+        self.ramata_next_member_id = self._query_value("SELECT value FROM settings WHERE name = 'next_member_id'")
+
+    def close(self):
+        self._connection.close()
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+
+    def get_all_books(self):
+        rows = self._connection.execute(f"SELECT {BOOK_COLUMNS} FROM books ORDER BY rowid")
+        return dict(self._book_from_row(row) for row in rows)
+
+    def get_all_members(self):
+        loans = {}
+        for member_id, *loan in self._connection.execute(
+                "SELECT member_id, isbn, borrowed_at, due_at FROM loans ORDER BY rowid"):
+            loans.setdefault(member_id, []).append(loan)
+        rows = self._connection.execute("SELECT member_id, name, email FROM members ORDER BY rowid")
+        return [self._member_from_row(row, loans.get(row[0], [])) for row in rows]
+
+    def iter_books(self, sort_by=None, reverse=False, genre=None, available_only=False, where=None):
+        if sort_by is not None and sort_by not in RAMATA_BOOK_SORT_FIELDS:
+            raise ValueError(f"Cannot sort books by '{sort_by}'; use one of {RAMATA_BOOK_SORT_FIELDS}")
+        conditions, params = [], []
+        if genre is not None:
+            conditions.append("genre = ?")
+            params.append(genre)
+        if available_only:
+            conditions.append("available_copies > 0")
+        filters = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT {BOOK_COLUMNS} FROM books {filters} ORDER BY {self._order_by(sort_by, reverse)}"
+        pairs = self._iter_pages(sql, params, lambda rows: [self._book_from_row(row) for row in rows])
+        return (pair for pair in pairs if where is None or where(pair[1]))
+
+    def iter_members(self, sort_by=None, reverse=False, where=None):
+        if sort_by is not None and sort_by not in RAMATA_MEMBER_SORT_FIELDS:
+            raise ValueError(f"Cannot sort members by '{sort_by}'; use one of {RAMATA_MEMBER_SORT_FIELDS}")
+        sql = f"SELECT member_id, name, email FROM members ORDER BY {self._order_by(sort_by, reverse)}"
+        members = self._iter_pages(sql, [], self._members_from_rows)
+        return (member for member in members if where is None or where(member))
+
+    @_ramata_metered
+    def _suggest(self, prefix, k=5):
+        prefix = prefix.lower().lstrip()
+        k = min(k, RAMATA_SUGGEST_TOP)
+        if not prefix or k <= 0:
+            return RamataResult(True, data=[])
+        # A space in front of both sides turns "starts any word" into a plain instr()
+        rows = self._connection.execute(
+            "SELECT text, kind FROM ("
+            " SELECT title AS text, 'title' AS kind, SUM(total_copies) AS copies FROM books"
+            " WHERE instr(' ' || title_key, ?1) > 0 GROUP BY title"
+            " UNION ALL"
+            " SELECT author, 'author', SUM(total_copies) FROM books"
+            " WHERE instr(' ' || author_key, ?1) > 0 GROUP BY author"
+            ") ORDER BY copies DESC, kind, text LIMIT ?2", (" " + prefix, k))
+        return RamataResult(True, data=[tuple(row) for row in rows])
+
+    @_ramata_metered
+    def _get_inventory_report(self):
+        copies_out_by_genre = dict.fromkeys(self.ramata_valid_genres, 0)
+        copies_out_by_genre.update(self._connection.execute(
+            "SELECT genre, SUM(total_copies - available_copies) FROM books GROUP BY genre"))
+        fully_checked_out = [isbn for isbn, in self._connection.execute(
+            "SELECT isbn FROM books WHERE total_copies > 0 AND available_copies = 0 ORDER BY rowid")]
+        total_copies, available_copies = self._connection.execute(
+            "SELECT COALESCE(SUM(total_copies), 0), COALESCE(SUM(available_copies), 0) FROM books").fetchone()
+        return RamataResult(True, data={
+            'copies_out_by_genre': copies_out_by_genre,
+            'fully_checked_out': fully_checked_out,
+            'utilization': (total_copies - available_copies) / total_copies if total_copies else 0.0,
+        })
+
+    def check_stats(self, top=RAMATA_TOP_BORROWED):
+        """As in the in-memory library, in one transaction.
+
+        Lifetime borrows exist only as the books.borrow_count column, so
+        most_borrowed is checked for ranking that column correctly, not
+        for the counts themselves.
+        """
+        with self._transaction():
+            return super().check_stats(top)
+
+    def dump_state(self):
+        members = self.get_all_members()
+        return {
+            'books': [[isbn, book.title, book.author, book.genre, book.total_copies,
+                       book.available_copies] for isbn, book in self.get_all_books().items()],
+            'members': [[member.member_id, member.name, member.email, list(member.borrowed_books)]
+                        for member in members],
+            'loan_dates': [[loan.borrowed_at, loan.due_at] for member in members
+                           for loan in map(member.borrowed_books.loan, member.borrowed_books)],
+            'next_member_id': self.ramata_next_member_id,
+            'waitlists': [list(row) for row in self._connection.execute(
+                "SELECT isbn, member_id FROM reservations WHERE held_until IS NULL ORDER BY isbn, rowid")],
+            'holds': [list(row) for row in self._connection.execute(
+                "SELECT isbn, member_id, held_until FROM reservations WHERE held_until IS NOT NULL "
+                "ORDER BY isbn, held_until, rowid")],
+            'borrow_counts': [list(row) for row in self._lifetime_borrow_counts()],
+        }
+
+    def load_state(self, state):
+        loan_dates = state.get('loan_dates')
+        if loan_dates is None:
+            now = self.ramata_clock()
+            loan_dates = itertools.repeat((now, now + RAMATA_LOAN_PERIOD))
+        with self._transaction():
+            self._clear()
+            self._connection.executemany(
+                "INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                ((isbn, title, author, genre, total, available, title.lower(), author.lower())
+                 for isbn, title, author, genre, total, available in state['books']))
+            self._connection.executemany(
+                "INSERT INTO members VALUES (?, ?, ?, ?)",
+                ((member_id, name, email, self._normalize_email(email))
+                 for member_id, name, email, borrowed_books in state['members']))
+            self._connection.executemany(
+                "INSERT INTO loans VALUES (?, ?, ?, ?)",
+                ((member_id, isbn, *dates) for (member_id, isbn), dates in
+                 zip(((member[0], isbn) for member in state['members'] for isbn in member[3]), loan_dates)))
+            self._set_next_member_id(state['next_member_id'])
+            self._load_reservations(state.get('waitlists', ()), state.get('holds', ()))
+            self._load_borrow_counts(state.get('borrow_counts', ()))
+
+    def _load_columns(self, book_columns, members, next_member_id, loan_dates=None, indexes=None):
+        # The books table is searched directly, so stored indexes are not used
+        self.load_state({'books': zip(*book_columns), 'members': list(members), 'next_member_id': next_member_id,
+                         'loan_dates': loan_dates})
+
+    # ---------------------------
+    # Core operations
+    # ---------------------------
+
+    @_ramata_metered
+    def _add_book(self, isbn, title, author, genre, total_copies):
+        self._emit("book", "ADDING NEW BOOK TO RAMATA LIBRARY", heading=True)
+        # One transaction, so a concurrent add of the same ISBN sees this one
+        with self._transaction():
+            code, message, book = self._validate_book(isbn, title, author, genre, total_copies)
+            if code != RamataCode.OK:
+                return self._fail(code, message)
+            self._insert_book(*book)
+        return self._succeed(f"Book '{title}' added successfully to Ramata Library!", isbn)
+
+    @_ramata_metered
+    def _add_member(self, name, email):
+        self._emit("member", "ADDING NEW MEMBER TO RAMATA LIBRARY", heading=True)
+
+        if not name or not email:
+            return self._fail(RamataCode.MISSING_FIELDS, "Name and email are required!")
+
+        email_key = self._normalize_email(email)
+        with self._transaction():
+            if self._email_owner(email_key) is not None:
+                return self._fail(RamataCode.DUPLICATE_EMAIL, "Member with this email already exists!")
+            member_id = f"RAM{self.ramata_next_member_id:03d}"
+            self._insert_member(member_id, name, email, email_key)
+            self._set_next_member_id(self.ramata_next_member_id + 1)
+
+        return self._succeed(f"Member '{name}' added successfully with ID: {member_id}", member_id)
+
+    @_ramata_metered
+    def _search_books(self, search_type, search_term, genre=None, available_only=False, offset=0, limit=None):
+        self._emit("search", "SEARCHING RAMATA LIBRARY BOOKS", heading=True)
+
+        if not search_term and genre is None and not available_only:
+            return self._fail(RamataCode.MISSING_FIELDS, "Search term cannot be empty!")
+
+        search_term = (search_term or "").lower()
+
+        if search_type not in ("title", "author"):
+            return self._fail(RamataCode.INVALID_SEARCH_TYPE, "Invalid search type! Use 'title' or 'author'")
+
+        if genre is not None and genre not in self._ramata_genre_set:
+            return self._fail(RamataCode.INVALID_GENRE, f"Invalid genre! Must be one of: {self.ramata_valid_genres}")
+
+        if offset < 0 or (limit is not None and limit < 0):
+            return self._fail(RamataCode.INVALID_FIELD, "Offset and limit cannot be negative!")
+
+        # instr() on the Python-lowercased column matches str.lower() substring semantics
+        conditions, params = [f"instr({search_type}_key, ?) > 0"], [search_term]
+        if genre is not None:
+            conditions.append("genre = ?")
+            params.append(genre)
+        if available_only:
+            conditions.append("available_copies > 0")
+        params += [-1 if limit is None else limit, offset]
+        rows = self._connection.execute(
+            f"SELECT {BOOK_COLUMNS} FROM books WHERE {' AND '.join(conditions)} ORDER BY rowid LIMIT ? OFFSET ?",
+            params)
+        results = [self._book_from_row(row) for row in rows]
+
+        if results:
+            matching = f"'{search_term}'" if search_term else "the filters"
+            return self._succeed(f"Found {len(results)} book(s) matching {matching}", results)
+
+        message = "No books found matching your search"
+        self._emit("info", message)
+        return RamataResult(True, RamataCode.OK, message, results)
+
+    @_ramata_metered
+    def _update_book(self, isbn, field, new_value, now=None):
+        self._emit("update", "UPDATING BOOK INFORMATION", heading=True)
+
+        with self._transaction():
+            book = self._find_book(isbn)
+            if book is None:
+                return self._fail(RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found in Ramata Library!")
+
+            if field in ("title", "author"):
+                if not new_value:
+                    return self._fail(RamataCode.MISSING_FIELDS, f"{field.capitalize()} cannot be empty!")
+                self._connection.execute(f"UPDATE books SET {field} = ?, {field}_key = ? WHERE isbn = ?",
+                                         (new_value, new_value.lower(), isbn))
+                return self._succeed(f"Book {field} updated successfully!")
+
+            elif field == "genre":
+                if new_value not in self._ramata_genre_set:
+                    return self._fail(RamataCode.INVALID_GENRE,
+                                      f"Invalid genre! Must be one of: {self.ramata_valid_genres}")
+                self._connection.execute("UPDATE books SET genre = ? WHERE isbn = ?", (new_value, isbn))
+                return self._succeed("Book genre updated successfully!")
+
+            elif field == "total_copies":
+                try:
+                    new_copies = int(new_value)
+                except ValueError:
+                    return self._fail(RamataCode.INVALID_COPIES, "Total copies must be a number!")
+                if new_copies < 0:
+                    return self._fail(RamataCode.INVALID_COPIES, "Copies cannot be negative!")
+
+                now = self.ramata_clock() if now is None else now
+                self._release_expired_holds(isbn, now)
+                book = self._find_book(isbn)
+                borrowed_count = book.total_copies - book.available_copies
+                self._connection.execute("UPDATE books SET total_copies = ?, available_copies = ? WHERE isbn = ?",
+                                         (new_copies, max(0, new_copies - borrowed_count), isbn))
+                self._serve_waitlist(isbn, now)
+                return self._succeed("Total copies updated successfully!")
+
+            else:
+                return self._fail(RamataCode.INVALID_FIELD,
+                                  "Invalid field! Use 'title', 'author', 'genre', or 'total_copies'")
+
+    @_ramata_metered
+    def _update_member(self, member_id, field, new_value):
+        self._emit("update", "UPDATING MEMBER INFORMATION", heading=True)
+
+        with self._transaction():
+            if self._query_value("SELECT 1 FROM members WHERE member_id = ?", member_id) is None:
+                return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+            if field == "name":
+                if not new_value:
+                    return self._fail(RamataCode.MISSING_FIELDS, "Name cannot be empty!")
+                self._connection.execute("UPDATE members SET name = ? WHERE member_id = ?", (new_value, member_id))
+                return self._succeed("Member name updated successfully!")
+
+            elif field == "email":
+                if not new_value:
+                    return self._fail(RamataCode.MISSING_FIELDS, "Email cannot be empty!")
+                email_key = self._normalize_email(new_value)
+                owner_id = self._email_owner(email_key)
+                if owner_id is not None and owner_id != member_id:
+                    return self._fail(RamataCode.DUPLICATE_EMAIL, "Email already exists!")
+                self._connection.execute("UPDATE members SET email = ?, email_key = ? WHERE member_id = ?",
+                                         (new_value, email_key, member_id))
+                return self._succeed("Member email updated successfully!")
+
+            else:
+                return self._fail(RamataCode.INVALID_FIELD, "Invalid field! Use 'name' or 'email'")
+
+    @_ramata_metered
+    def _delete_book(self, isbn):
+        self._emit("delete", "DELETING BOOK FROM RAMATA LIBRARY", heading=True)
+
+        with self._transaction():
+            book = self._find_book(isbn)
+            if book is None:
+                return self._fail(RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
+            held = self._query_value("SELECT COUNT(*) FROM reservations WHERE isbn = ? AND held_until IS NOT NULL",
+                                     isbn)
+            if book.available_copies + held < book.total_copies:
+                return self._fail(RamataCode.BOOK_BORROWED, "Cannot delete book - some copies are currently borrowed!")
+            self._connection.execute("DELETE FROM reservations WHERE isbn = ?", (isbn,))
+            self._connection.execute("DELETE FROM books WHERE isbn = ?", (isbn,))
+
+        return self._succeed("Book deleted successfully from Ramata Library!")
+
+    @_ramata_metered
+    def _delete_member(self, member_id, now=None):
+        self._emit("delete", "REMOVING MEMBER FROM RAMATA LIBRARY", heading=True)
+
+        with self._transaction():
+            if self._query_value("SELECT 1 FROM members WHERE member_id = ?", member_id) is None:
+                return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+            loan_count = self._loan_count(member_id)
+            if loan_count:
+                return self._fail(RamataCode.MEMBER_HAS_LOANS,
+                                  f"Cannot delete member - they have {loan_count} borrowed book(s)!")
+            self._cancel_reservations_of(member_id, self.ramata_clock() if now is None else now)
+            self._connection.execute("DELETE FROM members WHERE member_id = ?", (member_id,))
+
+        return self._succeed("Member deleted successfully from Ramata Library!")
+
+    @_ramata_metered
+    def _borrow_book(self, member_id, isbn, now=None):
+        self._emit("borrow", "BORROWING BOOK FROM RAMATA LIBRARY", heading=True)
+        if now is None:
+            now = self.ramata_clock()
+
+        with self._transaction():
+            if self._query_value("SELECT 1 FROM members WHERE member_id = ?", member_id) is None:
+                return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+            loan_count = self._loan_count(member_id)
+            reserved = self._reserved_isbns(member_id)
+            if loan_count + len(reserved) - (isbn in reserved) >= 3:
+                return self._fail(RamataCode.BORROW_LIMIT, "You have reached the maximum borrowing limit of 3 books!")
+
+            self._release_expired_holds(isbn, now)
+            book = self._find_book(isbn)
+            if book is None:
+                return self._fail(RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
+
+            if book.available_copies <= 0 and not self._holds_copy(member_id, isbn):
+                return self._fail(RamataCode.NO_COPIES, "This book is currently not available!")
+
+            if self._query_value("SELECT 1 FROM loans WHERE member_id = ? AND isbn = ?", member_id, isbn):
+                return self._fail(RamataCode.ALREADY_BORROWED, "You have already borrowed this book!")
+
+            if not self._remove_reservation(member_id, isbn):
+                self._adjust_shelf(isbn, -1)
+            self._connection.execute("INSERT INTO loans VALUES (?, ?, ?, ?)",
+                                     (member_id, isbn, now, now + RAMATA_LOAN_PERIOD))
+            self._count_borrow(isbn)
+
+        result = self._succeed(f"Book '{book.title}' borrowed successfully!")
+        self._emit("info", f"You now have {loan_count + 1} book(s) borrowed")
+        return result
+
+    @_ramata_metered
+    def _return_book(self, member_id, isbn, now=None):
+        self._emit("return", "RETURNING BOOK TO RAMATA LIBRARY", heading=True)
+        if now is None:
+            now = self.ramata_clock()
+
+        with self._transaction():
+            if self._query_value("SELECT 1 FROM members WHERE member_id = ?", member_id) is None:
+                return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+            if not self._query_value("SELECT 1 FROM loans WHERE member_id = ? AND isbn = ?", member_id, isbn):
+                return self._fail(RamataCode.NOT_BORROWED, "You haven't borrowed this book!")
+
+            book = self._find_book(isbn)
+            if book is None:
+                return self._fail(RamataCode.BOOK_NOT_FOUND, "Book not found in Ramata Library system!")
+
+            self._connection.execute("DELETE FROM loans WHERE member_id = ? AND isbn = ?", (member_id, isbn))
+            self._restock(isbn, now)
+
+        return self._succeed(f"Book '{book.title}' returned successfully!")
+
+    @_ramata_metered
+    def _renew_loan(self, member_id, isbn, now=None):
+        self._emit("borrow", "RENEWING LOAN AT RAMATA LIBRARY", heading=True)
+        if now is None:
+            now = self.ramata_clock()
+
+        with self._transaction():
+            if self._query_value("SELECT 1 FROM members WHERE member_id = ?", member_id) is None:
+                return self._fail(RamataCode.MEMBER_NOT_FOUND, f"Member with ID '{member_id}' not found!")
+
+            due_at = self._query_value("SELECT due_at FROM loans WHERE member_id = ? AND isbn = ?", member_id, isbn)
+            if due_at is None:
+                return self._fail(RamataCode.NOT_BORROWED, "You haven't borrowed this book!")
+
+            due_at = max(due_at, now) + RAMATA_LOAN_PERIOD
+            self._connection.execute("UPDATE loans SET due_at = ? WHERE member_id = ? AND isbn = ?",
+                                     (due_at, member_id, isbn))
+
+        return self._succeed(f"Loan of '{isbn}' renewed until {time.ctime(due_at)}", due_at)
+
+    @_ramata_metered
+    def _borrow_books(self, member_id, isbns, now=None):
+        self._emit("borrow", "BORROWING BOOKS FROM RAMATA LIBRARY", heading=True)
+        if not isinstance(isbns, (list, tuple)):
+            return self._fail(RamataCode.BAD_REQUEST, "The cart must be a list of ISBNs!")
+        with self._transaction():
+            return self._borrow_cart(member_id, list(isbns), self.ramata_clock() if now is None else now)
+
+    @_ramata_metered
+    def _return_books(self, member_id, isbns, now=None):
+        self._emit("return", "RETURNING BOOKS TO RAMATA LIBRARY", heading=True)
+        if not isinstance(isbns, (list, tuple)):
+            return self._fail(RamataCode.BAD_REQUEST, "The cart must be a list of ISBNs!")
+        with self._transaction():
+            return self._return_cart(member_id, list(isbns), self.ramata_clock() if now is None else now)
+
+    @_ramata_metered
+    def _reserve(self, member_id, isbn, now=None):
+        self._emit("borrow", "RESERVING BOOK AT RAMATA LIBRARY", heading=True)
+        with self._transaction():
+            return self._place_reservation(member_id, isbn, self.ramata_clock() if now is None else now)
+
+    @_ramata_metered
+    def _cancel_reservation(self, member_id, isbn, now=None):
+        self._emit("return", "CANCELLING RESERVATION AT RAMATA LIBRARY", heading=True)
+        with self._transaction():
+            return self._withdraw_reservation(member_id, isbn, self.ramata_clock() if now is None else now)
+
+    @_ramata_metered
+    def _expire_holds(self, now=None, isbn=None):
+        if now is None:
+            now = self.ramata_clock()
+        with self._transaction():
+            if isbn is not None:
+                return RamataResult(True, data=self._release_expired_holds(isbn, now))
+            isbns = self._connection.execute(
+                "SELECT DISTINCT isbn FROM reservations WHERE held_until <= ? ORDER BY isbn", (now,)).fetchall()
+            return RamataResult(True, data=sum(self._release_expired_holds(held_isbn, now) for held_isbn, in isbns))
+
+    @_ramata_metered
+    def _get_book_borrowers(self, isbn):
+        if self._find_book(isbn) is None:
+            return RamataResult(False, RamataCode.BOOK_NOT_FOUND, f"Book with ISBN '{isbn}' not found!")
+        return RamataResult(True, data=[member_id for member_id, in self._connection.execute(
+            "SELECT member_id FROM loans WHERE isbn = ? ORDER BY member_id", (isbn,))])
+
+    @_ramata_metered
+    def _get_overdue_loans(self, as_of=None):
+        if as_of is None:
+            as_of = self.ramata_clock()
+        return RamataResult(True, data=self._connection.execute(
+            "SELECT member_id, isbn, due_at FROM loans WHERE due_at <= ? ORDER BY due_at, member_id, isbn",
+            (as_of,)).fetchall())
+
+    @_ramata_metered
+    def _get_next_due_loans(self, n=10):
+        if n < 0:
+            return RamataResult(False, RamataCode.INVALID_FIELD, "The number of loans cannot be negative!")
+        return RamataResult(True, data=self._connection.execute(
+            "SELECT member_id, isbn, due_at FROM loans ORDER BY due_at, member_id, isbn LIMIT ?", (n,)).fetchall())
+
+    @_ramata_metered
+    def _get_stats(self, top=RAMATA_TOP_BORROWED):
+        if top < 0:
+            return RamataResult(False, RamataCode.INVALID_FIELD, "The number of titles cannot be negative!")
+        genres = {genre: {'titles': 0, 'total_copies': 0, 'available_copies': 0}
+                  for genre in self.ramata_valid_genres}
+        with self._transaction():
+            for genre, titles, total_copies, available_copies in self._connection.execute(
+                    "SELECT genre, titles, total_copies, available_copies FROM genre_stats WHERE titles > 0"):
+                genres[genre] = {'titles': titles, 'total_copies': total_copies,
+                                 'available_copies': available_copies}
+            counters = dict(self._connection.execute("SELECT name, value FROM stats"))
+            most_borrowed = self._connection.execute(
+                "SELECT isbn, title, borrow_count FROM books WHERE borrow_count > 0 "
+                "ORDER BY borrow_count DESC, rowid LIMIT ?", (top,)).fetchall()
+        open_loans, active_borrowers = counters['open_loans'], counters['active_borrowers']
+        members = counters['members']
+        total_copies = sum(figures['total_copies'] for figures in genres.values())
+        available_copies = sum(figures['available_copies'] for figures in genres.values())
+        return RamataResult(True, data={
+            'titles': sum(figures['titles'] for figures in genres.values()),
+            'members': members,
+            'total_copies': total_copies,
+            'available_copies': available_copies,
+            'copies_out': total_copies - available_copies,
+            'open_loans': open_loans,
+            'active_borrowers': active_borrowers,
+            'genres': genres,
+            'most_borrowed': most_borrowed,
+        })
+
+    def _add_books_bulk(self, rows, on_reject=None):
+        with self._transaction():
+            return super()._add_books_bulk(rows, on_reject)
+
+    def _add_members_bulk(self, rows, on_reject=None, **kwargs):
+        with self._transaction():
+            return super()._add_members_bulk(rows, on_reject, **kwargs)
+
+    # ---------------------------
+    # Bulk ingest helpers
+    # ---------------------------
+
+    def _validate_book(self, isbn, title, author, genre, total_copies):
+        code, message, book = super()._validate_book(isbn, title, author, genre, total_copies)
+        if code == RamataCode.OK and self._query_value("SELECT 1 FROM books WHERE isbn = ?", book[0]):
+            return RamataCode.DUPLICATE_ISBN, f"Book with ISBN '{book[0]}' already exists!", None
+        return code, message, book
+
+    def _add_member_chunk(self, chunk, on_reject):
+        added, rejected = super()._add_member_chunk(chunk, on_reject)
+        self._set_next_member_id(self.ramata_next_member_id)
+        return added, rejected
+
+    # ---------------------------
+    # Storage helpers
+    # ---------------------------
+
+    def _lend(self, member, isbn, now=None):
+        if now is None:
+            now = self.ramata_clock()
+        loan = RamataLoan(now, now + RAMATA_LOAN_PERIOD)
+        if not self._remove_reservation(member.member_id, isbn):
+            self._adjust_shelf(isbn, -1)
+        self._connection.execute("INSERT INTO loans VALUES (?, ?, ?, ?)",
+                                 (member.member_id, isbn, loan.borrowed_at, loan.due_at))
+        self._count_borrow(isbn)
+        member.borrowed_books.add(isbn, loan)
+
+    def _take_back(self, member, isbn, now=None):
+        self._connection.execute("DELETE FROM loans WHERE member_id = ? AND isbn = ?", (member.member_id, isbn))
+        self._restock(isbn, self.ramata_clock() if now is None else now)
+        member.borrowed_books.discard(isbn)
+
+    def _adjust_shelf(self, isbn, delta):
+        self._connection.execute("UPDATE books SET available_copies = available_copies + ? WHERE isbn = ?",
+                                 (delta, isbn))
+
+    def _count_borrow(self, isbn):
+        self._connection.execute("UPDATE books SET borrow_count = borrow_count + 1 WHERE isbn = ?", (isbn,))
+
+    def _serve_waitlist(self, isbn, now):
+        waiting = self._connection.execute(
+            "SELECT rowid, member_id FROM reservations WHERE isbn = ? AND held_until IS NULL ORDER BY rowid "
+            "LIMIT MAX((SELECT available_copies FROM books WHERE isbn = ?), 0)", (isbn, isbn)).fetchall()
+        if not waiting:
+            return
+        held_until = now + RAMATA_HOLD_PERIOD
+        self._connection.executemany("UPDATE reservations SET held_until = ? WHERE rowid = ?",
+                                     ((held_until, rowid) for rowid, _ in waiting))
+        self._adjust_shelf(isbn, -len(waiting))
+        for _, member_id in waiting:
+            self._emit("info", f"A copy of '{isbn}' is held for {member_id} until {time.ctime(held_until)}")
+
+    def _release_expired_holds(self, isbn, now):
+        released = self._connection.execute(
+            "DELETE FROM reservations WHERE isbn = ? AND held_until <= ?", (isbn, now)).rowcount
+        if not released:
+            return 0
+        self._emit("info", f"{released} expired hold(s) on '{isbn}' released")
+        self._adjust_shelf(isbn, released)
+        self._serve_waitlist(isbn, now)
+        return released
+
+    def _add_reservation(self, member_id, isbn):
+        self._connection.execute("INSERT INTO reservations VALUES (?, ?, NULL)", (isbn, member_id))
+        return self._query_value("SELECT COUNT(*) FROM reservations WHERE isbn = ? AND held_until IS NULL", isbn)
+
+    def _remove_reservation(self, member_id, isbn):
+        row = self._connection.execute("SELECT held_until FROM reservations WHERE isbn = ? AND member_id = ?",
+                                       (isbn, member_id)).fetchone()
+        if row is None:
+            return None
+        self._connection.execute("DELETE FROM reservations WHERE isbn = ? AND member_id = ?", (isbn, member_id))
+        return row[0] is not None
+
+    def _reserved_isbns(self, member_id):
+        return tuple(isbn for isbn, in self._connection.execute(
+            "SELECT isbn FROM reservations WHERE member_id = ? ORDER BY rowid", (member_id,)))
+
+    def _holds_copy(self, member_id, isbn):
+        return bool(self._query_value("SELECT held_until IS NOT NULL FROM reservations WHERE isbn = ? AND member_id = ?",
+                                      isbn, member_id))
+
+    def _reservation_position(self, member_id, isbn):
+        row = self._connection.execute("SELECT rowid, held_until FROM reservations WHERE isbn = ? AND member_id = ?",
+                                       (isbn, member_id)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None:
+            return 0
+        return self._query_value(
+            "SELECT COUNT(*) FROM reservations WHERE isbn = ? AND held_until IS NULL AND rowid <= ?", isbn, row[0])
+
+    def _load_reservations(self, waitlists, holds):
+        with self._transaction():
+            self._connection.executemany("INSERT INTO reservations VALUES (?, ?, NULL)", waitlists)
+            self._connection.executemany("INSERT INTO reservations VALUES (?, ?, ?)", holds)
+
+    def _lifetime_borrow_counts(self):
+        return self._connection.execute(
+            "SELECT isbn, borrow_count FROM books WHERE borrow_count > 0 ORDER BY isbn").fetchall()
+
+    def _load_borrow_counts(self, counts):
+        with self._transaction():
+            self._connection.executemany("UPDATE books SET borrow_count = ? WHERE isbn = ?",
+                                         ((count, isbn) for isbn, count in counts))
+
+    def _find_book(self, isbn):
+        row = self._connection.execute(f"SELECT {BOOK_COLUMNS} FROM books WHERE isbn = ?", (isbn,)).fetchone()
+        return self._book_from_row(row)[1] if row else None
+
+    def _find_member_by_id(self, member_id):
+        row = self._connection.execute("SELECT member_id, name, email FROM members WHERE member_id = ?",
+                                       (member_id,)).fetchone()
+        if row is None:
+            return None
+        loans = self._connection.execute(
+            "SELECT isbn, borrowed_at, due_at FROM loans WHERE member_id = ? ORDER BY rowid", (member_id,)).fetchall()
+        return self._member_from_row(row, loans)
+
+    def _email_owner(self, email_key):
+        return self._query_value("SELECT member_id FROM members WHERE email_key = ?", email_key)
+
+    def _loan_count(self, member_id):
+        return self._query_value("SELECT COUNT(*) FROM loans WHERE member_id = ?", member_id)
+
+    def _clear(self):
+        self._connection.execute("DELETE FROM reservations")
+        self._connection.execute("DELETE FROM loans")
+        self._connection.execute("DELETE FROM members")
+        self._connection.execute("DELETE FROM books")
+        self._set_next_member_id(1)
+
+    def _export_indexes(self, isbns, titles, authors):
+        # Nothing to store; a library loading the snapshot indexes the text itself
+        return None
+
+    def _insert_book(self, isbn, title, author, genre, total_copies, available_copies=None, defer_text=False):
+        # The books table is the text index, so there is nothing to defer
+        if available_copies is None:
+            available_copies = total_copies
+        self._connection.execute("INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                                 (isbn, title, author, genre, total_copies, available_copies,
+                                  title.lower(), author.lower()))
+
+    def _insert_member(self, member_id, name, email, email_key):
+        self._connection.execute("INSERT INTO members VALUES (?, ?, ?, ?)", (member_id, name, email, email_key))
+
+    def _set_next_member_id(self, next_member_id):
+        self.ramata_next_member_id = next_member_id
+        self._connection.execute("UPDATE settings SET value = ? WHERE name = 'next_member_id'", (next_member_id,))
+
+    def _order_by(self, sort_by, reverse):
+        direction = "DESC" if reverse else "ASC"
+        if sort_by is None:
+            return f"rowid {direction}"
+        return f"{sort_by} {direction}, rowid"
+
+    def _iter_pages(self, sql, params, convert_page):
+        """Run sql one LIMIT/OFFSET page at a time so no cursor stays open between yields."""
+        offset = 0
+        while True:
+            rows = self._connection.execute(f"{sql} LIMIT ? OFFSET ?",
+                                            (*params, RAMATA_DISPLAY_CHUNK_SIZE, offset)).fetchall()
+            yield from convert_page(rows)
+            if len(rows) < RAMATA_DISPLAY_CHUNK_SIZE:
+                return
+            offset += len(rows)
+
+    def _members_from_rows(self, rows):
+        """Member records for one page of rows, with their loans fetched in a single query."""
+        loans = {row[0]: [] for row in rows}
+        placeholders = ", ".join("?" * len(loans))
+        for member_id, *loan in self._connection.execute(
+                f"SELECT member_id, isbn, borrowed_at, due_at FROM loans WHERE member_id IN ({placeholders}) "
+                "ORDER BY rowid", list(loans)):
+            loans[member_id].append(loan)
+        return [self._member_from_row(row, loans[row[0]]) for row in rows]
+
+    def _query_value(self, sql, *params):
+        row = self._connection.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def _transaction(self):
+        return _RamataSQLiteTransaction(self._connection, self._connection_lock)
+
+    def _book_from_row(self, row):
+        isbn, title, author, genre, total_copies, available_copies = row
+        return isbn, RamataBook(title, author, genre, total_copies, available_copies)
+
+    def _member_from_row(self, row, loans):
+        """A member record from a members row and its (isbn, borrowed_at, due_at) loan rows."""
+        member_id, name, email = row
+        member = RamataMember(member_id, name, email, ())
+        for isbn, borrowed_at, due_at in loans:
+            member.borrowed_books.add(isbn, RamataLoan(borrowed_at, due_at))
+        return member
+
+
+class _RamataSQLiteTransaction:
+    """BEGIN IMMEDIATE ... COMMIT around a block; nested blocks join the outer one."""
+
+    def __init__(self, connection, lock):
+        self._connection = connection
+        self._lock = lock
+        self._owner = False
+
+    def __enter__(self):
+        self._lock.acquire()
+        if not self._connection.in_transaction:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._owner = True
+        return self._connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if self._owner:
+                self._connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+        return False
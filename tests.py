@@ -1,4 +1,27 @@
-from operations import RamataMiniLibraryManagementSystem
+import asyncio
+import builtins
+import contextlib
+import gc
+import io
+import json
+import os
+import random
+import struct
+import tempfile
+import time
+import zlib
+import threading
+import urllib.request
+
+from ingest import ingest
+from metrics import RamataMetrics, render_prometheus, start_prometheus_exporter
+from operations import (RAMATA_HOLD_PERIOD, RamataCode, RamataDueIndex, RamataMiniLibraryManagementSystem,
+                        RamataPopularityIndex, execute_ramata_line, run_ramata_batch)
+from persistence import RamataPersistentStore, read_log
+from readonly_catalog import RamataReadOnlyCatalog, write_ramata_catalog
+from service import RamataLibraryService
+from sharding import RamataShardedLibrary, ramata_shard_for
+from sqlite_storage import RamataSQLiteLibrary
 
 
 class TestRamataMiniLibraryManagementSystem:
@@ -173,6 +196,1347 @@ class TestRamataMiniLibraryManagementSystem:
         success = self.ramata_library.delete_member(self.ramata_member_id)
         assert success == False
 
+    def test_add_member_duplicate_email_case_insensitive(self):
+        """Test that email uniqueness ignores case and surrounding spaces in Ramata Library"""
+        success = self.ramata_library.add_member("Kadie Kamara", "  Fatmata@Email.com ")
+        assert success == False
+
+    def test_member_email_index_follows_update_and_delete(self):
+        """Test that a freed email can be reused after update or delete in Ramata Library"""
+        self.ramata_library.update_member(self.ramata_member_id, "email", "fatmata.new@email.com")
+        assert self.ramata_library.add_member("Kadie Kamara", "fatmata@email.com") == True
+        assert self.ramata_library.add_member("Isatu Sesay", "fatmata.new@email.com") == False
+
+        self.ramata_library.delete_member(self.ramata_member_id)
+        assert self.ramata_library.add_member("Isatu Sesay", "fatmata.new@email.com") == True
+        ids = [member['member_id'] for member in self.ramata_library.get_all_members()]
+        assert ids == ["RAM002", "RAM003"]
+
+    def test_search_index_follows_update_and_delete(self):
+        """Test that title and author searches reflect updates and deletes in Ramata Library"""
+        self.ramata_library.update_book("RAM-001", "title", "Lessons in Chemistry")
+        self.ramata_library.update_book("RAM-002", "author", "Bonnie Garmus")
+
+        success, results = self.ramata_library.search_books("title", "chemistry")
+        assert [isbn for isbn, book in results] == ["RAM-001"]
+        success, results = self.ramata_library.search_books("title", "Test Book 1")
+        assert results == []
+        success, results = self.ramata_library.search_books("author", "garm")
+        assert [isbn for isbn, book in results] == ["RAM-002"]
+
+        # A renamed book keeps its place in catalog order
+        self.ramata_library.update_book("RAM-001", "title", "A Book of Lessons")
+        success, results = self.ramata_library.search_books("title", "book")
+        assert [isbn for isbn, book in results] == ["RAM-001", "RAM-002"]
+
+        self.ramata_library.delete_book("RAM-002")
+        success, results = self.ramata_library.search_books("author", "garm")
+        assert results == []
+
+        # Only trigrams are indexed, each with an ascending array of catalog sequence numbers
+        title_index = self.ramata_library._ramata_title_index
+        assert "che" not in title_index and list(title_index["boo"]) == [0]
+        assert all(len(gram) == 3 and list(postings) == sorted(set(postings)) and postings
+                   for gram, postings in title_index.items())
+
+    def test_search_matches_substring_scan(self):
+        """Test that indexed search returns the same books as a substring scan in Ramata Library"""
+        self.ramata_library.add_book("RAM-003", "The Midnight Library", "Matt Haig", "Contemporary Fiction", 6)
+        self.ramata_library.add_book("RAM-004", "Library of Souls", "Ransom Riggs", "Mystery", 2)
+        books = self.ramata_library.get_all_books()
+
+        for term in ["t", "li", "lib", "library", "ary of", "y 1", "matt h", "zzz", " "]:
+            for search_type in ["title", "author"]:
+                success, results = self.ramata_library.search_books(search_type, term)
+                expected = [isbn for isbn, book in books.items() if term.lower() in book[search_type].lower()]
+                assert [isbn for isbn, book in results] == expected
+
+    def test_quiet_mode_returns_result_codes(self):
+        """Test that a silent Ramata Library prints nothing and explains failures with codes"""
+        quiet_library = RamataMiniLibraryManagementSystem(event_sink=None)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            added = quiet_library.execute("add_book", "RAM-001", "Test Book 1", "Author One", "Self-Help", 1)
+            member = quiet_library.execute("add_member", "Fatmata Bangura", "fatmata@email.com")
+            borrowed = quiet_library.execute("borrow_book", member.data, "RAM-001")
+            unavailable = quiet_library.execute("borrow_book", member.data, "RAM-001")
+            unknown = quiet_library.execute("burn_book", "RAM-001")
+
+        assert output.getvalue() == ""
+        assert added.ok and added.data == "RAM-001"
+        assert member.data == "RAM001"
+        assert borrowed.ok and borrowed.code == RamataCode.OK
+        assert not unavailable and unavailable.code == RamataCode.NO_COPIES
+        assert unknown.code == RamataCode.UNKNOWN_OPERATION
+
+    def test_event_sink_receives_messages(self):
+        """Test that operation messages are delivered to a pluggable event sink in Ramata Library"""
+        events = []
+        self.ramata_library.ramata_event_sink = events.append
+        self.ramata_library.borrow_book("RAM999", "RAM-001")
+
+        assert events[0].heading and events[0].kind == "borrow"
+        assert events[-1].kind == "error"
+        assert "RAM999" in events[-1].message
+
+    def test_add_books_bulk_reports_rejected_rows(self):
+        """Test bulk adding books with per-row rejection reasons in Ramata Library"""
+        rows = [
+            {'isbn': "RAM-010", 'title': "Bulk Book", 'author': "Author", 'genre': "Mystery", 'total_copies': "2"},
+            {'isbn': "RAM-001", 'title': "Duplicate", 'author': "Author", 'genre': "Mystery", 'total_copies': "1"},
+            {'isbn': "RAM-011", 'title': "Bad Genre", 'author': "Author", 'genre': "Poetry", 'total_copies': "1"},
+            {'isbn': "RAM-012", 'title': "", 'author': "Author", 'genre': "Mystery", 'total_copies': "1"},
+            {'isbn': "RAM-013", 'title': "Bad Copies", 'author': "Author", 'genre': "Mystery", 'total_copies': "x"},
+            {'isbn': "RAM-014", 'title': "Float Copies", 'author': "Author", 'genre': "Mystery", 'total_copies': 1.7},
+            {'isbn': "RAM-015", 'title': "Bool Copies", 'author': "Author", 'genre': "Mystery", 'total_copies': True},
+            {'isbn': 5, 'title': "Number ISBN", 'author': "Author", 'genre': "Mystery", 'total_copies': 1},
+            [1, 2],
+            {'isbn': "RAM-016", 'title': "Int Copies", 'author': "Author", 'genre': "Mystery", 'total_copies': 3},
+        ]
+        rejected = []
+        summary = self.ramata_library.add_books_bulk(
+            rows, on_reject=lambda number, row, code, message: rejected.append((number, code)))
+
+        assert summary == {'added': 2, 'rejected': 8}
+        assert rejected == [(2, RamataCode.DUPLICATE_ISBN), (3, RamataCode.INVALID_GENRE),
+                            (4, RamataCode.MISSING_FIELDS), (5, RamataCode.INVALID_COPIES),
+                            (6, RamataCode.INVALID_COPIES), (7, RamataCode.INVALID_COPIES),
+                            (8, RamataCode.INVALID_FIELD), (9, RamataCode.BAD_REQUEST)]
+        assert self.ramata_library.get_book_details("RAM-016")['total_copies'] == 3
+        assert self.ramata_library.get_book_details("RAM-010")['total_copies'] == 2
+        success, results = self.ramata_library.search_books("title", "bulk")
+        assert [isbn for isbn, book in results] == ["RAM-010"]
+
+    def test_add_members_bulk_allocates_id_ranges(self):
+        """Test bulk adding members with contiguous IDs across chunks in Ramata Library"""
+        rows = ({'name': f"Member {number}", 'email': f"member{number}@email.com"} for number in range(5))
+        rows = list(rows) + [{'name': "Copy", 'email': "MEMBER1@email.com"}, {'name': "", 'email': "x@email.com"}]
+        rejected = []
+        summary = self.ramata_library._add_members_bulk(
+            rows, on_reject=lambda number, row, code, message: rejected.append((number, code)), chunk_size=2).data
+
+        assert summary == {'added': 5, 'rejected': 2}
+        assert rejected == [(6, RamataCode.DUPLICATE_EMAIL), (7, RamataCode.MISSING_FIELDS)]
+        ids = [member['member_id'] for member in self.ramata_library.get_all_members()]
+        assert ids == ["RAM001", "RAM002", "RAM003", "RAM004", "RAM005", "RAM006"]
+        assert self.ramata_library.add_member("Kadie Kamara", "kadie@email.com") == True
+        assert self.ramata_library.get_all_members()[-1]['member_id'] == "RAM007"
+
+    def test_ingest_streams_csv_and_jsonl(self):
+        """Test streaming CSV and JSONL files into Ramata Library"""
+        with tempfile.TemporaryDirectory() as directory:
+            books_path = os.path.join(directory, "books.csv")
+            with open(books_path, "w", encoding="utf-8") as handle:
+                handle.write("isbn,title,author,genre,total_copies\n")
+                handle.write("RAM-020, Csv Book ,Csv Author,Biography,4\n")
+            members_path = os.path.join(directory, "members.jsonl")
+            with open(members_path, "w", encoding="utf-8") as handle:
+                handle.write('{"name": "Isatu Sesay", "email": "isatu@email.com"}\n\n')
+                handle.write('{"name": "Again", "email": "fatmata@email.com"}\n')
+                handle.write('{"name": "Torn", "email": \n')
+                handle.write('[1, 2]\n')
+                handle.write('{"name": "Kadie Kamara", "email": "kadie@email.com"}\n')
+
+            assert ingest(self.ramata_library, "books", books_path) == {'added': 1, 'rejected': 0}
+            rejected = []
+            summary = ingest(self.ramata_library, "members", members_path,
+                             on_reject=lambda number, row, code, message: rejected.append((number, code)))
+            assert summary == {'added': 2, 'rejected': 3}
+            # Unreadable lines by line number, rejected rows by record number
+            assert rejected == [(4, RamataCode.BAD_REQUEST), (5, RamataCode.BAD_REQUEST),
+                                (2, RamataCode.DUPLICATE_EMAIL)]
+
+        assert self.ramata_library.get_book_details("RAM-020")['title'] == "Csv Book"
+        assert self.ramata_library.get_member_details("RAM002")['name'] == "Isatu Sesay"
+
+    def test_persistent_store_recovers_snapshot_and_log_tail(self):
+        """Test that Ramata Library state survives a restart via snapshot plus log replay"""
+        with tempfile.TemporaryDirectory() as directory:
+            store = RamataPersistentStore(directory, snapshot_every=4)
+            library = store.open()
+            library.add_book("RAM-001", "Test Book 1", "Author One", "Self-Help", 3)
+            library.add_member("Fatmata Bangura", "fatmata@email.com")
+            library.borrow_book("RAM001", "RAM-001")
+            library.add_book("RAM-001", "Duplicate Book", "Author", "Self-Help", 1)  # not logged
+            library.add_member("Kadie Kamara", "kadie@email.com")  # fourth entry -> snapshot
+            library.update_book("RAM-001", "title", "Renamed Book")
+            library.borrow_book("RAM002", "RAM-001")
+            expected = library.dump_state()
+            store.close()
+
+            with open(os.path.join(directory, RamataPersistentStore.LOG_FILE), encoding="utf-8") as handle:
+                assert len(handle.readlines()) == 2
+
+            store = RamataPersistentStore(directory)
+            recovered = store.open()
+            assert recovered.dump_state() == expected
+            assert recovered.get_book_details("RAM-001")['available_copies'] == 1
+            success, results = recovered.search_books("title", "renamed")
+            assert [isbn for isbn, book in results] == ["RAM-001"]
+            assert recovered.add_member("Isatu Sesay", "isatu@email.com") == True
+            assert recovered.get_all_members()[-1]['member_id'] == "RAM003"
+            store.close()
+
+    def test_persistent_store_ignores_torn_log_tail(self):
+        """Test that a partially written last log entry is skipped on Ramata Library recovery"""
+        with tempfile.TemporaryDirectory() as directory:
+            store = RamataPersistentStore(directory)
+            store.open().add_book("RAM-001", "Test Book 1", "Author One", "Self-Help", 3)
+            store.close()
+            with open(os.path.join(directory, RamataPersistentStore.LOG_FILE), "a", encoding="utf-8") as handle:
+                handle.write('[2,"add_book",["RAM-0')
+
+            store = RamataPersistentStore(directory)
+            store.open().add_book("RAM-002", "Test Book 2", "Author Two", "Romance", 1)
+            store.close()
+
+            store = RamataPersistentStore(directory)
+            recovered = store.open()
+            assert list(recovered.get_all_books()) == ["RAM-001", "RAM-002"]
+            store.close()
+
+    def test_persistent_store_never_runs_ahead_of_its_log(self):
+        """Test that Ramata Library mutations the log cannot take are refused or undone"""
+        with tempfile.TemporaryDirectory() as directory:
+            store = RamataPersistentStore(directory)
+            library = store.open()
+            library.add_book("RAM-001", "Test Book 1", "Author One", "Self-Help", 3)
+            library.add_member("Fatmata Bangura", "fatmata@email.com")
+
+            # Unserializable arguments are refused before anything changes
+            result = library._add_member(b"Kadie", "kadie@email.com")
+            assert result.code == RamataCode.BAD_REQUEST
+            assert len(library.get_all_members()) == 1
+
+            # A failed write is undone, torn entry and all, and logging resumes
+            log = store._log
+            original_append = log.append
+
+            def failing_append(sequence, encoded):
+                log._handle.write(f"[{sequence},{encoded}"[:-3])
+                log._handle.flush()
+                raise OSError("disk full")
+
+            log.append = failing_append
+            result = library._borrow_book("RAM001", "RAM-001")
+            assert result.code == RamataCode.UNEXPECTED_ERROR
+            assert library.get_book_details("RAM-001")['available_copies'] == 3
+            assert library.get_member_details("RAM001")['borrowed_books'] == set()
+            log.append = original_append
+            assert library.add_books_bulk([{'isbn': "RAM-002", 'title': "Test Book 2", 'author': "Author Two",
+                                            'genre': "Romance", 'total_copies': 1}]) == {'added': 1, 'rejected': 0}
+            assert library.borrow_book("RAM001", "RAM-002") == True
+            expected = library.dump_state()
+            store.close()
+
+            store = RamataPersistentStore(directory)
+            assert store.open().dump_state() == expected
+            store.close()
+
+    def test_binary_snapshot_round_trips_and_detects_corruption(self):
+        """Test exporting and loading a binary snapshot of the whole Ramata Library"""
+        library = self.ramata_library
+        library.add_book("RAM-003", "Sweet Ｌove ✨", "Aminata Turay", "Mystery", 2)
+        library.add_member("Kadie Kamara", "kadie@email.com")
+        library.borrow_book(self.ramata_member_id, "RAM-002")
+        library.borrow_book(self.ramata_member_id, "RAM-003")
+        library.borrow_book("RAM002", "RAM-003")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.snapshot")
+            library.export_snapshot(path)
+
+            restored = RamataMiniLibraryManagementSystem(event_sink=None)
+            restored.load_snapshot(path)
+            assert restored.dump_state() == library.dump_state()
+            assert restored.get_book_borrowers("RAM-003") == ["RAM001", "RAM002"]
+            success, results = restored.search_books("title", "ｌove", genre="Mystery")
+            assert [isbn for isbn, book in results] == ["RAM-003"]
+            assert restored.suggest("amin") == [("Aminata Turay", "author")]
+            assert restored.add_member("Isatu Sesay", "isatu@email.com") == True
+            assert restored.get_all_members()[-1]['member_id'] == "RAM003"
+
+            # The checksum covers the header's counts and next member ID
+            header = struct.Struct("<4sHHQQQQI")
+            with open(path, "rb") as handle:
+                original = handle.read()
+            magic, version, reserved, books, members, loans, next_id, checksum = header.unpack_from(original)
+            payload = original[header.size:]
+            for tampered in [(magic, version, reserved, 0, members, loans, next_id, checksum),
+                             (magic, version, reserved, books, members, loans, 999, checksum)]:
+                with open(path, "wb") as handle:
+                    handle.write(header.pack(*tampered) + payload)
+                try:
+                    restored.load_snapshot(path)
+                    assert False, "snapshot with a tampered header was loaded"
+                except ValueError as error:
+                    assert "checksum" in str(error)
+            # Counts are checked against the columns even when the checksum matches
+            def write_header(version, book_count):
+                fields = header.pack(magic, version, reserved, book_count, members, loans, next_id, 0)[:-4]
+                with open(path, "wb") as handle:
+                    handle.write(fields + struct.pack("<I", zlib.crc32(payload, zlib.crc32(fields))) + payload)
+
+            write_header(version, 0)
+            try:
+                restored.load_snapshot(path)
+                assert False, "snapshot with wrong counts was loaded"
+            except ValueError as error:
+                assert "for a count of 0" in str(error)
+            assert restored.get_all_members()[-1]['member_id'] == "RAM003"
+            write_header(version + 1, books)
+            try:
+                restored.load_snapshot(path)
+                assert False, "snapshot of another version was loaded"
+            except ValueError as error:
+                assert "Unsupported snapshot version" in str(error)
+            with open(path, "wb") as handle:
+                handle.write(original)
+            restored.load_snapshot(path)
+            assert restored.dump_state() == library.dump_state()
+
+            with open(path, "r+b") as handle:
+                handle.seek(-1, os.SEEK_END)
+                last = handle.read(1)
+                handle.seek(-1, os.SEEK_END)
+                handle.write(bytes([last[0] ^ 0xFF]))
+            try:
+                restored.load_snapshot(path)
+                assert False, "corrupt snapshot was loaded"
+            except ValueError as error:
+                assert "checksum" in str(error)
+            assert restored.get_book_details("RAM-003")['available_copies'] == 0
+
+    def test_binary_snapshot_stores_search_and_suggestion_indexes(self):
+        """Test that Ramata Library snapshots carry their indexes and answer like the exporting library"""
+        library = RamataMiniLibraryManagementSystem(event_sink=None)
+        library.add_books_bulk([{'isbn': f"IDX-{number:03d}", 'title': f"Story of Stone {number}",
+                                 'author': f"Writer {number % 5}", 'genre': ("Mystery", "Romance")[number % 2],
+                                 'total_copies': 1} for number in range(120)])
+        for number in range(0, 120, 7):
+            assert library.delete_book(f"IDX-{number:03d}") == True
+        assert library.update_book("IDX-001", "title", "Stormy Night") == True
+        searches = [("title", "story of stone 1"), ("author", "writer 3"), ("title", "stormy"),
+                    ("title", "", "Romance"), ("title", "stone", "Mystery", True, 5, 10)]
+        prefixes = ["sto", "story of", "writer", "storm", "missing"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.snapshot")
+            library.export_snapshot(path)
+            restored = RamataMiniLibraryManagementSystem(event_sink=None)
+            restored.load_snapshot(path)
+            assert not restored._ramata_unindexed_isbns
+            for search in searches:
+                assert restored.search_books(*search) == library.search_books(*search), search
+            for prefix in prefixes:
+                assert restored.suggest(prefix, 10) == library.suggest(prefix, 10), prefix
+
+            # Edits after loading update the stored indexes like the built ones
+            for target in (library, restored):
+                assert target.delete_book("IDX-002") == True
+                assert target.update_book("IDX-003", "author", "Stone Mason") == True
+                assert target.add_book("IDX-500", "Story of Glass", "Writer 3", "Romance", 2) == True
+            for search in searches + [("author", "stone"), ("title", "glass")]:
+                assert restored.search_books(*search) == library.search_books(*search), search
+            for prefix in prefixes + ["stone", "writer 3"]:
+                assert restored.suggest(prefix, 10) == library.suggest(prefix, 10), prefix
+            restored.export_snapshot(path)
+            again = RamataMiniLibraryManagementSystem(event_sink=None)
+            again.load_snapshot(path)
+            assert again.suggest("sto", 10) == library.suggest("sto", 10)
+            assert again.dump_state() == library.dump_state()
+
+            # A snapshot exported without indexes is indexed after loading
+            sqlite_library = RamataSQLiteLibrary(os.path.join(directory, "library.db"), event_sink=None)
+            sqlite_library.load_state(library.dump_state())
+            sqlite_library.export_snapshot(path)
+            sqlite_library.close()
+            plain = RamataMiniLibraryManagementSystem(event_sink=None)
+            plain.ramata_background_indexing = False
+            plain.load_snapshot(path)
+            assert plain._ramata_unindexed_isbns
+            assert plain.search_books("author", "writer 3") == library.search_books("author", "writer 3")
+            assert plain.suggest("sto", 10) == library.suggest("sto", 10)
+
+    def test_loaded_books_are_text_indexed_in_the_background(self):
+        """Test that Ramata Library text indexes are built after loading or bulk adding, alongside edits"""
+        books = [(f"BULK-{number:04d}", f"Bulk Title {number:04d}", f"Writer {number % 7}", "Mystery", 1, 1)
+                 for number in range(1200)]
+        state = {'books': books, 'members': [], 'next_member_id': 1}
+        library = RamataMiniLibraryManagementSystem(event_sink=None)
+        library.load_state(state)
+        # Edits to books still waiting for the pass index them first
+        assert library.update_book("BULK-1199", "title", "Renamed Volume") == True
+        assert library.delete_book("BULK-1198") == True
+        success, results = library.search_books("title", "bulk title 11")
+        assert sorted(isbn for isbn, book in results) == [f"BULK-{number}" for number in range(1100, 1198)]
+        assert library.search_books("title", "renamed")[1][0][0] == "BULK-1199"
+        assert not library._ramata_unindexed_isbns and not library._ramata_unindexed_queue
+
+        # With background indexing off, the first search indexes everything
+        library = RamataMiniLibraryManagementSystem(event_sink=None)
+        library.ramata_background_indexing = False
+        library.load_state(state)
+        assert len(library._ramata_unindexed_isbns) == 1200
+        assert library.suggest("writer 3") == [("Writer 3", "author")]
+        assert not library._ramata_unindexed_isbns
+
+        # Bulk-added books wait for the same pass, with the collector back on once loaded
+        library.add_books_bulk([{'isbn': "BULK-2000", 'title': "Late Arrival", 'author': "Writer 9",
+                                 'genre': "Mystery", 'total_copies': 2}])
+        assert library._ramata_unindexed_isbns == {"BULK-2000"} and gc.isenabled()
+        assert library.suggest("late") == [("Late Arrival", "title")]
+        assert library.search_books("author", "writer 9")[1][0][0] == "BULK-2000"
+
+    def test_readonly_catalog_serves_lazy_lookups_and_rejects_mutations(self):
+        """Test that a memory-mapped read-only catalog answers like the in-memory Ramata Library"""
+        library = self.ramata_library
+        library.add_book("RAM-000", "Sweet Ｌove ✨", "Aminata Turay", "Romance", 2)
+        library.add_book("RAM-003", "Test Love Book", "Author Three", "Romance", 1)
+        library.borrow_book(self.ramata_member_id, "RAM-003")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.rmc")
+            write_ramata_catalog(library, path)
+            catalog = RamataReadOnlyCatalog(path, event_sink=None)
+            try:
+                assert len(catalog.get_all_books()) == 4 and "RAM-404" not in catalog.get_all_books()
+                assert catalog.get_book_details("RAM-000") == library.get_book_details("RAM-000")
+                assert catalog.get_book_details("RAM-404") is None
+                assert list(catalog.get_all_books()) == list(library.get_all_books())
+                for search in [("title", "book"), ("title", "ｌove"), ("author", "author t"),
+                               ("title", "", "Romance"), ("title", "love", "Romance", True),
+                               ("title", "test", None, False, 1, 1), ("title", "missing")]:
+                    assert catalog.search_books(*search) == library.search_books(*search), search
+
+                result = catalog.execute("borrow_book", self.ramata_member_id, "RAM-001")
+                assert (result.ok, result.code) == (False, RamataCode.READ_ONLY)
+                assert catalog.add_book("RAM-009", "New", "Author", "Mystery", 1) == False
+                assert catalog.get_book_details("RAM-009") is None
+
+                # Figures the file cannot answer are refused rather than reported as zero, and counted
+                catalog.ramata_metrics = RamataMetrics()
+                assert catalog.suggest("swe") is None
+                assert catalog.get_stats() is None and catalog.get_inventory_report() is None
+                result = catalog.execute("get_stats")
+                assert (result.ok, result.code) == (False, RamataCode.READ_ONLY)
+                catalog.add_book("RAM-009", "New", "Author", "Mystery", 1)
+                metrics = catalog.get_metrics()
+                for operation, calls in [("suggest", 1), ("get_inventory_report", 1), ("get_stats", 2),
+                                         ("add_book", 1)]:
+                    assert metrics[operation]['failures'] == {RamataCode.READ_ONLY: calls}, operation
+                try:
+                    catalog.load_state(library.dump_state())
+                    assert False, "read-only catalog was loaded into"
+                except PermissionError:
+                    pass
+            finally:
+                catalog.close()
+
+    def test_loan_due_dates_follow_borrow_renew_and_return(self):
+        """Test overdue and next-due loan queries as Ramata Library loans are borrowed, renewed and returned"""
+        day = 24 * 60 * 60
+        clock = [0.0]
+        script = [
+            (0, "borrow_book", "RAM001", "RAM-001"),
+            (1, "borrow_book", "RAM002", "RAM-001"),
+            (2, "borrow_books", "RAM001", ["RAM-002"]),
+            (3, "borrow_book", "RAM002", "RAM-002"),
+            (5, "renew_loan", "RAM001", "RAM-001"),
+            (6, "return_book", "RAM002", "RAM-001"),
+            (6, "renew_loan", "RAM002", "RAM-001"),
+            (6, "renew_loan", "RAM009", "RAM-001"),
+            (6, "get_overdue_loans", 16 * day),
+            (6, "get_next_due_loans", 2),
+            (30, "get_overdue_loans"),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            store = RamataPersistentStore(directory)
+            memory_library = store.open()
+            sqlite_library = RamataSQLiteLibrary(os.path.join(directory, "library.db"), event_sink=None)
+            for library in (memory_library, sqlite_library):
+                library.ramata_clock = lambda: clock[0]
+                library.add_book("RAM-001", "Test Book 1", "Author One", "Self-Help", 3)
+                library.add_book("RAM-002", "Test Book 2", "Author Two", "Romance", 2)
+                library.add_member("Fatmata Bangura", "fatmata@email.com")
+                library.add_member("Kadie Kamara", "kadie@email.com")
+
+            for days, operation, *args in script:
+                clock[0] = days * day
+                memory_result = memory_library.execute(operation, *args)
+                sqlite_result = sqlite_library.execute(operation, *args)
+                assert (sqlite_result.ok, sqlite_result.code, sqlite_result.data) == \
+                    (memory_result.ok, memory_result.code, memory_result.data), operation
+
+            # Only journal replay may pass the time of a timed mutation
+            for operation, *args in [("borrow_book", "RAM002", "RAM-001", 0), ("renew_loan", "RAM001", "RAM-002", 1e12),
+                                     ("return_book", "RAM001", "RAM-002", 0), ("expire_holds", 1e12)]:
+                assert memory_library.execute(operation, *args).code == RamataCode.BAD_REQUEST
+                assert sqlite_library.execute(operation, *args).code == RamataCode.BAD_REQUEST
+            line = '{"op": "borrow_book", "args": ["RAM002", "RAM-001", 0]}'
+            assert json.loads(execute_ramata_line(memory_library, line))['code'] == RamataCode.BAD_REQUEST
+
+            assert memory_library.get_overdue_loans(16 * day) == [("RAM001", "RAM-002", 16 * day)]
+            assert memory_library.get_next_due_loans(2) == [("RAM001", "RAM-002", 16 * day),
+                                                            ("RAM002", "RAM-002", 17 * day)]
+            assert [loan[2] for loan in memory_library.get_overdue_loans()] == [16 * day, 17 * day, 28 * day]
+            assert memory_library.get_member_details("RAM001").borrowed_books.loan("RAM-001").due_at == 28 * day
+            assert sqlite_library.dump_state() == memory_library.dump_state()
+            expected = memory_library.dump_state()
+            store.close()
+            sqlite_library.close()
+
+            # Replaying the log dates every loan exactly as before, whatever the clock says now
+            store = RamataPersistentStore(directory)
+            recovered = store.open()
+            assert recovered.dump_state() == expected
+            assert recovered.get_next_due_loans(5) == memory_library.get_next_due_loans(5)
+            store.close()
+
+    def test_due_index_matches_sorted_scan(self):
+        """Test the Ramata Library due-date heap against a full sort through random changes"""
+        rng = random.Random(7)
+        index = RamataDueIndex()
+        loans = {}
+        for step in range(3_000):
+            key = (f"RAM{rng.randrange(60):03d}", f"RAM-{rng.randrange(20):03d}")
+            if key in loans and rng.random() < 0.5:
+                index.remove(key)
+                del loans[key]
+            elif key in loans:
+                loans[key] = rng.randrange(1_000)
+                index.reschedule(key, loans[key])
+            else:
+                loans[key] = rng.randrange(1_000)
+                index.push(key, loans[key])
+            if step % 100 == 0:
+                expected = sorted((due_at, key) for key, due_at in loans.items())
+                as_of = rng.randrange(1_000)
+                assert index.due_by(as_of) == [entry for entry in expected if entry[0] <= as_of]
+                assert index.earliest(25) == expected[:25]
+        assert len(index) == len(loans)
+
+    def test_reservations_hold_returned_copies_in_queue_order(self):
+        """Test Ramata Library waitlists, holds and hold expiry on both backends and after recovery"""
+        day = 24 * 60 * 60
+        clock = [0.0]
+        script = [
+            (0, "borrow_book", "RAM001", "RAM-002"),
+            (0, "reserve", "RAM002", "RAM-002"),
+            (0, "reserve", "RAM003", "RAM-002"),
+            (0, "reserve", "RAM002", "RAM-002"),
+            (0, "reserve", "RAM001", "RAM-002"),
+            (0, "reserve", "RAM004", "RAM-001"),
+            (0, "reserve", "RAM004", "RAM-404"),
+            (0, "get_reservation_position", "RAM003", "RAM-002"),
+            (1, "return_book", "RAM001", "RAM-002"),
+            (1, "get_reservation_position", "RAM002", "RAM-002"),
+            (1, "get_reservation_position", "RAM003", "RAM-002"),
+            (2, "borrow_book", "RAM003", "RAM-002"),
+            # RAM002's hold ran out on day 4; this failed borrow passes the copy to RAM003
+            (5, "borrow_book", "RAM004", "RAM-002"),
+            (5, "get_reservation_position", "RAM002", "RAM-002"),
+            (5, "get_reservation_position", "RAM003", "RAM-002"),
+            (6, "borrow_book", "RAM003", "RAM-002"),
+            (6, "reserve", "RAM002", "RAM-002"),
+            (6, "reserve", "RAM004", "RAM-002"),
+            (6, "cancel_reservation", "RAM004", "RAM-002"),
+            (6, "cancel_reservation", "RAM004", "RAM-002"),
+            (7, "return_book", "RAM003", "RAM-002"),
+            (7, "delete_member", "RAM002"),
+            (8, "borrow_book", "RAM001", "RAM-003"),
+            (8, "reserve", "RAM003", "RAM-003"),
+            (8, "reserve", "RAM004", "RAM-003"),
+            (9, "return_books", "RAM001", ["RAM-003"]),
+            (9, "update_book", "RAM-003", "total_copies", 2),
+            (9, "get_reservation_position", "RAM004", "RAM-003"),
+            (9, "delete_book", "RAM-003"),
+            (9, "get_reservation_position", "RAM003", "RAM-003"),
+            (20, "expire_holds"),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            store = RamataPersistentStore(directory)
+            memory_library = store.open()
+            sqlite_library = RamataSQLiteLibrary(os.path.join(directory, "library.db"), event_sink=None)
+            for library in (memory_library, sqlite_library):
+                library.ramata_clock = lambda: clock[0]
+                library.add_book("RAM-001", "Test Book 1", "Author One", "Self-Help", 3)
+                library.add_book("RAM-002", "Test Book 2", "Author Two", "Romance", 1)
+                library.add_book("RAM-003", "Test Book 3", "Author Three", "Mystery", 1)
+                for name in ("Fatmata Bangura", "Kadie Kamara", "Aminata Sesay", "Mariama Jalloh"):
+                    library.add_member(name, f"{name.split()[0].lower()}@email.com")
+
+            results = []
+            for days, operation, *args in script:
+                clock[0] = days * day
+                memory_result = memory_library.execute(operation, *args)
+                sqlite_result = sqlite_library.execute(operation, *args)
+                assert (sqlite_result.ok, sqlite_result.code, sqlite_result.data) == \
+                    (memory_result.ok, memory_result.code, memory_result.data), operation
+                results.append((memory_result.code, memory_result.data))
+
+            assert [code for code, _ in results[1:7]] == [RamataCode.OK, RamataCode.OK, RamataCode.ALREADY_RESERVED,
+                                                          RamataCode.ALREADY_BORROWED, RamataCode.BOOK_AVAILABLE,
+                                                          RamataCode.BOOK_NOT_FOUND]
+            assert [results[7][1], results[9][1], results[10][1]] == [2, 0, 1]
+            assert results[11][0] == RamataCode.NO_COPIES
+            assert results[12][0] == RamataCode.NO_COPIES
+            assert [code for code, _ in results[13:15]] == [RamataCode.NOT_RESERVED, RamataCode.OK]
+            assert results[14][1] == 0
+            assert results[15][0] == RamataCode.OK
+            assert [code for code, _ in results[18:20]] == [RamataCode.OK, RamataCode.NOT_RESERVED]
+            # The copy held for RAM002 went back on the shelf when they left
+            assert results[21][0] == RamataCode.OK
+            assert memory_library.get_book_details("RAM-002").available_copies == 1
+            # One copy came back and one was added: both waiting members hold one
+            assert results[27] == (RamataCode.OK, 0)
+            assert results[28][0] == RamataCode.OK
+            assert results[29][0] == RamataCode.BOOK_NOT_FOUND
+            assert results[30] == (RamataCode.OK, 0)
+            assert memory_library.dump_state()['waitlists'] == [] and memory_library.dump_state()['holds'] == []
+            assert sqlite_library.dump_state() == memory_library.dump_state()
+            expected = memory_library.dump_state()
+            store.close()
+            sqlite_library.close()
+
+            # The log holds the expiry the failed borrow triggered, so replay ends in the same state
+            assert [args for _, operation, args, _ in read_log(store.log_path)
+                    if operation == "expire_holds"] == [[5 * day, "RAM-002"]]
+            store = RamataPersistentStore(directory)
+            recovered = store.open()
+            assert recovered.dump_state() == expected
+            store.close()
+
+    def test_reservations_count_toward_borrow_limit(self):
+        """Test that waiting and held Ramata Library reservations use up the 3-book limit"""
+        library = self.ramata_library
+        member_id = self.ramata_member_id
+        library.add_member("Kadie Kamara", "kadie@email.com")
+        library.add_book("RAM-003", "Test Book 3", "Author Three", "Mystery", 1)
+        library.add_book("RAM-004", "Test Book 4", "Author Four", "Biography", 1)
+        assert library.borrow_book("RAM002", "RAM-002") == True
+        assert library.borrow_book("RAM002", "RAM-003") == True
+
+        assert library.borrow_book(member_id, "RAM-001") == True
+        assert library.reserve(member_id, "RAM-002") == True
+        assert library.reserve(member_id, "RAM-003") == True
+        assert library._reserve(member_id, "RAM-004").code == RamataCode.BORROW_LIMIT
+        assert library._borrow_book(member_id, "RAM-004").code == RamataCode.BORROW_LIMIT
+        assert library.borrow_books(member_id, ["RAM-004"])[0] == False
+
+        # A held copy is collected without going over the limit
+        assert library.return_book("RAM002", "RAM-002") == True
+        assert library.get_reservation_position(member_id, "RAM-002") == 0
+        assert library.get_book_details("RAM-002").available_copies == 0
+        assert library.borrow_book("RAM002", "RAM-002") == False
+        assert library.borrow_books(member_id, ["RAM-002"]) == (True, [])
+        assert library.get_reservation_position(member_id, "RAM-002") is None
+
+        # Cancelling frees the slot; a hold nobody collects runs out
+        assert library.cancel_reservation(member_id, "RAM-003") == True
+        assert library.borrow_book(member_id, "RAM-004") == True
+        assert library.return_book(member_id, "RAM-004") == True
+        assert library.reserve("RAM002", "RAM-004") == False
+        assert library.return_books("RAM002", ["RAM-003"]) == (True, [])
+        assert library.reserve(member_id, "RAM-004") == False
+        assert library.borrow_book("RAM002", "RAM-004") == True
+        assert library.reserve(member_id, "RAM-004") == True
+        assert library.return_book("RAM002", "RAM-004") == True
+        assert library.get_reservation_position(member_id, "RAM-004") == 0
+        assert library.expire_holds(library.ramata_clock() + RAMATA_HOLD_PERIOD + 1) == 1
+        assert library.get_reservation_position(member_id, "RAM-004") is None
+        assert library.get_book_details("RAM-004").available_copies == 1
+
+        # Waiting and held reservations survive a binary snapshot; older states have none
+        assert library.borrow_book("RAM002", "RAM-004") == True
+        assert library.reserve(member_id, "RAM-004") == True
+        assert library.reserve("RAM002", "RAM-002") == True
+        assert library.return_book(member_id, "RAM-002") == True
+        restored = RamataMiniLibraryManagementSystem(event_sink=None)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.rmls")
+            library.export_snapshot(path)
+            restored.load_snapshot(path)
+        assert restored.dump_state() == library.dump_state()
+        assert restored.get_reservation_position(member_id, "RAM-004") == 1
+        assert restored.get_reservation_position("RAM002", "RAM-002") == 0
+
+        state = library.dump_state()
+        del state['waitlists'], state['holds']
+        restored.load_state(state)
+        assert restored.get_reservation_position(member_id, "RAM-004") is None
+
+    def test_sqlite_backend_matches_memory_backend(self):
+        """Test that the SQLite backend gives the same results as the in-memory Ramata Library"""
+        script = [
+            ("add_book", "RAM-001", "Test Book 1", "Author One", "Self-Help", 1),
+            ("add_book", "RAM-002", "Test Book 2", "Author Two", "Romance", 2),
+            ("add_book", "RAM-001", "Duplicate", "Author", "Romance", 2),
+            ("add_book", "RAM-003", "Counted As Text", "Author Three", "Mystery", "2"),
+            ("add_book", "RAM-004", "Fractional", "Author Four", "Mystery", 1.5),
+            ("add_book", "RAM-005", "Boolean", "Author Five", "Mystery", True),
+            ("add_book", "RAM-006", 6, "Author Six", "Mystery", 1),
+            ("add_member", "Fatmata Bangura", "fatmata@email.com"),
+            ("add_member", "Kadie Kamara", "FATMATA@email.com"),
+            ("add_member", "Isatu Sesay", "isatu@email.com"),
+            ("borrow_book", "RAM001", "RAM-001"),
+            ("borrow_book", "RAM002", "RAM-001"),
+            ("borrow_book", "RAM001", "RAM-001"),
+            ("borrow_book", "RAM009", "RAM-002"),
+            ("borrow_books", "RAM002", ["RAM-002", "RAM-001", "RAM-404"]),
+            ("borrow_books", "RAM002", ["RAM-002"]),
+            ("borrow_books", "RAM002", "RAM-001"),
+            ("return_books", "RAM002", ["RAM-002", "RAM-001"]),
+            ("return_books", "RAM002", ["RAM-002"]),
+            ("get_book_borrowers", "RAM-001"),
+            ("get_book_borrowers", "RAM-404"),
+            ("update_book", "RAM-002", "title", "Renamed Book"),
+            ("update_book", "RAM-001", "total_copies", "4"),
+            ("update_member", "RAM002", "email", "fatmata@email.com"),
+            ("delete_book", "RAM-001"),
+            ("delete_member", "RAM001"),
+            ("return_book", "RAM001", "RAM-001"),
+            ("return_book", "RAM001", "RAM-001"),
+            ("delete_member", "RAM001"),
+            ("search_books", "title", "book"),
+            ("search_books", "author", "TWO"),
+            ("search_books", "title", "", "Romance", True),
+            ("search_books", "title", "book", None, False, 1, 1),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            sqlite_library = RamataSQLiteLibrary(os.path.join(directory, "library.db"), event_sink=None)
+            memory_library = RamataMiniLibraryManagementSystem(event_sink=None)
+            for operation, *args in script:
+                memory_result = memory_library.execute(operation, *args)
+                sqlite_result = sqlite_library.execute(operation, *args)
+                assert (sqlite_result.ok, sqlite_result.code, sqlite_result.message, sqlite_result.data) == \
+                    (memory_result.ok, memory_result.code, memory_result.message, memory_result.data), operation
+            assert sqlite_library.dump_state() == memory_library.dump_state()
+            for prefix in ("b", "ren", "author t", "x"):
+                assert sqlite_library.suggest(prefix) == memory_library.suggest(prefix), prefix
+            sqlite_library.close()
+
+    def test_sqlite_backend_survives_reopen(self):
+        """Test that the SQLite Ramata Library keeps books, members and loans across restarts"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.db")
+            library = RamataSQLiteLibrary(path, event_sink=None)
+            library.add_books_bulk([{'isbn': "RAM-001", 'title': "Test Book 1", 'author': "Author One",
+                                     'genre': "Self-Help", 'total_copies': 2}])
+            library.add_members_bulk([{'name': "Fatmata Bangura", 'email': "fatmata@email.com"},
+                                      {'name': "Copy", 'email': "fatmata@email.com"}], on_reject=lambda *args: None)
+            library.borrow_book("RAM001", "RAM-001")
+            library.close()
+
+            reopened = RamataSQLiteLibrary(path, event_sink=None)
+            assert reopened.get_book_details("RAM-001")['available_copies'] == 1
+            assert reopened.get_member_details("RAM001")['borrowed_books'] == ["RAM-001"]
+            assert reopened.add_member("Kadie Kamara", "kadie@email.com") == True
+            assert reopened.get_all_members()[-1]['member_id'] == "RAM002"
+
+            # Racing adds of one ISBN from two connections: one wins, the other is a duplicate
+            other = RamataSQLiteLibrary(path, event_sink=None)
+            codes = []
+            barrier = threading.Barrier(8)
+            for target in (reopened, other):
+                # Widen the gap between the duplicate check and the insert
+                def slow_validate(*book, validate=target._validate_book):
+                    checked = validate(*book)
+                    time.sleep(0.01)
+                    return checked
+                target._validate_book = slow_validate
+
+            def add(target):
+                barrier.wait()
+                codes.append(target._add_book("RAM-777", "Race Book", "Author", "Mystery", 1).code)
+
+            threads = [threading.Thread(target=add, args=(target,)) for target in [reopened, other] * 4]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert sorted(codes) == [RamataCode.DUPLICATE_ISBN] * 7 + [RamataCode.OK]
+            other.close()
+            reopened.close()
+
+    def test_records_are_compact_with_dict_style_reads(self):
+        """Test that Ramata Library book and member records are slotted but still readable like dicts"""
+        book = self.ramata_library.get_book_details("RAM-001")
+        member = self.ramata_library.get_member_details(self.ramata_member_id)
+
+        assert not hasattr(book, "__dict__") and not hasattr(member, "__dict__")
+        assert book['title'] == book.title == "Test Book 1"
+        assert dict(book) == {'title': "Test Book 1", 'author': "Author One", 'genre': "Self-Help",
+                              'total_copies': 3, 'available_copies': 3}
+        assert book.get('isbn') is None and 'genre' in book
+        assert member.to_dict()['email'] == "fatmata@email.com"
+        try:
+            book['missing']
+            assert False, "expected KeyError"
+        except KeyError:
+            pass
+
+    def test_inventory_report_tracks_circulation(self):
+        """Test that columnar inventory reports follow borrows, updates and deletes in Ramata Library"""
+        self.ramata_library.add_member("Kadie Kamara", "kadie@email.com")
+        self.ramata_library.add_book("RAM-003", "Test Book 3", "Author Three", "Mystery", 2)
+        self.ramata_library.borrow_book("RAM001", "RAM-001")
+        self.ramata_library.borrow_book("RAM001", "RAM-002")
+        self.ramata_library.borrow_book("RAM002", "RAM-001")
+        self.ramata_library.update_book("RAM-001", "genre", "Biography")
+        self.ramata_library.update_book("RAM-003", "total_copies", "4")
+        self.ramata_library.return_book("RAM001", "RAM-001")
+        self.ramata_library.delete_book("RAM-003")
+        self.ramata_library.add_book("RAM-004", "Test Book 4", "Author Four", "Romance", 1)
+
+        report = self.ramata_library.get_inventory_report()
+        books = self.ramata_library.get_all_books()
+        for genre in self.ramata_library.ramata_valid_genres:
+            expected = sum(book.total_copies - book.available_copies for book in books.values() if book.genre == genre)
+            assert report['copies_out_by_genre'][genre] == expected
+        assert report['copies_out_by_genre']['Biography'] == 1
+        assert report['fully_checked_out'] == ["RAM-002"]
+        assert report['utilization'] == 2 / 5
+
+    def test_live_stats_match_a_full_recount(self):
+        """Test that incremental Ramata Library stats match a recount after every kind of change"""
+        script = [
+            ("add_book", "RAM-003", "Test Book 3", "Author Three", "Mystery", 2),
+            ("add_member", "Kadie Kamara", "kadie@email.com"),
+            ("add_member", "Isatu Sesay", "isatu@email.com"),
+            ("borrow_book", "RAM001", "RAM-001"),
+            ("borrow_book", "RAM002", "RAM-001"),
+            ("borrow_book", "RAM002", "RAM-003"),
+            ("return_book", "RAM001", "RAM-001"),
+            ("borrow_book", "RAM001", "RAM-001"),
+            ("return_book", "RAM002", "RAM-001"),
+            ("borrow_books", "RAM003", ["RAM-001", "RAM-002"]),
+            ("update_book", "RAM-001", "genre", "Biography"),
+            ("update_book", "RAM-003", "total_copies", "5"),
+            ("update_member", "RAM002", "name", "Kadie K."),
+            ("return_books", "RAM003", ["RAM-002"]),
+            ("borrow_book", "RAM002", "RAM-002"),
+            ("delete_book", "RAM-002"),
+            ("return_book", "RAM002", "RAM-002"),
+            ("delete_book", "RAM-002"),
+            ("return_book", "RAM002", "RAM-003"),
+            ("delete_member", "RAM002"),
+            ("add_book", "RAM-002", "Test Book 2", "Author Two", "Romance", 1),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            sqlite_library = RamataSQLiteLibrary(os.path.join(directory, "library.db"), event_sink=None)
+            sqlite_library.add_book("RAM-001", "Test Book 1", "Author One", "Self-Help", 3)
+            sqlite_library.add_book("RAM-002", "Test Book 2", "Author Two", "Romance", 1)
+            sqlite_library.add_member("Fatmata Bangura", "fatmata@email.com")
+            for operation, *args in script:
+                assert self.ramata_library.execute(operation, *args).ok == sqlite_library.execute(operation, *args).ok
+                assert self.ramata_library.check_stats() == []
+                assert sqlite_library.check_stats() == []
+                memory_stats, sqlite_stats = self.ramata_library.get_stats(), sqlite_library.get_stats()
+                # Tied titles may rank in either order between backends
+                assert sorted(memory_stats.pop('most_borrowed')) == sorted(sqlite_stats.pop('most_borrowed'))
+                assert memory_stats == sqlite_stats
+            # The SQLite figures are counter rows, kept by triggers through bulk loads too
+            sqlite_library.load_state(self.ramata_library.dump_state())
+            assert sqlite_library.check_stats() == []
+            sqlite_library._connection.execute("UPDATE stats SET value = value + 1 WHERE name = 'open_loans'")
+            assert [figure for figure, _, _ in sqlite_library.check_stats()] == ['open_loans']
+            sqlite_library.close()
+
+        stats = self.ramata_library.get_stats()
+        assert stats['titles'] == 3 and stats['members'] == 2
+        assert (stats['total_copies'], stats['available_copies'], stats['copies_out']) == (9, 7, 2)
+        assert (stats['open_loans'], stats['active_borrowers']) == (2, 2)
+        assert stats['genres']['Biography'] == {'titles': 1, 'total_copies': 3, 'available_copies': 1}
+        assert stats['genres']['Romance'] == {'titles': 1, 'total_copies': 1, 'available_copies': 1}
+        # RAM-002's borrows went with it; the re-added book starts again
+        assert stats['most_borrowed'] == [("RAM-001", "Test Book 1", 4), ("RAM-003", "Test Book 3", 1)]
+        assert self.ramata_library.get_stats(1)['most_borrowed'] == [("RAM-001", "Test Book 1", 4)]
+        assert self.ramata_library._get_stats(-1).code == RamataCode.INVALID_FIELD
+
+        # Borrow counts survive both snapshot formats; older states start at zero
+        restored = RamataMiniLibraryManagementSystem(event_sink=None)
+        restored.load_state(json.loads(json.dumps(self.ramata_library.dump_state())))
+        assert restored.get_stats() == stats and restored.check_stats() == []
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.rmls")
+            self.ramata_library.export_snapshot(path)
+            restored.load_snapshot(path)
+        assert restored.get_stats() == stats and restored.check_stats() == []
+        state = self.ramata_library.dump_state()
+        del state['borrow_counts']
+        restored.load_state(state)
+        assert restored.get_stats()['most_borrowed'] == []
+
+        # A check against tampered figures reports the mismatch
+        self.ramata_library._ramata_active_borrowers += 1
+        assert self.ramata_library.check_stats() == [('active_borrowers', 3, 2)]
+        self.ramata_library._ramata_active_borrowers -= 1
+        # So does a corrupted popularity index, checked against the plain borrow tally
+        self.ramata_library._ramata_popularity._buckets["RAM-001"].count += 5
+        assert self.ramata_library.check_stats() == [
+            ('most_borrowed', [("RAM-001", "Test Book 1", 9), ("RAM-003", "Test Book 3", 1)], [4, 1])]
+        self.ramata_library._ramata_popularity._buckets["RAM-001"].count -= 5
+        self.ramata_library._ramata_popularity.remove("RAM-003")
+        assert [figure for figure, _, _ in self.ramata_library.check_stats()] == ['most_borrowed']
+
+    def test_popularity_index_ranks_like_a_sort(self):
+        """Test that the Ramata Library popularity index ranks like sorting every count"""
+        rng = random.Random(25)
+        index, counts, reached = RamataPopularityIndex(), {}, {}
+        for step in range(5_000):
+            key = f"RAM-{rng.randrange(60):03d}"
+            if rng.random() < 0.05:
+                index.remove(key)
+                counts.pop(key, None)
+            else:
+                index.increment(key)
+                counts[key] = counts.get(key, 0) + 1
+                reached[key] = step
+            assert index.count(key) == counts.get(key, 0)
+            if step % 250 == 0:
+                # Ties rank in the order the keys reached the count
+                expected = sorted(counts.items(), key=lambda item: (-item[1], reached[item[0]]))
+                assert index.top(10) == expected[:10]
+                assert index.top(len(counts) + 5) == expected
+        assert len(index) == len(counts)
+
+        index.load(list(counts.items()) + [("RAM-999", 0)])
+        assert sorted(index.items()) == sorted(counts.items())
+        assert [count for _, count in index.top(10)] == sorted(counts.values(), reverse=True)[:10]
+        index.clear()
+        assert index.top(3) == [] and len(index) == 0
+
+    def test_concurrent_borrow_and_return_keep_counts_consistent(self):
+        """Test that many threads borrowing and returning never oversell copies in Ramata Library"""
+        library = RamataMiniLibraryManagementSystem(event_sink=None)
+        isbns = [f"RAM-{number:03d}" for number in range(5)]
+        for isbn in isbns:
+            library.add_book(isbn, f"Book {isbn}", "Author", "Mystery", 2)
+        member_ids = [library.execute("add_member", f"Member {n}", f"member{n}@email.com").data for n in range(20)]
+        net_loans = [0] * 8
+
+        def circulate(worker):
+            rng = random.Random(worker)
+            for _ in range(2000):
+                member_id, isbn = rng.choice(member_ids), rng.choice(isbns)
+                if library.borrow_book(member_id, isbn):
+                    net_loans[worker] += 1
+                if library.return_book(member_id, rng.choice(isbns)):
+                    net_loans[worker] -= 1
+
+        threads = [threading.Thread(target=circulate, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        loans = [isbn for member in library.get_all_members() for isbn in member.borrowed_books]
+        assert len(loans) == sum(net_loans)
+        for isbn in isbns:
+            book = library.get_book_details(isbn)
+            assert 0 <= book.available_copies <= book.total_copies
+            assert book.available_copies + loans.count(isbn) == book.total_copies
+            assert library.get_book_borrowers(isbn) == sorted(member.member_id for member in library.get_all_members()
+                                                              if isbn in member.borrowed_books)
+        assert all(len(member.borrowed_books) <= 3 for member in library.get_all_members())
+
+    def test_service_answers_pipelined_requests_in_order(self):
+        """Test that the network service answers pipelined JSON requests in order for Ramata Library"""
+        async def session():
+            service = RamataLibraryService(pipeline_depth=2)
+            host, port = await service.start("127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection(host, port)
+            requests = [
+                {'id': 1, 'op': "add_member", 'args': ["Aminata Kamara", "aminata@email.com"]},
+                {'id': 2, 'op': "add_book", 'args': ["978-1", "Network Book", "Author", "Mystery", 1]},
+                {'id': 3, 'op': "borrow_book", 'args': ["RAM001", "978-1"]},
+                {'id': 4, 'op': "borrow_book", 'args': ["RAM001", "978-1"]},
+                {'id': 5, 'op': "get_book_details", 'args': ["978-1"]},
+                {'id': 6, 'op': "drop_tables", 'args': []},
+                {'id': 7, 'op': "add_member", 'args': ["Isatu Sesay", 5]},
+                {'id': 8, 'op': "search_books", 'args': ["title", 5]},
+            ]
+            writer.write(b"".join(json.dumps(request).encode() + b"\n" for request in requests) + b"not json\n"
+                         + json.dumps({'id': 9, 'op': "get_book_details", 'args': ["978-1"]}).encode() + b"\n")
+            await writer.drain()
+            responses = [json.loads(await asyncio.wait_for(reader.readline(), 5))
+                         for _ in range(len(requests) + 2)]
+            writer.close()
+            await service.stop()
+            return responses
+
+        responses = asyncio.run(session())
+        assert [response['id'] for response in responses] == [1, 2, 3, 4, 5, 6, 7, 8, None, 9]
+        assert [response['ok'] for response in responses[:5]] == [True, True, True, False, True]
+        assert responses[3]['code'] == RamataCode.NO_COPIES
+        assert responses[4]['data']['available_copies'] == 0
+        assert responses[5]['code'] == RamataCode.UNKNOWN_OPERATION
+        # Wrong-typed arguments are answered and the pipeline keeps going
+        assert responses[6]['code'] == responses[7]['code'] == RamataCode.UNEXPECTED_ERROR
+        assert responses[8]['code'] == RamataCode.BAD_REQUEST
+        assert responses[9]['ok'] and responses[9]['data']['available_copies'] == 0
+
+    def test_borrow_books_applies_whole_cart_or_nothing(self):
+        """Test that multi-item checkout and return are all-or-nothing in Ramata Library"""
+        self.ramata_library.add_book("RAM-003", "Test Book 3", "Author Three", "Mystery", 1)
+        cart = ["RAM-001", "RAM-002"]
+
+        ok, rejected = self.ramata_library.borrow_books("RAM001", cart + ["RAM-404"])
+        assert not ok
+        assert rejected == [("RAM-404", RamataCode.BOOK_NOT_FOUND, "Book with ISBN 'RAM-404' not found!")]
+        assert self.ramata_library.get_member_details("RAM001")['borrowed_books'] == []
+        assert self.ramata_library.get_book_details("RAM-002")['available_copies'] == 1
+
+        assert self.ramata_library.borrow_books("RAM001", cart) == (True, [])
+        assert self.ramata_library.get_member_details("RAM001")['borrowed_books'] == cart
+        assert self.ramata_library.get_book_details("RAM-002")['available_copies'] == 0
+
+        result = self.ramata_library.execute("borrow_books", "RAM001", ["RAM-003", "RAM-404"])
+        assert result.code == RamataCode.BORROW_LIMIT
+
+        ok, rejected = self.ramata_library.return_books("RAM001", cart + ["RAM-003"])
+        assert not ok and [code for _, code, _ in rejected] == [RamataCode.NOT_BORROWED]
+        assert self.ramata_library.return_books("RAM001", cart) == (True, [])
+        assert self.ramata_library.get_member_details("RAM001")['borrowed_books'] == []
+        assert self.ramata_library.get_book_details("RAM-002")['available_copies'] == 1
+
+        # Carts must be lists or tuples; a string is not read as one-character ISBNs
+        assert self.ramata_library.borrow_books("RAM001", ("RAM-001",)) == (True, [])
+        assert self.ramata_library.return_books("RAM001", ("RAM-001",)) == (True, [])
+        for cart in ("RAM-001", {"RAM-001"}, (isbn for isbn in cart)):
+            assert self.ramata_library.execute("borrow_books", "RAM001", cart).code == RamataCode.BAD_REQUEST
+            assert self.ramata_library.execute("return_books", "RAM001", cart).code == RamataCode.BAD_REQUEST
+        assert self.ramata_library.get_member_details("RAM001")['borrowed_books'] == []
+
+        # A tuple cart is journaled as the list that was lent
+        with tempfile.TemporaryDirectory() as directory:
+            store = RamataPersistentStore(directory)
+            library = store.open()
+            library.add_book("RAM-001", "Test Book 1", "Author One", "Self-Help", 3)
+            library.add_book("RAM-002", "Test Book 2", "Author Two", "Romance", 1)
+            library.add_member("Fatmata Bangura", "fatmata@email.com")
+            assert library.borrow_books("RAM001", ("RAM-001", "RAM-002")) == (True, [])
+            assert library.execute("borrow_books", "RAM001", "RAM-001").code == RamataCode.BAD_REQUEST
+            expected = library.dump_state()
+            store.close()
+            store = RamataPersistentStore(directory)
+            assert store.open().dump_state() == expected
+            store.close()
+
+    def test_book_borrowers_index_follows_circulation(self):
+        """Test that the ISBN -> borrowers index answers who holds a book in Ramata Library"""
+        self.ramata_library.add_member("Kadie Kamara", "kadie@email.com")
+        assert self.ramata_library.get_book_borrowers("RAM-001") == []
+        assert self.ramata_library.get_book_borrowers("RAM-404") is None
+
+        self.ramata_library.borrow_book("RAM002", "RAM-001")
+        self.ramata_library.borrow_books("RAM001", ["RAM-001", "RAM-002"])
+        assert self.ramata_library.get_book_borrowers("RAM-001") == ["RAM001", "RAM002"]
+        assert self.ramata_library.get_book_borrowers("RAM-002") == ["RAM001"]
+        assert self.ramata_library.get_member_details("RAM001")['borrowed_books'] == {"RAM-002", "RAM-001"}
+
+        self.ramata_library.return_book("RAM002", "RAM-001")
+        assert self.ramata_library.get_book_borrowers("RAM-001") == ["RAM001"]
+        self.ramata_library.return_books("RAM001", ["RAM-001", "RAM-002"])
+        assert self.ramata_library.ramata_book_borrowers == {}
+        assert self.ramata_library.delete_book("RAM-002")
+        assert self.ramata_library.get_book_borrowers("RAM-002") is None
+
+    def test_search_books_filters_by_genre_and_availability_in_pages(self):
+        """Test faceted, paginated searches over the genre and availability indexes in Ramata Library"""
+        for number in range(3, 8):
+            self.ramata_library.add_book(f"RAM-00{number}", f"Test Book {number}", "Author", "Mystery", 1)
+
+        ok, page = self.ramata_library.search_books("title", "book", genre="Mystery", limit=2)
+        assert ok and [isbn for isbn, _ in page] == ["RAM-003", "RAM-004"]
+        ok, page = self.ramata_library.search_books("title", "book", genre="Mystery", offset=4, limit=2)
+        assert [isbn for isbn, _ in page] == ["RAM-007"]
+
+        self.ramata_library.borrow_book("RAM001", "RAM-002")
+        self.ramata_library.borrow_book("RAM001", "RAM-004")
+        ok, page = self.ramata_library.search_books("title", "", available_only=True)
+        assert [isbn for isbn, _ in page] == ["RAM-001", "RAM-003", "RAM-005", "RAM-006", "RAM-007"]
+
+        self.ramata_library.update_book("RAM-005", "genre", "Romance")
+        self.ramata_library.update_book("RAM-006", "total_copies", "0")
+        self.ramata_library.return_book("RAM001", "RAM-004")
+        ok, page = self.ramata_library.search_books("title", None, genre="Mystery", available_only=True)
+        assert [isbn for isbn, _ in page] == ["RAM-003", "RAM-004", "RAM-007"]
+        ok, page = self.ramata_library.search_books("title", "", genre="Romance")
+        assert [isbn for isbn, _ in page] == ["RAM-002", "RAM-005"]
+
+        # A book moved into a genre keeps its catalog place there, and pages of available books line up
+        self.ramata_library.update_book("RAM-003", "genre", "Romance")
+        ok, page = self.ramata_library.search_books("title", "", genre="Romance")
+        assert [isbn for isbn, _ in page] == ["RAM-002", "RAM-003", "RAM-005"]
+        pages = [self.ramata_library.search_books("title", "book", available_only=True, offset=offset, limit=2)[1]
+                 for offset in (0, 2, 4)]
+        assert [[isbn for isbn, _ in page] for page in pages] == [["RAM-001", "RAM-003"], ["RAM-004", "RAM-005"],
+                                                                   ["RAM-007"]]
+
+        assert self.ramata_library.execute("search_books", "title", "", "Sci-Fi").code == RamataCode.INVALID_GENRE
+        assert self.ramata_library.execute("search_books", "title", "").code == RamataCode.MISSING_FIELDS
+
+    def test_iter_books_and_members_tolerate_concurrent_changes(self):
+        """Test lazy, sorted and filtered catalog iterators in Ramata Library"""
+        self.ramata_library.add_book("RAM-000", "A First Book", "Author Zero", "Romance", 1)
+        self.ramata_library.add_member("Aminata Kamara", "aminata@email.com")
+
+        books = self.ramata_library.iter_books()
+        assert next(books)[0] == "RAM-001"
+        self.ramata_library.delete_book("RAM-002")
+        self.ramata_library.add_book("RAM-003", "Late Book", "Author Three", "Mystery", 1)
+        assert [isbn for isbn, _ in books] == ["RAM-000"]
+
+        assert [isbn for isbn, _ in self.ramata_library.iter_books(sort_by="title")] == ["RAM-000", "RAM-003",
+                                                                                          "RAM-001"]
+        assert [isbn for isbn, _ in self.ramata_library.iter_books(genre="Romance", reverse=True)] == ["RAM-000"]
+        assert [isbn for isbn, _ in self.ramata_library.iter_books(where=lambda book: book.total_copies > 1)] == \
+            ["RAM-001"]
+        assert [member.name for member in self.ramata_library.iter_members(sort_by="name")] == ["Aminata Kamara",
+                                                                                               "Fatmata Bangura"]
+        with tempfile.TemporaryDirectory() as directory:
+            sqlite_library = RamataSQLiteLibrary(os.path.join(directory, "library.db"), event_sink=None)
+            sqlite_library.load_state(self.ramata_library.dump_state())
+            assert list(sqlite_library.iter_books(sort_by="title")) == list(self.ramata_library.iter_books(
+                sort_by="title"))
+            assert list(sqlite_library.iter_members(reverse=True)) == list(self.ramata_library.iter_members(
+                reverse=True))
+            sqlite_library.close()
+
+    def test_display_all_books_writes_in_chunks_and_pages(self):
+        """Test that listing the catalog uses few buffered writes and stops when paging is quit in Ramata Library"""
+        for number in range(3, 500):
+            self.ramata_library.add_book(f"RAM-{number:03d}", f"Book {number}", "Author", "Mystery", 1)
+
+        class CountingWriter(io.StringIO):
+            writes = 0
+
+            def write(self, text):
+                CountingWriter.writes += 1
+                return super().write(text)
+
+        output = CountingWriter()
+        with contextlib.redirect_stdout(output):
+            self.ramata_library._display_all_books()
+        assert output.getvalue().count("ISBN: RAM-") == 499
+        assert CountingWriter.writes < 20
+
+        answers = iter(["", "q"])
+        output = io.StringIO()
+        builtin_input = builtins.input
+        builtins.input = lambda prompt: next(answers)
+        try:
+            with contextlib.redirect_stdout(output):
+                self.ramata_library._display_all_books(page_size=10)
+        finally:
+            builtins.input = builtin_input
+        assert output.getvalue().count("ISBN: RAM-") == 20
+
+    def test_metrics_count_calls_failures_and_latency(self):
+        """Test per-operation counters, failure codes and latency histograms in Ramata Library"""
+        self.ramata_library.ramata_metrics = RamataMetrics()
+        self.ramata_library.borrow_book("RAM001", "RAM-002")
+        self.ramata_library.borrow_book("RAM001", "RAM-002")
+        self.ramata_library.borrow_book("RAM404", "RAM-001")
+        self.ramata_library.search_books("title", "test")
+        assert self.ramata_library.get_book_details("RAM-001")['title'] == "Test Book 1"
+        assert self.ramata_library.get_book_details("RAM-404") is None
+        assert self.ramata_library.get_member_details("RAM001")['borrowed_books'] == ["RAM-002"]
+
+        metrics = self.ramata_library.get_metrics()
+        assert metrics['borrow_book']['calls'] == 3
+        assert metrics['borrow_book']['failures'] == {RamataCode.MEMBER_NOT_FOUND: 1, RamataCode.NO_COPIES: 1}
+        assert metrics['borrow_book']['latency_buckets'][-1] == (float("inf"), 3)
+        assert metrics['search_books']['failures'] == {}
+        # Lookups are metered when called directly, not when operations use them
+        assert metrics['get_book_details']['calls'] == 2
+        assert metrics['get_book_details']['failures'] == {RamataCode.BOOK_NOT_FOUND: 1}
+        assert metrics['get_member_details']['calls'] == 1
+        assert "add_book" not in metrics
+
+        text = render_prometheus(metrics)
+        assert 'ramata_operation_calls_total{operation="borrow_book"} 3' in text
+        assert 'ramata_operation_failures_total{operation="borrow_book",code="no_copies"} 1' in text
+        assert 'ramata_operation_latency_seconds_bucket{operation="borrow_book",le="+Inf"} 3' in text
+
+        server = start_prometheus_exporter(self.ramata_library, port=0)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                assert response.read().decode() == text
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_search_cache_hits_and_never_serves_stale_results(self):
+        """Test the versioned LRU search cache in Ramata Library"""
+        library = self.ramata_library
+        assert library.search_books("title", "Test")[1] == library.search_books("title", "test")[1]
+        assert library.get_search_cache_stats()['hits'] == 1
+
+        library.add_book("RAM-003", "Test Book 3", "Author Three", "Mystery", 1)
+        assert [isbn for isbn, _ in library.search_books("title", "test")[1]] == ["RAM-001", "RAM-002", "RAM-003"]
+        library.update_book("RAM-001", "title", "Renamed")
+        assert [isbn for isbn, _ in library.search_books("title", "test")[1]] == ["RAM-002", "RAM-003"]
+        library.delete_book("RAM-002")
+        assert [isbn for isbn, _ in library.search_books("title", "test")[1]] == ["RAM-003"]
+
+        library.borrow_book("RAM001", "RAM-003")
+        assert library.search_books("title", "test", available_only=True)[1] == []
+        stats = library.get_search_cache_stats()
+        assert (stats['hits'], stats['misses']) == (1, 4)
+
+        library.ramata_search_cache.capacity = 2
+        for term in ("a", "b", "c"):
+            library.search_books("author", term)
+        assert library.get_search_cache_stats()['evictions'] == 2
+        assert library.get_search_cache_stats()['size'] == 2
+
+    def test_suggest_ranks_title_and_author_completions(self):
+        """Test that autocomplete suggestions follow catalog changes and rank by copies in Ramata Library"""
+        library = RamataMiniLibraryManagementSystem(event_sink=None)
+        library.add_book("RAM-001", "Big Magic", "Elizabeth Gilbert", "Self-Help", 2)
+        library.add_book("RAM-002", "Magic Hour", "Kristin Hannah", "Romance", 5)
+        library.add_book("RAM-003", "The Magician's Nephew", "Maggie Stiefvater", "Mystery", 1)
+        assert library.suggest("mag") == [("Magic Hour", "title"), ("Big Magic", "title"),
+                                          ("Maggie Stiefvater", "author"), ("The Magician's Nephew", "title")]
+        assert library.suggest("MAGICIAN'S NEPHEW", k=1) == [("The Magician's Nephew", "title")]
+
+        library.update_book("RAM-002", "total_copies", "1")
+        library.update_book("RAM-001", "title", "Big Ideas")
+        assert library.suggest("mag", k=2) == [("Maggie Stiefvater", "author"), ("Magic Hour", "title")]
+        library.delete_book("RAM-002")
+        assert library.suggest("magic") == [("The Magician's Nephew", "title")]
+
+        # Compare with ranking every completion directly after random edits,
+        # with leaves small enough to split, and to empty again, many times over
+        library._ramata_suggestions.bucket_size = 2
+        rng = random.Random(5)
+        words = ["love", "lost", "lore", "star", "stone", "story", "storm", "night", "ninth"]
+        for number in range(200):
+            isbn = f"RND-{number % 60:03d}"
+            title = " ".join(rng.sample(words, 2))
+            if library.get_book_details(isbn) is None:
+                library.add_book(isbn, title, rng.choice(words).title(), "Mystery", rng.randint(0, 9))
+            elif number % 3 == 0:
+                library.delete_book(isbn)
+            elif number % 3 == 1:
+                library.update_book(isbn, "title", title)
+            else:
+                library.update_book(isbn, "total_copies", str(rng.randint(0, 9)))
+
+        for prefix in ["l", "lo", "los", "st", "sto", "stor", "story s", "story stone", "n", "ni", "night l",
+                       "ninth lo", "x", "stormy"]:
+            scores = {}
+            for book in library.get_all_books().values():
+                for kind in ("title", "author"):
+                    text = book[kind]
+                    if any(word.startswith(prefix) for word in
+                           [text.lower()[i:] for i in range(len(text)) if i == 0 or text[i - 1] == " "]):
+                        scores[(kind, text)] = scores.get((kind, text), 0) + book.total_copies
+            expected = sorted(scores, key=lambda completion: (-scores[completion], completion))[:5]
+            assert library.suggest(prefix) == [(text, kind) for kind, text in expected], prefix
+
+    def test_sharded_library_matches_single_library(self):
+        """Test that a sharded Ramata Library routes, searches and ingests like a single one"""
+        rows = [{'isbn': f"SHD-{number:03d}", 'title': f"Shard Book {number}",
+                 'author': f"Author {number % 4}", 'genre': "Mystery" if number % 3 else "Romance",
+                 'total_copies': number % 3 + 1} for number in range(40)]
+        rows.insert(7, dict(rows[2]))
+        rows.insert(11, {'isbn': "SHD-BAD", 'title': "No Author"})
+        script = [
+            ("add_book", "SHD-900", "Late Shard Book", "Author 1", "Mystery", 1),
+            ("add_member", "Fatmata Bangura", "fatmata@email.com"),
+            ("borrow_book", "RAM001", "SHD-900"),
+            ("borrow_book", "RAM001", "SHD-900"),
+            ("borrow_book", "RAM001", "SHD-404"),
+            ("borrow_book", "RAM001", "SHD-001"),
+            ("get_book_borrowers", "SHD-900"),
+            ("delete_book", "SHD-900"),
+            ("return_book", "RAM001", "SHD-900"),
+            ("return_book", "RAM001", "SHD-900"),
+            ("update_book", "SHD-004", "title", "Renamed Shard"),
+            ("delete_book", "SHD-005"),
+            ("search_books", "title", "shard"),
+            ("search_books", "author", "author 1", "Mystery", True),
+            ("search_books", "title", "book", None, False, 5, 10),
+            ("search_books", "title", "", "Romance", False, 2, 3),
+            ("search_books", "genre", "x"),
+            ("get_book_details", "SHD-004"),
+            ("delete_member", "RAM001"),
+        ]
+        single_library = RamataMiniLibraryManagementSystem(event_sink=None)
+        single_rejects, sharded_rejects = [], []
+        with RamataShardedLibrary(shard_count=3) as sharded_library:
+            assert len({ramata_shard_for(row['isbn'], 3) for row in rows}) == 3
+            assert sharded_library.add_books_bulk(rows, lambda *reject: sharded_rejects.append(reject)) == \
+                single_library.add_books_bulk(rows, lambda *reject: single_rejects.append(reject))
+            assert sharded_rejects == single_rejects and len(sharded_rejects) == 2
+            for operation, *args in script:
+                single_result = single_library.execute(operation, *args)
+                sharded_result = sharded_library.execute(operation, *args)
+                assert (sharded_result.ok, sharded_result.code, sharded_result.message) == \
+                    (single_result.ok, single_result.code, single_result.message), operation
+                if operation == "search_books" and single_result.ok:
+                    assert [isbn for isbn, _ in sharded_result.data] == [isbn for isbn, _ in single_result.data]
+            assert sharded_library.get_book_count() == len(single_library.get_all_books())
+            assert sharded_library.get_book_details("SHD-001").available_copies == 1
+    def test_batch_mode_runs_json_and_csv_commands(self):
+        """Test that batch mode answers every JSON or CSV command line with one JSON result line"""
+        commands = io.StringIO(
+            'add_book,RAM-003,"Love, Again",Doris Lessing,Romance,2\n'
+            '{"id": "b1", "op": "borrow_book", "args": ["RAM001", "RAM-003"]}\n'
+            '\n'
+            'borrow_books,RAM001,RAM-001,RAM-404\n'
+            'search_books,title,love,Romance,true,0,5\n'
+            'get_book_details,RAM-003\n'
+            'add_book,RAM-004,Title,Author,Romance,many\n'
+            '{"op": "borrow_book", "args": "RAM001"}\n'
+            'return_book,RAM001\n'
+        )
+        out = io.StringIO()
+        self.ramata_library.ramata_event_sink = None
+        assert run_ramata_batch(self.ramata_library, commands, out) == 8
+
+        responses = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [response['code'] for response in responses] == [
+            RamataCode.OK, RamataCode.OK, RamataCode.BOOK_NOT_FOUND, RamataCode.OK, RamataCode.OK,
+            RamataCode.BAD_REQUEST, RamataCode.BAD_REQUEST, RamataCode.BAD_REQUEST]
+        assert responses[1]['id'] == "b1" and responses[0]['id'] is None
+        assert responses[2]['data'] == [["RAM-404", RamataCode.BOOK_NOT_FOUND, "Book with ISBN 'RAM-404' not found!"]]
+        assert [isbn for isbn, _ in responses[3]['data']] == ["RAM-003"]
+        assert responses[4]['data']['available_copies'] == 1
+
+    def test_batch_mode_answers_failing_commands_and_keeps_going(self):
+        """Test that a command raising inside Ramata Library does not end the batch"""
+        commands = io.StringIO(
+            'get_book_details,RAM-001\n'
+            '{"id": "bad-1", "op": "search_books", "args": ["title", 5]}\n'
+            '{"id": "bad-2", "op": "add_member", "args": ["Isatu Sesay", 5]}\n'
+            '{"id": "bad-3", "op": "add_book", "args": ["RAM-009", "Title", "Author", "Romance", [1]]}\n'
+            'borrow_book,RAM001,RAM-001\n'
+        )
+        out = io.StringIO()
+        self.ramata_library.ramata_event_sink = None
+        assert run_ramata_batch(self.ramata_library, commands, out) == 5
+
+        responses = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [response['id'] for response in responses] == [None, "bad-1", "bad-2", "bad-3", None]
+        assert [response['ok'] for response in responses] == [True, False, False, False, True]
+        assert all(response['code'] in (RamataCode.BAD_REQUEST, RamataCode.UNEXPECTED_ERROR)
+                   for response in responses[1:3])
+        assert responses[3]['code'] == RamataCode.INVALID_COPIES
+        assert self.ramata_library.get_book_details("RAM-001").available_copies == 2
+
+        # Lines already answered are written even if reading the input fails
+        def failing_lines():
+            yield 'get_book_details,RAM-002\n'
+            raise OSError("input went away")
+        out = io.StringIO()
+        try:
+            run_ramata_batch(self.ramata_library, failing_lines(), out)
+        except OSError:
+            pass
+        assert json.loads(out.getvalue())['ok'] == True
+
 
 def run_tests():
     """Run all tests and display results for Ramata Library"""
@@ -204,6 +1568,45 @@ def run_tests():
         test_class.test_delete_book_with_borrowed_copies,
         test_class.test_delete_member_success,
         test_class.test_delete_member_with_borrowed_books,
+        test_class.test_add_member_duplicate_email_case_insensitive,
+        test_class.test_member_email_index_follows_update_and_delete,
+        test_class.test_search_index_follows_update_and_delete,
+        test_class.test_search_matches_substring_scan,
+        test_class.test_quiet_mode_returns_result_codes,
+        test_class.test_event_sink_receives_messages,
+        test_class.test_add_books_bulk_reports_rejected_rows,
+        test_class.test_add_members_bulk_allocates_id_ranges,
+        test_class.test_ingest_streams_csv_and_jsonl,
+        test_class.test_persistent_store_recovers_snapshot_and_log_tail,
+        test_class.test_persistent_store_ignores_torn_log_tail,
+        test_class.test_persistent_store_never_runs_ahead_of_its_log,
+        test_class.test_binary_snapshot_round_trips_and_detects_corruption,
+        test_class.test_binary_snapshot_stores_search_and_suggestion_indexes,
+        test_class.test_loaded_books_are_text_indexed_in_the_background,
+        test_class.test_readonly_catalog_serves_lazy_lookups_and_rejects_mutations,
+        test_class.test_loan_due_dates_follow_borrow_renew_and_return,
+        test_class.test_due_index_matches_sorted_scan,
+        test_class.test_reservations_hold_returned_copies_in_queue_order,
+        test_class.test_reservations_count_toward_borrow_limit,
+        test_class.test_sqlite_backend_matches_memory_backend,
+        test_class.test_sqlite_backend_survives_reopen,
+        test_class.test_records_are_compact_with_dict_style_reads,
+        test_class.test_inventory_report_tracks_circulation,
+        test_class.test_live_stats_match_a_full_recount,
+        test_class.test_popularity_index_ranks_like_a_sort,
+        test_class.test_concurrent_borrow_and_return_keep_counts_consistent,
+        test_class.test_service_answers_pipelined_requests_in_order,
+        test_class.test_borrow_books_applies_whole_cart_or_nothing,
+        test_class.test_book_borrowers_index_follows_circulation,
+        test_class.test_search_books_filters_by_genre_and_availability_in_pages,
+        test_class.test_iter_books_and_members_tolerate_concurrent_changes,
+        test_class.test_display_all_books_writes_in_chunks_and_pages,
+        test_class.test_metrics_count_calls_failures_and_latency,
+        test_class.test_search_cache_hits_and_never_serves_stale_results,
+        test_class.test_suggest_ranks_title_and_author_completions,
+        test_class.test_sharded_library_matches_single_library,
+        test_class.test_batch_mode_runs_json_and_csv_commands,
+        test_class.test_batch_mode_answers_failing_commands_and_keeps_going,
     ]
 
     passed = 0